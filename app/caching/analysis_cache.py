@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import re
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from cachetools import TTLCache
+from app.config import settings
+from app.caching.redis import redis_cache
+from app.caching.shared_store import SharedLocalStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+AnalysisResult = Tuple[str, str]
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse runs of whitespace so re-uploads that only differ in formatting share a cache entry.
+    """
+    return _whitespace.sub(" ", text).strip()
+
+
+def analysis_cache_key(text: str, model: str, prompt_version: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"analysis:{model}:{prompt_version}:{digest}"
+
+
+def _encode(result: AnalysisResult) -> str:
+    summary, sentiment = result
+    return json.dumps({"summary": summary, "sentiment": sentiment})
+
+
+def _decode(raw: str) -> AnalysisResult:
+    data = json.loads(raw)
+    return data["summary"], data["sentiment"]
+
+
+class AnalysisCache:
+    """
+    Two-tier (summary, sentiment) cache keyed by text hash + model + prompt version.
+
+    L1 is a per-process LRU with TTL eviction, L2 is Redis shared by every process.
+    With a SharedLocalStore, a file-backed tier shared by the processes on one host sits in between.
+    Concurrent lookups of the same key while the model call is running share one in-flight future.
+    """
+
+    def __init__(self, max_entries: int, local_ttl: int, redis_ttl: int, shared: Optional[SharedLocalStore] = None):
+        self.local = TTLCache(maxsize=max_entries, ttl=local_ttl)
+        self.redis_ttl = redis_ttl
+        self.shared = shared
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "local_hits": 0,
+            "shared_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+        }
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Tuple[AnalysisResult, str]]]
+    ) -> Tuple[AnalysisResult, str]:
+        """
+        `compute` returns the result and the key it belongs under, which differs from `key` when
+        someone else answered (say, a fallback model); the result is stored under that key only.
+        Returns the result and the key it is stored under.
+        """
+        while True:
+            cached = self.local.get(key)
+            if cached is not None:
+                self.stats["local_hits"] += 1
+                return cached, key
+
+            pending = self.in_flight.get(key)
+            if pending is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only the caller computing it was cancelled: look again, and compute it here if
+                # no other waiter has started to
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            result, stored_key = await self._remote_get(key), key
+            if result is None:
+                self.stats["misses"] += 1
+                result, stored_key = await compute()
+                await self._remote_set(stored_key, result)
+            self.local[stored_key] = result
+            future.set_result((result, stored_key))
+            return result, stored_key
+        except asyncio.CancelledError:
+            # Waiters see the cancelled future and retry; the cancellation itself stays with this caller
+            future.cancel()
+            raise
+        except Exception as e:
+            # Failures are not cached: waiters get the same error and the next caller retries
+            future.set_exception(e)
+            # Mark the exception as retrieved so asyncio does not warn when nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+    async def get(self, key: str) -> Optional[AnalysisResult]:
+        """
+        Plain lookup without single-flight, for callers that batch their own misses.
+        """
+        cached = self.local.get(key)
+        if cached is not None:
+            self.stats["local_hits"] += 1
+            return cached
+        result = await self._remote_get(key)
+        if result is None:
+            self.stats["misses"] += 1
+            return None
+        self.local[key] = result
+        return result
+
+    async def put(self, key: str, result: AnalysisResult):
+        self.local[key] = result
+        await self._remote_set(key, result)
+
+    def get_stats(self) -> dict:
+        lookups = sum(self.stats.values())
+        hits = self.stats["local_hits"] + self.stats["shared_hits"] + self.stats["redis_hits"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "in_flight": len(self.in_flight),
+            "local_entries": len(self.local),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.local.clear()
+        for key in self.stats:
+            self.stats[key] = 0
+
+    async def _remote_get(self, key: str) -> Optional[AnalysisResult]:
+        # Shared file tier first, then Redis; a Redis hit is copied into the shared tier
+        if self.shared is not None:
+            raw = await self.shared.get(key)
+            if raw:
+                self.stats["shared_hits"] += 1
+                return _decode(raw)
+        result = await self._redis_get(key)
+        if result is not None:
+            self.stats["redis_hits"] += 1
+            if self.shared is not None:
+                await self.shared.set(key, _encode(result))
+        return result
+
+    async def _remote_set(self, key: str, result: AnalysisResult):
+        if self.shared is not None:
+            await self.shared.set(key, _encode(result))
+        await self._redis_set(key, result)
+
+    async def _redis_get(self, key: str) -> Optional[AnalysisResult]:
+        if not redis_cache.available():
+            return None
+        try:
+            raw = await redis_cache.execute("get", key)
+        except Exception as e:
+            logger.error("Redis read error: %s", e)
+            return None
+        if not raw:
+            return None
+        return _decode(raw)
+
+    async def _redis_set(self, key: str, result: AnalysisResult):
+        if not redis_cache.available():
+            return
+        try:
+            await redis_cache.execute("setex", key, self.redis_ttl, _encode(result))
+        except Exception as e:
+            logger.error("Redis write error: %s", e)
+
+
+analysis_cache = AnalysisCache(
+    settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    settings.ANALYSIS_CACHE_LOCAL_TTL,
+    settings.ANALYSIS_CACHE_REDIS_TTL,
+    SharedLocalStore(settings.ANALYSIS_CACHE_SHARED_PATH, settings.ANALYSIS_CACHE_REDIS_TTL)
+    if settings.ANALYSIS_CACHE_SHARED_PATH else None,
+)
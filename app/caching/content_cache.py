@@ -0,0 +1,95 @@
+import hashlib
+from typing import Optional, Tuple
+from cachetools import TTLCache
+from app.config import settings
+from app.caching.redis import redis_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+CachedBody = Tuple[str, bytes]
+
+
+def make_etag(body: bytes) -> str:
+    # Strong validator: the hash of the exact bytes served, so equal ETags mean byte-identical bodies
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def content_cache_key(user_id: int, content_id: int) -> str:
+    return f"content:{user_id}:{content_id}"
+
+
+def user_contents_cache_key(user_id: int) -> str:
+    return f"user_contents:{user_id}"
+
+
+class ContentResponseCache:
+    """
+    Pre-encoded GET /contents/{id} bodies and their ETags, so hits skip the database, pydantic
+    validation and JSON encoding.
+
+    Redis holds "<etag>\\n<body>" under content:{user_id}:{content_id}. The optional in-process
+    L1 (CONTENT_CACHE_LOCAL_TTL > 0) cannot be invalidated from other processes, so only enable
+    it for single-process deployments or when a few seconds of staleness after a delete is fine.
+    """
+
+    def __init__(self, ttl: int, local_ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=max_entries, ttl=local_ttl) if local_ttl > 0 else None
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        if self.local is not None:
+            cached = self.local.get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                return cached
+        raw = None
+        if redis_cache.available():
+            try:
+                raw = await redis_cache.execute("get", key)
+            except Exception as e:
+                logger.error("Redis read error: %s", e)
+        if not raw:
+            self.stats["misses"] += 1
+            return None
+        etag, _, body = raw.partition("\n")
+        cached = (etag, body.encode("utf-8"))
+        if self.local is not None:
+            self.local[key] = cached
+        self.stats["hits"] += 1
+        return cached
+
+    async def put(self, key: str, etag: str, body: bytes):
+        if self.local is not None:
+            self.local[key] = (etag, body)
+        if redis_cache.available():
+            try:
+                await redis_cache.execute("setex", key, self.ttl, etag + "\n" + body.decode("utf-8"))
+            except Exception as e:
+                logger.error("Redis write error: %s", e)
+
+    async def invalidate(self, user_id: int, content_id: Optional[int] = None):
+        """
+        Drop the user's cached list pages and, when given, one item; a single DEL round-trip.
+        """
+        keys = [user_contents_cache_key(user_id)]
+        if content_id is not None:
+            keys.append(content_cache_key(user_id, content_id))
+            if self.local is not None:
+                self.local.pop(keys[-1], None)
+        if redis_cache.available():
+            try:
+                await redis_cache.execute("delete", *keys)
+            except Exception as e:
+                logger.error("Redis delete error: %s", e)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "local_entries": len(self.local) if self.local is not None else 0}
+
+
+content_cache = ContentResponseCache(
+    settings.CONTENT_CACHE_TTL,
+    settings.CONTENT_CACHE_LOCAL_TTL,
+    settings.CONTENT_CACHE_MAX_ENTRIES,
+)
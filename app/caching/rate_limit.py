@@ -0,0 +1,73 @@
+import time
+from typing import Tuple
+from cachetools import TTLCache
+from app.caching.redis import redis_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Refill, then take `cost` tokens if there are enough; atomic, one round-trip.
+# Floats are returned as strings because Redis truncates Lua numbers to integers.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+# (allowed, tokens left, seconds until `cost` tokens are available)
+Decision = Tuple[bool, float, float]
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets holding up to `capacity` tokens and refilled at `rate` tokens per second, one per key.
+
+    State is shared by every worker through Redis (TOKEN_BUCKET_SCRIPT). While Redis is unavailable
+    each process falls back to its own buckets, so the limit loosens to per-process instead of
+    disappearing; idle local buckets expire once they would be full again.
+    """
+
+    def __init__(self, prefix: str, rate: float, capacity: int, max_local_keys: int = 10000):
+        self.prefix = prefix
+        self.rate = rate
+        self.capacity = capacity
+        self.local = TTLCache(maxsize=max_local_keys, ttl=capacity / rate + 1)
+        self.script = redis_cache.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, cost: int = 1) -> Decision:
+        now = time.time()
+        if redis_cache.available():
+            try:
+                allowed, tokens = await redis_cache.guard(
+                    lambda: self.script(keys=[f"{self.prefix}:{key}"], args=[self.rate, self.capacity, now, cost]),
+                    "evalsha",
+                )
+                return self._decision(bool(allowed), float(tokens), cost)
+            except Exception as e:
+                logger.error("Redis rate limit error: %s", e)
+        return self._take_local(key, cost, now)
+
+    def _take_local(self, key: str, cost: int, now: float) -> Decision:
+        tokens, ts = self.local.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + max(0.0, now - ts) * self.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.local[key] = (tokens, now)
+        return self._decision(allowed, tokens, cost)
+
+    def _decision(self, allowed: bool, tokens: float, cost: int) -> Decision:
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / self.rate
@@ -1,29 +1,130 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, List, Optional
 from app.config import settings
-import redis
+from app.metrics import redis_command_duration
+import redis.asyncio as redis
+from redis.exceptions import RedisError
 from dotenv import load_dotenv
+import logging
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 REDIS_HOST = settings.REDIS_HOST
 REDIS_PORT = settings.REDIS_PORT
 REDIS_PASSWORD = settings.REDIS_PASSWORD
 REDIS_DB = settings.REDIS_DB
 
-def get_redis_client():
-    try:
 
-        client = redis.Redis(
+class RedisUnavailable(Exception):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class RedisCache:
+    """
+    Async Redis client on an explicit connection pool, guarded by a circuit breaker.
+
+    Connections are opened lazily, so nothing blocks at import. After REDIS_BREAKER_THRESHOLD
+    consecutive failures every call fails fast with RedisUnavailable. Once a jittered backoff
+    has passed, calls are tried again: one success closes the breaker (that is the reconnect),
+    one failure reopens it with the backoff doubled.
+    """
+
+    def __init__(self):
+        self.pool = redis.ConnectionPool(
             host=REDIS_HOST,
             port=REDIS_PORT,
             password=REDIS_PASSWORD,
             db=REDIS_DB,
-            decode_responses=True
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
         )
-        # Test connection
-        client.ping()
-        return client
-    except Exception as e:
-        print(f"Redis connection failed: {e}")
-        return None
-
-redis_client = get_redis_client()
+        self.client = redis.Redis(connection_pool=self.pool)
+        self._blocking_client: Optional[redis.Redis] = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.backoff = settings.REDIS_BREAKER_RESET_SECONDS
+        self.stats = {"calls": 0, "errors": 0, "short_circuited": 0}
+
+    def available(self) -> bool:
+        """
+        Cheap pre-check for optional cache calls: False while the breaker is open.
+        """
+        return time.monotonic() >= self.open_until
+
+    async def execute(self, command: str, *args, **kwargs) -> Any:
+        return await self.guard(lambda: getattr(self.client, command)(*args, **kwargs), command)
+
+    async def pipeline(self, build: Callable[[Any], None], transaction: bool = False) -> List[Any]:
+        """
+        Queue several commands on one pipeline and send them in a single round-trip.
+        """
+        async def run():
+            async with self.client.pipeline(transaction=transaction) as pipe:
+                build(pipe)
+                return await pipe.execute()
+        return await self.guard(run, "pipeline")
+
+    def blocking_client(self) -> redis.Redis:
+        """
+        Separate client for blocking commands such as BLPOP, which would trip the normal socket timeout.
+        """
+        if self._blocking_client is None:
+            self._blocking_client = redis.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                password=REDIS_PASSWORD,
+                db=REDIS_DB,
+                decode_responses=True,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            )
+        return self._blocking_client
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "breaker_open": not self.available(),
+            "consecutive_failures": self.failures,
+            "pool_in_use": len(self.pool._in_use_connections),
+            "pool_max": settings.REDIS_MAX_CONNECTIONS,
+        }
+
+    async def close(self):
+        await self.client.aclose()
+        await self.pool.disconnect()
+        if self._blocking_client is not None:
+            await self._blocking_client.aclose()
+            self._blocking_client = None
+
+    async def guard(self, call: Callable[[], Any], command: str = "other") -> Any:
+        if not self.available():
+            self.stats["short_circuited"] += 1
+            raise RedisUnavailable("Redis circuit breaker is open")
+        self.stats["calls"] += 1
+        start = time.perf_counter()
+        try:
+            result = await call()
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._record_failure(e)
+            raise
+        finally:
+            redis_command_duration.labels(command).observe(time.perf_counter() - start)
+        self.failures = 0
+        self.backoff = settings.REDIS_BREAKER_RESET_SECONDS
+        return result
+
+    def _record_failure(self, error: Exception):
+        self.stats["errors"] += 1
+        self.failures += 1
+        if self.failures >= settings.REDIS_BREAKER_THRESHOLD:
+            delay = random.uniform(self.backoff / 2, self.backoff)
+            self.open_until = time.monotonic() + delay
+            self.backoff = min(self.backoff * 2, settings.REDIS_BREAKER_MAX_RESET_SECONDS)
+            logger.error("Redis unavailable (%s); skipping Redis for %.1fs", error, delay)
+
+
+redis_cache = RedisCache()
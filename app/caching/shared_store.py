@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SharedLocalStore:
+    """
+    Small key/value store in a SQLite file, shared by every API process on the host.
+
+    Sits between each process's in-memory LRU and Redis, so N local workers compute an analysis
+    once instead of N times even without Redis, and a Redis hit is only paid once per host.
+    WAL mode lets readers proceed while one process writes. Calls run in a thread because SQLite
+    blocks; entries past their TTL are ignored on read and purged now and then on write.
+    """
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, value, now + self.ttl))
+            self.writes += 1
+            if self.writes % 1000 == 0:
+                self.conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            logger.error("Shared cache read error: %s", e)
+            return None
+
+    async def set(self, key: str, value: str):
+        try:
+            await asyncio.to_thread(self._set, key, value)
+        except sqlite3.Error as e:
+            logger.error("Shared cache write error: %s", e)
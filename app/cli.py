@@ -0,0 +1,206 @@
+"""
+Command line entry points.
+
+    python -m app.cli import contents.jsonl --user-email user@example.com --checkpoint contents.ckpt
+    python -m app.cli reindex
+    python -m app.cli migrate
+    python -m app.cli rebuild-stats
+    python -m app.cli backfill-blobs
+    python -m app.cli serve --workers 4 --migrate
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from app.config import settings
+from app.database.database import SessionLocal, create_schema
+from app.database.models import Content, ContentBlob, User, decompress_text
+from app.logging_config import setup_logging
+from app.service.blob_store import backfill_blobs, get_blob_stats, missing_content_columns
+from app.service.content_stats import rebuild_content_stats
+from app.service.embedding_index import get_embedding_index
+from app.service.import_service import import_ndjson, iter_ndjson_file
+
+
+def _read_checkpoint(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {"line": 0, "offset": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(path: str, line: int, offset: int):
+    # Write-then-rename so a crash never leaves a half-written checkpoint behind
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"line": line, "offset": offset}, f)
+    os.replace(tmp_path, path)
+
+
+async def _import(args) -> int:
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == args.user_email).first()
+    if not user:
+        print(f"No user with email {args.user_email}", file=sys.stderr)
+        return 1
+
+    start = _read_checkpoint(args.checkpoint)
+    if start["line"]:
+        print(f"Resuming after line {start['line']}")
+
+    async def checkpoint(line: int, offset: int):
+        if args.checkpoint:
+            _write_checkpoint(args.checkpoint, line, offset)
+
+    with open(args.path, "rb") as f:
+        f.seek(start["offset"])
+        result = await import_ndjson(
+            iter_ndjson_file(f, start["line"], start["offset"]),
+            user.id,
+            field=args.field,
+            chunk_size=args.chunk_size,
+            checkpoint=checkpoint,
+            analyze=not args.no_analyze,
+            start_line=start["line"],
+            start_offset=start["offset"],
+        )
+    print(result.model_dump_json(indent=2))
+    return 0
+
+
+def _reindex(args) -> int:
+    index = get_embedding_index()
+    if index is None:
+        print("EMBEDDING_INDEX_ENABLED is off; nothing to do", file=sys.stderr)
+        return 1
+    if not settings.EMBEDDING_INDEX_PATH:
+        # An in-memory index would be rebuilt in this process only and discarded on exit
+        print("Set EMBEDDING_INDEX_PATH to the files the API processes open", file=sys.stderr)
+        return 1
+    index.clear()
+    indexed = 0
+    batch = []
+    with SessionLocal() as db:
+        # Streamed in id order so memory stays flat however many rows there are
+        rows = (
+            db.query(Content.id, Content.user_id, ContentBlob.data, ContentBlob.compressed)
+            .join(ContentBlob, ContentBlob.hash == Content.blob_hash)
+            .order_by(Content.id)
+            .yield_per(args.chunk_size)
+        )
+        for content_id, user_id, data, compressed in rows:
+            batch.append((content_id, user_id, decompress_text(data, compressed)))
+            if len(batch) >= args.chunk_size:
+                index.add_many(batch)
+                indexed += len(batch)
+                batch.clear()
+    index.add_many(batch)
+    indexed += len(batch)
+    index.flush()
+    print(f"Indexed {indexed} contents ({len(index)} in the index)")
+    return 0
+
+
+def _create_schema() -> bool:
+    # create_all adds missing tables, never columns: a contents table from an earlier release needs backfill-blobs
+    create_schema()
+    with SessionLocal() as db:
+        missing = missing_content_columns(db)
+    if missing:
+        print(f"error: contents is missing {', '.join(missing)}; run `python -m app.cli backfill-blobs` to upgrade it", file=sys.stderr)
+        return False
+    return True
+
+
+def _migrate(args) -> int:
+    if not _create_schema():
+        return 1
+    print("Database schema is up to date")
+    return 0
+
+
+def _backfill_blobs(args) -> int:
+    create_schema()
+    with SessionLocal() as db:
+        moved = backfill_blobs(db, args.chunk_size)
+        stats = get_blob_stats(db)
+    print(f"Moved {moved} contents into blobs")
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+def _rebuild_stats(args) -> int:
+    with SessionLocal() as db:
+        rows = rebuild_content_stats(db)
+    print(f"Rebuilt content stats ({rows} counter rows)")
+    return 0
+
+
+def _serve(args) -> int:
+    import uvicorn
+
+    if args.migrate and not _create_schema():
+        return 1
+    # Workers are spawned as fresh interpreters that import the app, and with it every engine,
+    # pool and client, on their own; this tells them how many siblings share DB_MAX_CONNECTIONS and the cores
+    os.environ["APP_WORKERS"] = str(args.workers)
+    settings.APP_WORKERS = args.workers
+    if args.workers > 1:
+        if settings.CONTENT_ANALYSIS_MODE == "background" and settings.ANALYSIS_QUEUE_BACKEND == "memory":
+            print("warning: every worker re-queues pending rows from its own memory queue; use ANALYSIS_QUEUE_BACKEND=redis or database", file=sys.stderr)
+        if settings.EMBEDDING_INDEX_ENABLED and not settings.EMBEDDING_INDEX_PATH:
+            # Each worker would only know the contents it indexed itself
+            print("error: set EMBEDDING_INDEX_PATH so the workers share one embedding index", file=sys.stderr)
+            return 1
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_cmd = commands.add_parser("import", help="Stream an NDJSON file into contents")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--user-email", required=True)
+    import_cmd.add_argument("--field", default="text", help="JSON key holding the text (default: text)")
+    import_cmd.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+    import_cmd.add_argument("--checkpoint", help="File recording the last committed line; reused to resume")
+    import_cmd.add_argument("--no-analyze", action="store_true", help="Leave rows pending for the API's background workers")
+
+    commands.add_parser("migrate", help="Create missing tables and indexes")
+
+    commands.add_parser("rebuild-stats", help="Recompute the per-user counters behind GET /contents/stats")
+
+    backfill_cmd = commands.add_parser("backfill-blobs", help="Move inline contents.text into the deduplicated blob store")
+    backfill_cmd.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+
+    serve_cmd = commands.add_parser("serve", help="Run the API with one or more worker processes")
+    serve_cmd.add_argument("--workers", type=int, default=settings.APP_WORKERS)
+    serve_cmd.add_argument("--host", default="0.0.0.0")
+    serve_cmd.add_argument("--port", type=int, default=8000)
+    serve_cmd.add_argument("--migrate", action="store_true", help="Create missing tables once before the workers start")
+
+    reindex_cmd = commands.add_parser("reindex", help="Rebuild the local embedding index from the contents table")
+    reindex_cmd.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    if args.command == "import":
+        return asyncio.run(_import(args))
+    if args.command == "reindex":
+        return _reindex(args)
+    if args.command == "migrate":
+        return _migrate(args)
+    if args.command == "backfill-blobs":
+        return _backfill_blobs(args)
+    if args.command == "rebuild-stats":
+        return _rebuild_stats(args)
+    if args.command == "serve":
+        return _serve(args)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,19 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL")  # derived from DATABASE_URL when unset
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    # Connections all API processes together may open (both engines); 0 = use DB_POOL_SIZE/DB_MAX_OVERFLOW per engine
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", 0))
+    # Number of API processes; set by `python -m app.cli serve --workers N` for the workers it starts
+    APP_WORKERS: int = int(os.getenv("APP_WORKERS", 1))
+    # Create missing tables at startup; off by default, run `python -m app.cli migrate` instead
+    DB_AUTO_MIGRATE: bool = os.getenv("DB_AUTO_MIGRATE", "false").lower() == "true"
+    READINESS_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("READINESS_CHECK_TIMEOUT_SECONDS", 2))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
     JWT_SECRET: str = os.getenv("JWT_SECRET")
     JWT_ALGO: str = os.getenv("JWT_ALGO")
     JWT_EXP_MINUTES: int = int(os.getenv("JWT_EXP_MINUTES", 60))
@@ -14,4 +27,95 @@ class Settings:
     REDIS_DB: int = int(os.getenv("REDIS_DB", 0))
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD") or None
     REDIS_CACHE_TTL: int = int(os.getenv("REDIS_CACHE_TTL", 60))
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+    REDIS_BREAKER_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_THRESHOLD", 3))
+    REDIS_BREAKER_RESET_SECONDS: float = float(os.getenv("REDIS_BREAKER_RESET_SECONDS", 1.0))
+    REDIS_BREAKER_MAX_RESET_SECONDS: float = float(os.getenv("REDIS_BREAKER_MAX_RESET_SECONDS", 60.0))
+    # Local analyzer tier: short, clear-cut texts are answered in-process instead of by the model
+    LOCAL_ANALYZER_ENABLED: bool = os.getenv("LOCAL_ANALYZER_ENABLED", "true").lower() == "true"
+    LOCAL_ANALYZER_MAX_CHARS: int = int(os.getenv("LOCAL_ANALYZER_MAX_CHARS", 280))
+    LOCAL_ANALYZER_MIN_CONFIDENCE: float = float(os.getenv("LOCAL_ANALYZER_MIN_CONFIDENCE", 0.75))
+    ANALYZER_BACKEND: str = os.getenv("ANALYZER_BACKEND", "gemini")  # gemini | fake
+    FAKE_MODEL_LATENCY_MS: float = float(os.getenv("FAKE_MODEL_LATENCY_MS", 0))
+    FAKE_MODEL_JITTER_MS: float = float(os.getenv("FAKE_MODEL_JITTER_MS", 0))
+    FAKE_MODEL_ERROR_RATE: float = float(os.getenv("FAKE_MODEL_ERROR_RATE", 0))
+    FAKE_MODEL_SEED: int = int(os.getenv("FAKE_MODEL_SEED", 0))
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 30))
+    # Model call resilience: retries within a total budget, fallback model, per-model circuit breaker, hedging
+    MODEL_MAX_ATTEMPTS: int = int(os.getenv("MODEL_MAX_ATTEMPTS", 3))
+    MODEL_TOTAL_TIMEOUT_SECONDS: float = float(os.getenv("MODEL_TOTAL_TIMEOUT_SECONDS", 60))
+    MODEL_RETRY_BACKOFF_SECONDS: float = float(os.getenv("MODEL_RETRY_BACKOFF_SECONDS", 0.5))
+    MODEL_RETRY_MAX_BACKOFF_SECONDS: float = float(os.getenv("MODEL_RETRY_MAX_BACKOFF_SECONDS", 8))
+    MODEL_FALLBACK: str = os.getenv("MODEL_FALLBACK", "")  # e.g. gemini-2.5-flash-lite; empty = no fallback
+    MODEL_BREAKER_THRESHOLD: int = int(os.getenv("MODEL_BREAKER_THRESHOLD", 5))
+    MODEL_BREAKER_RESET_SECONDS: float = float(os.getenv("MODEL_BREAKER_RESET_SECONDS", 30))
+    MODEL_HEDGE_ENABLED: bool = os.getenv("MODEL_HEDGE_ENABLED", "false").lower() == "true"
+    MODEL_HEDGE_QUANTILE: float = float(os.getenv("MODEL_HEDGE_QUANTILE", 0.95))
+    MODEL_HEDGE_MIN_SAMPLES: int = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", 20))
+    # Model admission: callers beyond GEMINI_MAX_CONCURRENCY queue by priority; past these bounds they get a 503
+    MODEL_QUEUE_MAX_WAITING: int = int(os.getenv("MODEL_QUEUE_MAX_WAITING", 100))
+    MODEL_QUEUE_MAX_WAIT_SECONDS: float = float(os.getenv("MODEL_QUEUE_MAX_WAIT_SECONDS", 10))
+    # Global model-call budget shared by all workers through Redis; 0 = unlimited
+    MODEL_RATE_LIMIT_PER_SECOND: float = float(os.getenv("MODEL_RATE_LIMIT_PER_SECOND", 0))
+    MODEL_RATE_LIMIT_BURST: int = int(os.getenv("MODEL_RATE_LIMIT_BURST", 10))
+    # Per-user request rate limit (token bucket); reads cost 1 token, writes RATE_LIMIT_WRITE_COST
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_PER_SECOND", 10))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", 100))
+    RATE_LIMIT_WRITE_COST: int = int(os.getenv("RATE_LIMIT_WRITE_COST", 5))
+    # Per-user texts sent for analysis through /contents/batch and /contents/import, one token per text;
+    # the burst should hold a full batch (BATCH_MAX_ITEMS)
+    RATE_LIMIT_BULK_TEXTS_PER_SECOND: float = float(os.getenv("RATE_LIMIT_BULK_TEXTS_PER_SECOND", 2))
+    RATE_LIMIT_BULK_BURST: int = int(os.getenv("RATE_LIMIT_BULK_BURST", 500))
+    CONTENT_ANALYSIS_MODE: str = os.getenv("CONTENT_ANALYSIS_MODE", "sync")  # sync | background
+    ANALYSIS_QUEUE_BACKEND: str = os.getenv("ANALYSIS_QUEUE_BACKEND", "memory")  # memory | redis | database
+    ANALYSIS_QUEUE_MAXSIZE: int = int(os.getenv("ANALYSIS_QUEUE_MAXSIZE", 1000))
+    ANALYSIS_WORKERS: int = int(os.getenv("ANALYSIS_WORKERS", 4))
+    ANALYSIS_MAX_RETRIES: int = int(os.getenv("ANALYSIS_MAX_RETRIES", 3))
+    ANALYSIS_DRAIN_TIMEOUT_SECONDS: float = float(os.getenv("ANALYSIS_DRAIN_TIMEOUT_SECONDS", 30))
+    ANALYSIS_CACHE_ENABLED: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+    ANALYSIS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 1024))
+    ANALYSIS_CACHE_LOCAL_TTL: int = int(os.getenv("ANALYSIS_CACHE_LOCAL_TTL", 3600))
+    # SQLite file shared by the API processes on one host, between the per-process LRU and Redis; empty = off
+    ANALYSIS_CACHE_SHARED_PATH: str = os.getenv("ANALYSIS_CACHE_SHARED_PATH", "")
+    ANALYSIS_CACHE_REDIS_TTL: int = int(os.getenv("ANALYSIS_CACHE_REDIS_TTL", 7 * 24 * 3600))
+    # Texts estimated above LONG_DOCUMENT_MIN_TOKENS are summarised per chunk of at most CHUNK_MAX_TOKENS, then reduced
+    LONG_DOCUMENT_MIN_TOKENS: int = int(os.getenv("LONG_DOCUMENT_MIN_TOKENS", 6000))
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", 2000))
+    CHUNK_CONCURRENCY: int = int(os.getenv("CHUNK_CONCURRENCY", 4))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", 500))
+    BATCH_PROMPT_MAX_TOKENS: int = int(os.getenv("BATCH_PROMPT_MAX_TOKENS", 8000))
+    BATCH_PROMPT_MAX_ITEMS: int = int(os.getenv("BATCH_PROMPT_MAX_ITEMS", 20))
+    IMPORT_CHUNK_SIZE: int = int(os.getenv("IMPORT_CHUNK_SIZE", 500))
+    IMPORT_ANALYSIS_WORKERS: int = int(os.getenv("IMPORT_ANALYSIS_WORKERS", 4))
+    IMPORT_ANALYSIS_QUEUE_SIZE: int = int(os.getenv("IMPORT_ANALYSIS_QUEUE_SIZE", 100))
+    CONTENT_CACHE_TTL: int = int(os.getenv("CONTENT_CACHE_TTL", 3600))
+    CONTENT_CACHE_LOCAL_TTL: int = int(os.getenv("CONTENT_CACHE_LOCAL_TTL", 0))  # 0 = Redis only
+    CONTENT_CACHE_MAX_ENTRIES: int = int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", 10000))
+    CONTENTS_PAGE_SIZE: int = int(os.getenv("CONTENTS_PAGE_SIZE", 100))
+    CONTENTS_MAX_PAGE_SIZE: int = int(os.getenv("CONTENTS_MAX_PAGE_SIZE", 1000))
+    CONTENTS_PREVIEW_CHARS: int = int(os.getenv("CONTENTS_PREVIEW_CHARS", 200))
+    BLOB_COMPRESS_MIN_BYTES: int = int(os.getenv("BLOB_COMPRESS_MIN_BYTES", 1024))
+    CONTENT_STATS_TREND_DAYS: int = int(os.getenv("CONTENT_STATS_TREND_DAYS", 14))
+    AUTH_TRUST_TOKEN_CLAIMS: bool = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+    PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", 300))
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 0))  # 0 = one per CPU
+    PASSWORD_HASH_QUEUE_LIMIT: int = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64))
+    SEARCH_PAGE_SIZE: int = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+    SEARCH_MAX_PAGE_SIZE: int = int(os.getenv("SEARCH_MAX_PAGE_SIZE", 100))
+    # Characters of each text indexed for full-text search (Postgres rejects tsvectors over 1MB)
+    SEARCH_VECTOR_MAX_CHARS: int = int(os.getenv("SEARCH_VECTOR_MAX_CHARS", 100_000))
+    EMBEDDING_INDEX_ENABLED: bool = os.getenv("EMBEDDING_INDEX_ENABLED", "false").lower() == "true"
+    EMBEDDING_INDEX_PATH: str = os.getenv("EMBEDDING_INDEX_PATH", "")  # empty = in memory, this process only
+    EMBEDDING_INDEX_FLUSH_SECONDS: float = float(os.getenv("EMBEDDING_INDEX_FLUSH_SECONDS", 5))
+    EMBEDDING_DIM: int = int(os.getenv("EMBEDDING_DIM", 256))
+    LOG_PROFILE: str = os.getenv("LOG_PROFILE", "dev")  # dev | production
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_MAX_FIELD_CHARS: int = int(os.getenv("LOG_MAX_FIELD_CHARS", 200))
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", 0.1))
 settings = Settings()
\ No newline at end of file
@@ -1,22 +1,176 @@
-from sqlalchemy import create_engine
+import os
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError
 from app.config import settings
+from app.metrics import db_query_duration
 
-engine = create_engine(settings.DATABASE_URL)
+
+def worker_pool_limits(max_connections: int, workers: int, engines: int = 2):
+    """
+    (pool_size, max_overflow) per engine so that `workers` processes with `engines` engines each
+    stay within max_connections; half of each engine's share is kept open, half is overflow.
+    """
+    per_engine = max(1, max_connections // (workers * engines))
+    pool_size = max(1, (per_engine + 1) // 2)
+    return pool_size, per_engine - pool_size
+
+
+def pool_options(url: str) -> dict:
+    # SQLite uses a single-file pool where size/overflow do not apply
+    if url.startswith("sqlite"):
+        return {}
+    pool_size, max_overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    if settings.DB_MAX_CONNECTIONS:
+        pool_size, max_overflow = worker_pool_limits(settings.DB_MAX_CONNECTIONS, settings.APP_WORKERS)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def async_database_url(url: str) -> str:
+    """
+    Derive the asyncio driver URL from DATABASE_URL unless ASYNC_DATABASE_URL is set explicitly.
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+# Sync engine: background workers, bulk import and the CLI
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine: request handlers
+async_engine = create_async_engine(async_database_url(settings.DATABASE_URL), **pool_options(settings.DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-try:
-    with engine.connect() as conn:
-        print("Connected successfully!")
-except OperationalError as e:
-    print("Connection failed:", e)
-    
+
+def upsert(table):
+    """INSERT construct with on_conflict_do_update for the configured database (Postgres or SQLite)."""
+    if engine.dialect.name == "sqlite":
+        return sqlite_insert(table)
+    return postgresql_insert(table)
+
+
+def instrument_engine(sync_engine, label: str):
+    """
+    Time every statement on the engine into db_query_duration_seconds{engine=label}.
+    """
+    histogram = db_query_duration.labels(label)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("query_start", None)
+        if start is not None:
+            histogram.observe(time.perf_counter() - start)
+
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+
+def register_sqlite_functions(sync_engine):
+    """
+    SQLite cannot decompress blobs itself: give every connection content_text(data, compressed),
+    so the search fallback can match the full text in SQL.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        from app.database.models import decompress_text
+
+        def content_text(data, compressed):
+            return decompress_text(data, bool(compressed)) if data is not None else None
+
+        dbapi_connection.create_function("content_text", 2, content_text, deterministic=True)
+
+
+if engine.dialect.name == "sqlite":
+    register_sqlite_functions(engine)
+    register_sqlite_functions(async_engine.sync_engine)
+
+
+def _forget_inherited_connections():
+    # A forked child must not reuse the parent's sockets; close=False leaves them to the parent
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+# Covers servers that import the app and then fork (e.g. gunicorn --preload);
+# `python -m app.cli serve` spawns fresh interpreters instead
+os.register_at_fork(after_in_child=_forget_inherited_connections)
+
+
+def create_schema():
+    """
+    Create missing tables and indexes. Run by `python -m app.cli migrate` before the API starts,
+    or at startup when DB_AUTO_MIGRATE is on; never at import.
+    """
+    from app.database import models  # noqa: F401 - registers the tables on Base.metadata
+    Base.metadata.create_all(bind=engine)
+
+
+async def check_database():
+    # Also opens the first pooled connection, so the first request does not pay for it
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def dispose_engines():
+    await async_engine.dispose()
+    engine.dispose()
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pool_stats(pool) -> dict:
+    stats = {"class": type(pool).__name__}
+    # Only QueuePool-style pools report utilisation
+    if hasattr(pool, "checkedout"):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_size": pool.size() + pool._max_overflow,
+        })
+    return stats
+
+
+def get_pool_stats() -> dict:
+    return {
+        "sync": _pool_stats(engine.pool),
+        "async": _pool_stats(async_engine.sync_engine.pool),
+    }
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+import zlib
+from typing import Optional, Tuple
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, LargeBinary, String, ForeignKey, Index, Text, func, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -10,12 +13,96 @@ class User(Base):
 
     contents = relationship("Content", back_populates="owner")
 
+def text_search_vector(column):
+    """
+    The tsvector GET /contents/search matches a content's summary against; queries must use this
+    exact expression for Postgres to serve them from the ix_contents_summary_search GIN index.
+    """
+    # Inline literals, not bind parameters, so the query expression matches the index expression
+    return func.to_tsvector(literal_column("'english'::regconfig"), func.coalesce(column, literal_column("''")))
+
+
+def compress_text(text: str, min_bytes: int) -> Tuple[bytes, bool]:
+    """UTF-8 bytes of text, zlib-compressed when at least min_bytes long and it actually saves space."""
+    data = text.encode("utf-8")
+    if len(data) >= min_bytes:
+        packed = zlib.compress(data)
+        if len(packed) < len(data):
+            return packed, True
+    return data, False
+
+
+def decompress_text(data: bytes, compressed: bool) -> str:
+    return (zlib.decompress(data) if compressed else bytes(data)).decode("utf-8")
+
+
+class ContentBlob(Base):
+    """
+    Uploaded texts, stored once per distinct text (sha256 of its UTF-8 bytes) however many contents
+    rows point at it. refcount is the number of those rows; the blob is deleted with the last one.
+    """
+    __tablename__ = 'content_blobs'
+    hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    compressed = Column(Boolean, nullable=False, default=False)
+    # Length of the decoded text in characters
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    # Postgres only: the text's tsvector, computed on insert since the text may be compressed
+    search_vector = Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_content_blobs_search", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+    @property
+    def text(self) -> str:
+        return decompress_text(self.data, self.compressed)
+
+
 class Content(Base):
     __tablename__ = 'contents'
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
-    text = Column(Text)
+    blob_hash = Column(String(64), ForeignKey('content_blobs.hash'), nullable=True, index=True)
+    # First CONTENTS_PREVIEW_CHARS characters of the text, so previews and search hits never touch the blob
+    preview = Column(Text, nullable=True)
     summary = Column(Text, nullable=True)
     sentiment = Column(String, nullable=True)
+    # pending -> processing -> completed / failed; rows analysed inline are written as completed
+    status = Column(String, nullable=False, default="completed", server_default="completed", index=True)
+    # When the row became completed; decides which trend bucket of content_stats it counts towards
+    analyzed_at = Column(DateTime(timezone=True), nullable=True)
 
     owner = relationship("User", back_populates="contents")
+    # Never loaded implicitly: read paths that need the full text ask for it with joinedload(Content.blob)
+    blob = relationship("ContentBlob", lazy="raise")
+
+    __table_args__ = (
+        # Backs keyset pagination of GET /contents: WHERE user_id = ? AND id > ? ORDER BY id
+        Index("ix_contents_user_id_id", "user_id", "id"),
+        # Full-text search over the summary (Postgres only; other databases fall back to LIKE)
+        Index(
+            "ix_contents_summary_search",
+            text_search_vector(summary),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    @property
+    def text(self) -> Optional[str]:
+        return self.blob.text if self.blob is not None else None
+
+
+class ContentStat(Base):
+    """
+    Per-user counters behind GET /contents/stats, kept in step with every completed or deleted
+    content in the same transaction. bucket is "all" for the running totals or an ISO day
+    ("2024-05-01") for the trend, so a user's stats are a handful of rows whatever they own.
+    """
+    __tablename__ = 'content_stats'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    bucket = Column(String, primary_key=True)
+    sentiment = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    text_chars = Column(BigInteger, nullable=False, default=0)
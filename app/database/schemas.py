@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import Dict, List, Optional
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -12,8 +12,7 @@ class UserLogin(BaseModel):
 class UserResponse(BaseModel):
     id: int
     email: EmailStr
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ContentCreate(BaseModel):
     text: str
@@ -23,11 +22,47 @@ class ContentResponse(BaseModel):
     text: str
     summary: Optional[str]
     sentiment: Optional[str]
-    class Config:
-        orm_mode = True
+    status: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
 
 class ContentListResponse(BaseModel):
     id: int
     text: str
-    class Config:
-        orm_mode = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class ContentSearchResult(BaseModel):
+    id: int
+    text: str
+    summary: Optional[str] = None
+    sentiment: Optional[str] = None
+    score: float
+
+class ContentBatchCreate(BaseModel):
+    texts: List[str]
+
+class ContentBatchItemResponse(BaseModel):
+    index: int
+    id: Optional[int] = None
+    summary: Optional[str] = None
+    sentiment: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+
+class ContentBatchResponse(BaseModel):
+    items: List[ContentBatchItemResponse]
+
+class ContentImportResponse(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    last_line: int = 0
+    errors: List[str] = []
+class ContentStatsBucket(BaseModel):
+    day: str
+    total: int
+    sentiments: Dict[str, int]
+
+class ContentStatsResponse(BaseModel):
+    total: int
+    sentiments: Dict[str, int]
+    average_text_length: float
+    trend: List[ContentStatsBucket]
@@ -0,0 +1,102 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import FastAPI
+from app.caching.redis import redis_cache
+from app.config import settings
+from app.database.database import check_database, create_schema, dispose_engines
+from app.logging_config import shutdown_logging
+from app.service import analyze_sentiment
+from app.service.analysis_worker import analysis_workers
+from app.service.embedding_index import flush_embedding_index, flush_periodically
+from app.service.user_service import shutdown_hash_executor
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def _check_redis():
+    await redis_cache.execute("ping")
+
+
+async def _check_model():
+    await asyncio.to_thread(analyze_sentiment.model_backend.warm)
+
+
+class Resources:
+    """
+    The process's external dependencies, checked concurrently instead of being connected at import.
+
+    Nothing here blocks startup on a dependency: the first round of checks runs in the background
+    (opening the DB pool, reaching Redis, importing and building the model client) while the
+    process already answers /health/live. /health/ready re-runs the checks; only the database is
+    required, since Redis and the model degrade to cache misses and 5xx on the affected routes.
+    """
+
+    required = frozenset(["database"])
+
+    def __init__(self):
+        self.checks: Dict[str, Callable[[], Awaitable[None]]] = {
+            "database": check_database,
+            "redis": _check_redis,
+            "model": _check_model,
+        }
+        self.warmup: Optional[asyncio.Task] = None
+        self.flusher: Optional[asyncio.Task] = None
+
+    async def _check(self, name: str) -> str:
+        try:
+            await asyncio.wait_for(self.checks[name](), settings.READINESS_CHECK_TIMEOUT_SECONDS)
+            return "ok"
+        except asyncio.TimeoutError:
+            return "timeout"
+        except Exception as e:
+            return f"error: {type(e).__name__}"
+
+    async def check(self) -> Dict[str, str]:
+        results = await asyncio.gather(*(self._check(name) for name in self.checks))
+        return dict(zip(self.checks, results))
+
+    def ready(self, results: Dict[str, str]) -> bool:
+        return all(results[name] == "ok" for name in self.required)
+
+    async def _warm(self):
+        results = await self.check()
+        logger.info("Startup checks: %s", results)
+
+    async def start(self):
+        if settings.DB_AUTO_MIGRATE:
+            await asyncio.to_thread(create_schema)
+        if settings.CONTENT_ANALYSIS_MODE == "background":
+            await analysis_workers.start()
+        elif settings.ANALYSIS_QUEUE_BACKEND != "memory":
+            # Sync mode only queues API imports; a durable queue may still hold the ones the last run left
+            await analysis_workers.start(recover=False)
+        if settings.EMBEDDING_INDEX_ENABLED and settings.EMBEDDING_INDEX_PATH:
+            self.flusher = asyncio.create_task(flush_periodically(settings.EMBEDDING_INDEX_FLUSH_SECONDS))
+        self.warmup = asyncio.create_task(self._warm())
+
+    async def stop(self):
+        if self.warmup is not None and not self.warmup.done():
+            self.warmup.cancel()
+        # Let queued and in-flight analyses finish before the process exits
+        await analysis_workers.stop(settings.ANALYSIS_DRAIN_TIMEOUT_SECONDS)
+        if self.flusher is not None:
+            self.flusher.cancel()
+        await asyncio.to_thread(flush_embedding_index)
+        shutdown_hash_executor()
+        await redis_cache.close()
+        await dispose_engines()
+        shutdown_logging()
+
+
+resources = Resources()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await resources.start()
+    try:
+        yield
+    finally:
+        await resources.stop()
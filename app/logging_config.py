@@ -1,7 +1,131 @@
+import atexit
+import json
 import logging
+import queue
+import random
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.config import settings
+
+# Pass as extra= on high-volume per-request INFO lines; the production profile keeps only LOG_SAMPLE_RATE of them
+SAMPLED = {"sampled": True}
+
+# Attributes every LogRecord has; anything else on a record came from extra= and is emitted as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+def _truncate(value, limit: int):
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + f"...[{len(value) - limit} more]"
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random share of records marked with extra=SAMPLED at INFO or below; everything else passes.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.INFO and getattr(record, "sampled", False):
+            return random.random() < self.rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with string arguments and extra fields cut to max_field_chars.
+    """
+
+    def __init__(self, max_field_chars: int):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        limit = self.max_field_chars
+        message = record.msg
+        if record.args:
+            args = record.args
+            if isinstance(args, tuple):
+                args = tuple(_truncate(a, limit) for a in args)
+            message = message % args
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _truncate(str(message), limit * 2),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sampled":
+                entry[key] = _truncate(value, limit)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stock prepare() formats the
+    message on the caller's thread; our log arguments are plain values, so the record can be
+    handed over as is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def shutdown_logging():
+    """
+    Stop the production listener thread after it has written everything still queued.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _setup_production_logging(level: str):
+    global _listener
+    shutdown_logging()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter(settings.LOG_MAX_FIELD_CHARS))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(records)
+    # Drop sampled records before they are queued, so they cost one random() on the hot path
+    handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+
+
+# Flush whatever is still queued when the process exits
+atexit.register(shutdown_logging)
+
+
+def setup_logging(profile: Optional[str] = None):
+    """
+    dev (default): human-readable lines written synchronously.
+    production: JSON lines written by a background thread through a queue, with sampling and truncation.
+    """
+    profile = profile or settings.LOG_PROFILE
+    if profile == "production":
+        _setup_production_logging(settings.LOG_LEVEL)
+        return
+    shutdown_logging()
 
-def setup_logging():
     logging_config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -18,7 +142,7 @@ def setup_logging():
             },
         },
         "root": {
-            "level": "INFO",
+            "level": settings.LOG_LEVEL,
             "handlers": ["console"]
         },
     }
@@ -1,18 +1,24 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.middleware.jwt_middleware import JWTMiddleware
-from app.routes import contents_router, users_router
-from app.database.database import Base, engine
+from app.middleware.metrics_middleware import MetricsMiddleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.routes import contents_router, health_router, metrics_router, users_router
+from app.lifespan import lifespan
 from app.logging_config import setup_logging
 
-# Create all DB tables
-Base.metadata.create_all(bind=engine)
+# Nothing below connects to anything: the database, Redis and the model client are checked
+# after startup (see app.lifespan), and the schema is created by `python -m app.cli migrate`
 setup_logging()
 app = FastAPI(
     title="Intelligent Content API",
     description="LLM-powered summary + sentiment service with JWT auth",
     version="1.0.0",
-    root_path="/intelligent_content_api/v1"
+    root_path="/intelligent_content_api/v1",
+    lifespan=lifespan,
+    # orjson encodes the validated response several times faster than the stdlib json module
+    default_response_class=ORJSONResponse,
 )
 
 # CORS (feel free to restrict this)
@@ -23,8 +29,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added before JWTMiddleware so it runs after it, with the caller known
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(JWTMiddleware)
+# Added last so it runs first and the latency it records includes auth
+app.add_middleware(MetricsMiddleware)
 
 # Routers
 app.include_router(users_router.router, prefix="/users", tags=["Users"])
 app.include_router(contents_router.router, prefix="/contents", tags=["Contents"])
+app.include_router(health_router.router, prefix="/health", tags=["Health"])
+app.include_router(metrics_router.router, tags=["Metrics"])
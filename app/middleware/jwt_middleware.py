@@ -1,87 +1,74 @@
+import time
 from fastapi.responses import JSONResponse
-from fastapi import HTTPException, Request
 from jose import JWTError, ExpiredSignatureError
 from starlette.types import ASGIApp, Receive, Scope, Send
-from app.database.database import SessionLocal
-from app.database.models import User
-from app.service.user_service import decode_access_token
+from app.service.user_service import decode_access_token, resolve_principal
+from app.metrics import jwt_decode_duration
 import logging
 logger = logging.getLogger(__name__)
 
+PUBLIC_PATHS = frozenset([
+  "/intelligent_content_api/v1/users/login",
+  "/intelligent_content_api/v1/users/signup",
+  "/intelligent_content_api/v1/openapi.json",
+  "/intelligent_content_api/v1/health/live",
+  "/intelligent_content_api/v1/health/ready",
+  "/intelligent_content_api/v1/metrics",
+  "/docs",
+])
+
+
 class JWTMiddleware:
-  
+  """
+  Pure ASGI auth check: reads the Authorization header straight from the scope and stores the
+  caller in scope["state"]["user"] (what request.state.user reads) without building a Request
+  or opening a DB session on the hot path.
+  """
+
   def __init__(self, app: ASGIApp):
     self.app = app
 
   async def __call__(self, scope: Scope, receive: Receive, send: Send):
-    if scope["type"] != "http":
-
+    if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in PUBLIC_PATHS:
       await self.app(scope, receive, send)
       return
 
-    request = Request(scope, receive=receive)
-
-    if request.method == "OPTIONS":
-      await self.app(scope, receive, send)
-      return
-
-    path = scope["path"]
-    if path in [
-    "/intelligent_content_api/v1/users/login",
-    "/intelligent_content_api/v1/users/signup",
-    "/intelligent_content_api/v1/openapi.json",
-    "/docs",]:
-      await self.app(scope, receive, send)
-
-      return
+    token = None
+    for name, value in scope["headers"]:
+      if name == b"authorization":
+        token = value.decode("latin-1")
+        break
 
-    token = request.headers.get("Authorization")
     if not token or not token.startswith("Bearer "):
-      response = JSONResponse(
-        status_code=401,
-        content={"detail": "Authorization token missing or invalid."}
-      )
-      await response(scope, receive, send)
+      await self._reject(scope, receive, send, 401, "Authorization token missing or invalid.")
       return
-    
-    token = token.split(" ")[1]
 
+    start = time.perf_counter()
     try:
-      payload = decode_access_token(token)
-      
-      user_id = payload.get("id")  
-
-      logger.debug(f"Decoded token payload: {payload}")
-      if not user_id:
-          logger.error("User ID not found in token payload")
-          raise HTTPException(status_code=401, detail="Invalid token")
-      db = SessionLocal() 
-      user = db.query(User).filter(User.id == user_id).first()
-      logger.debug(f"Fetched user from DB: {user}")
-      if not user:
-          logger.error("User not found in database")
-          raise HTTPException(status_code=404, detail="User not found")
-      request.state.user = user
-    
-    except HTTPException as e:
-      response = JSONResponse(
-        status_code=e.status_code,
-        content={"detail": e.detail},
-      )
-      await response(scope, receive, send)
-      return
+      payload = decode_access_token(token[7:])
     except ExpiredSignatureError:
-      response = JSONResponse(
-        status_code=401,
-        content={"detail": "Token has expired"},
-      )
-      await response(scope, receive, send)
+      await self._reject(scope, receive, send, 401, "Token has expired")
       return
     except JWTError:
-      response = JSONResponse(
-      status_code=401,
-      content={"detail": "Invalid token"},)
+      await self._reject(scope, receive, send, 401, "Invalid token")
+      return
+    finally:
+      jwt_decode_duration.observe(time.perf_counter() - start)
 
-      await response(scope, receive, send)
+    if not payload.get("id"):
+      logger.error("User ID not found in token payload")
+      await self._reject(scope, receive, send, 401, "Invalid token")
       return
-    await self.app(scope, receive, send)
\ No newline at end of file
+
+    user = await resolve_principal(payload)
+    if user is None:
+      logger.error("User not found in database")
+      await self._reject(scope, receive, send, 404, "User not found")
+      return
+
+    scope.setdefault("state", {})["user"] = user
+    await self.app(scope, receive, send)
+
+  async def _reject(self, scope: Scope, receive: Receive, send: Send, status_code: int, detail: str):
+    response = JSONResponse(status_code=status_code, content={"detail": detail})
+    await response(scope, receive, send)
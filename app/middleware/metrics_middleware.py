@@ -0,0 +1,39 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.metrics import http_request_duration, http_requests_in_progress
+
+
+class MetricsMiddleware:
+  """
+  Outermost ASGI layer: times every HTTP request, including auth, into
+  http_request_duration_seconds{method, route, status}. The route label is the matched path
+  template (e.g. /contents/{content_id}), so ids do not blow up the label set.
+  """
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    status = 500
+
+    async def send_with_status(message: Message):
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+      await send(message)
+
+    http_requests_in_progress.inc()
+    start = time.perf_counter()
+    try:
+      await self.app(scope, receive, send_with_status)
+    finally:
+      http_requests_in_progress.dec()
+      # FastAPI stores the matched route in the (shared) scope; requests rejected earlier have none
+      route = scope.get("route")
+      http_request_duration.labels(
+        scope["method"], route.path if route is not None else "unmatched", status
+      ).observe(time.perf_counter() - start)
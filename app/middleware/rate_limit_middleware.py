@@ -0,0 +1,84 @@
+import asyncio
+import math
+from typing import Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.caching.rate_limit import TokenBucketLimiter
+from app.config import settings
+import logging
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset(["GET", "HEAD"])
+
+
+def _limiter(prefix: str, rate: float, burst: int) -> Optional[TokenBucketLimiter]:
+  # Buckets that never refill cannot limit anything sensibly; treat a rate of 0 as no limit
+  if rate <= 0:
+    if settings.RATE_LIMIT_ENABLED:
+      logger.warning("%s rate is %s per second; that limit is off", prefix, rate)
+    return None
+  return TokenBucketLimiter(prefix, rate, burst)
+
+
+# Batch and import requests carry many texts, so beyond their request cost they draw one token per text
+bulk_limiter = _limiter("bulk_texts", settings.RATE_LIMIT_BULK_TEXTS_PER_SECOND, settings.RATE_LIMIT_BULK_BURST)
+
+
+async def take_bulk_texts(user_id: int, count: int, wait: bool = False):
+  """
+  Charge `count` texts to the user's bulk bucket. Over the limit, raises a 429 with Retry-After, or
+  with wait=True sleeps until the tokens are there (streamed imports slow down instead of failing).
+  Counts above the burst are taken a burst at a time.
+  """
+  limiter = bulk_limiter
+  if limiter is None or not settings.RATE_LIMIT_ENABLED:
+    return
+  while count > 0:
+    step = min(count, limiter.capacity)
+    allowed, _, retry_after = await limiter.take(str(user_id), step)
+    if allowed:
+      count -= step
+      continue
+    if not wait:
+      logger.warning("Bulk text limit exceeded for user %s", user_id)
+      raise HTTPException(
+        status_code=429,
+        detail="Too many texts submitted. Please slow down.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after))), "X-RateLimit-Limit": str(limiter.capacity)},
+      )
+    await asyncio.sleep(retry_after)
+
+
+class RateLimitMiddleware:
+  """
+  Per-user token bucket (RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST). Runs inside JWTMiddleware,
+  so the caller is already in scope["state"]["user"]; public paths have no user and pass
+  through. Reads cost one token and writes RATE_LIMIT_WRITE_COST, since writes are what
+  reach the model. Over the limit the request gets a 429 with Retry-After without touching
+  the route. Batch and import routes also charge their texts through take_bulk_texts.
+  """
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+    self.limiter = _limiter("rate_limit", settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST)
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    user = scope.get("state", {}).get("user") if scope["type"] == "http" else None
+    if user is None or self.limiter is None or not settings.RATE_LIMIT_ENABLED:
+      await self.app(scope, receive, send)
+      return
+
+    cost = 1 if scope["method"] in READ_METHODS else settings.RATE_LIMIT_WRITE_COST
+    allowed, _, retry_after = await self.limiter.take(str(user.id), cost)
+    if allowed:
+      await self.app(scope, receive, send)
+      return
+
+    logger.warning("Rate limit exceeded for user %s", user.id)
+    response = JSONResponse(
+      status_code=429,
+      content={"detail": "Too many requests. Please slow down."},
+      headers={"Retry-After": str(max(1, math.ceil(retry_after))), "X-RateLimit-Limit": str(settings.RATE_LIMIT_BURST)},
+    )
+    await response(scope, receive, send)
@@ -1,73 +1,203 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-
-from app.database.database import SessionLocal
-from app.database.models import Content, User
-from app.database.schemas import ContentCreate, ContentListResponse, ContentResponse
-from app.service.content_service import create_user_content, delete_user_content, get_all_user_contents, get_user_content
-from app.service.user_service import get_current_user, get_token_header
-from app.service.analyze_sentiment import analyze_text  # async AI call
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+
+from app.database.database import get_async_db
+from app.database.schemas import ContentBatchCreate, ContentBatchResponse, ContentCreate, ContentImportResponse, ContentListResponse, ContentResponse, ContentSearchResult, ContentStatsResponse
+from app.service.content_service import create_user_content, create_user_contents_batch, stream_user_content, delete_user_content, get_all_user_contents, get_user_content_response, invalidate_user_contents_cache, search_user_contents
+from app.service.user_service import AuthenticatedUser, get_current_user, get_token_header
+from app.service.analysis_worker import STATUS_PENDING
+from app.service.import_service import import_ndjson, iter_ndjson_stream
+from app.service.content_stats import get_user_content_stats
+from app.caching.redis import redis_cache
+from app.middleware.rate_limit_middleware import take_bulk_texts
+from app.config import settings
 import logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/ prefixes are ignored, and "*" matches any current representation
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _cached_json(request: Request, etag: str, body: bytes, headers: Optional[dict] = None) -> Response:
+    """
+    Pre-encoded JSON body with its ETag, or an empty 304 when the client already has it.
+    """
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 # POST /contents
-@router.post("/", response_model=ContentResponse)
-async def create_content(content: ContentCreate,token: str = Depends(get_token_header), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+# Returns 200 with the analysis inline, or 202 with status "pending" when CONTENT_ANALYSIS_MODE=background
+@router.post("/", response_model=ContentResponse, responses={202: {"model": ContentResponse}})
+async def create_content(content: ContentCreate, http_response: Response, token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     try:
         response= await create_user_content(content, db, current_user)
+        if response.status == STATUS_PENDING:
+            http_response.status_code = 202
         return response
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.error(f"Error creating content: {e}")
+        logger.error("Error creating content: %s", e)
         raise e
 
 
+# POST /contents/stream
+# Same as POST /contents, but answers with server-sent events carrying the summary as it is generated.
+# The analysis is saved when the stream completes (or in the background if the client disconnects).
+@router.post("/stream", response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def create_content_stream(content: ContentCreate, token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    events = await stream_user_content(content, db, current_user)
+    # no-transform/X-Accel-Buffering keep proxies from holding events back until the stream ends
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"})
+
+
+# POST /contents/batch
+# Per-item results; one failed item does not fail the batch
+@router.post("/batch", response_model=ContentBatchResponse, responses={202: {"model": ContentBatchResponse}})
+async def create_contents_batch(batch: ContentBatchCreate, http_response: Response, token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    try:
+        # Every text is a model call; oversized batches are turned away by the service without a charge
+        if len(batch.texts) <= settings.BATCH_MAX_ITEMS:
+            await take_bulk_texts(current_user.id, len(batch.texts))
+        response= await create_user_contents_batch(batch, db, current_user)
+        if settings.CONTENT_ANALYSIS_MODE == "background":
+            http_response.status_code = 202
+        return response
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error("Error creating content batch: %s", e)
+        raise HTTPException(status_code=500, detail="Error creating contents")
+
+
+# POST /contents/import
+# Body is NDJSON (one {"text": ...} object per line), read incrementally so it can be arbitrarily large.
+# Pass import_id to have the committed line checkpointed in Redis; re-sending the same body with the same
+# import_id (or an explicit start_line) resumes after the last committed chunk.
+# Returns once every row is committed and queued; the analyses complete in the background.
+# Sync mode needs a durable queue: its workers recover nothing at startup, so jobs queued in memory would
+# be lost on restart and their rows left pending.
+@router.post("/import", response_model=ContentImportResponse)
+async def import_contents(request: Request, field: str = "text", start_line: Optional[int] = None, import_id: Optional[str] = None, token: str = Depends(get_token_header), current_user: AuthenticatedUser = Depends(get_current_user)):
+    if settings.CONTENT_ANALYSIS_MODE != "background" and settings.ANALYSIS_QUEUE_BACKEND == "memory":
+        raise HTTPException(
+            status_code=409,
+            detail="Importing through the API needs CONTENT_ANALYSIS_MODE=background or ANALYSIS_QUEUE_BACKEND=redis/database; use `python -m app.cli import` instead",
+        )
+    checkpoint_key = f"import_checkpoint:{current_user.id}:{import_id}" if import_id else None
+    if start_line is None:
+        start_line = 0
+        if checkpoint_key and redis_cache.available():
+            try:
+                start_line = int(await redis_cache.execute("get", checkpoint_key) or 0)
+            except Exception as e:
+                logger.error("Redis read error: %s", e)
+
+    async def checkpoint(line: int, offset: int):
+        if checkpoint_key and redis_cache.available():
+            try:
+                await redis_cache.execute("setex", checkpoint_key, 7 * 24 * 3600, line)
+            except Exception as e:
+                logger.error("Redis write error: %s", e)
+
+    try:
+        response = await import_ndjson(
+            iter_ndjson_stream(request.stream(), start_line),
+            current_user.id,
+            field=field,
+            checkpoint=checkpoint,
+            # Each chunk waits for its texts' share of the user's bulk limit
+            throttle=lambda count: take_bulk_texts(current_user.id, count, wait=True),
+            start_line=start_line,
+        )
+        await invalidate_user_contents_cache(current_user.id)
+        return response
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error("Error importing contents: %s", e)
+        raise HTTPException(status_code=500, detail="Error importing contents")
+
+
 # GET /contents
+# Keyset pagination: pass the X-Next-Cursor header of one page as `after` to get the next.
+# view=preview returns the first CONTENTS_PREVIEW_CHARS characters of each text instead of the full text.
+# Pages carry an ETag; sending it back in If-None-Match answers 304 while the page is unchanged.
 @router.get("/", response_model=List[ContentListResponse])
-def get_all_contents(token: str = Depends(get_token_header),db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_all_contents(request: Request, limit: int = Query(settings.CONTENTS_PAGE_SIZE, ge=1, le=settings.CONTENTS_MAX_PAGE_SIZE), after: Optional[int] = None, view: Literal["full", "preview"] = "full", token: str = Depends(get_token_header),db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     try:
-        response= get_all_user_contents(db, current_user)
-        return response
+        etag, body, next_after = await get_all_user_contents(db, current_user, limit=limit, after=after, view=view)
+        headers = {"X-Next-Cursor": str(next_after)} if next_after is not None else None
+        return _cached_json(request, etag, body, headers)
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.error(f"Error fetching all contents: {e}")
+        logger.error("Error fetching all contents: %s", e)
         raise HTTPException(status_code=500, detail="Error fetching contents")
 
+# GET /contents/search
+# Ranked search over the caller's contents; pass the X-Next-Offset header as `offset` for the next page.
+# Declared before /{content_id} so "search" is not parsed as an id.
+@router.get("/search", response_model=List[ContentSearchResult])
+async def search_contents(http_response: Response, q: str = Query(..., min_length=1, max_length=500), mode: Literal["text", "semantic"] = "text", limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE), offset: int = Query(0, ge=0), token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    try:
+        response, next_offset = await search_user_contents(db, current_user, q, mode=mode, limit=limit, offset=offset)
+        if next_offset is not None:
+            http_response.headers["X-Next-Offset"] = str(next_offset)
+        return response
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error("Error searching contents: %s", e)
+        raise HTTPException(status_code=500, detail="Error searching contents")
+
+# GET /contents/stats
+# Sentiment counts, average text length and daily trend of the caller's analysed contents, read from
+# counters maintained on every write instead of scanning the contents table.
+@router.get("/stats", response_model=ContentStatsResponse)
+async def get_contents_stats(token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    try:
+        return await get_user_content_stats(db, current_user.id)
+    except Exception as e:
+        logger.error("Error fetching content stats: %s", e)
+        raise HTTPException(status_code=500, detail="Error fetching content stats")
+
 # GET /contents/{id}
+# Finished contents are served from the response cache; If-None-Match with the ETag answers 304.
 @router.get("/{content_id}", response_model=ContentResponse)
-def get_content(content_id: int,token: str = Depends(get_token_header), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_content(content_id: int, request: Request, token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     try:
-        response= get_user_content(content_id, db, current_user)
-        return response
+        etag, body = await get_user_content_response(content_id, db, current_user)
+        return _cached_json(request, etag, body)
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.error(f"Error fetching content with id {content_id}: {e}")
+        logger.error("Error fetching content with id %s: %s", content_id, e)
         raise HTTPException(status_code=500, detail="Error fetching content")
 
 # DELETE /contents/{id}
 @router.delete("/{content_id}")
-def delete_content(content_id: int,token: str = Depends(get_token_header), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_content(content_id: int,token: str = Depends(get_token_header), db: AsyncSession = Depends(get_async_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     try:
-        response= delete_user_content(content_id, db, current_user)
+        response= await delete_user_content(content_id, db, current_user)
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.error(f"Error deleting content with id {content_id}: {e}")
+        logger.error("Error deleting content with id %s: %s", content_id, e)
         raise HTTPException(status_code=500, detail="Error deleting content")
     return response
\ No newline at end of file
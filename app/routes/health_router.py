@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.caching.analysis_cache import analysis_cache
+from app.caching.content_cache import content_cache
+from app.caching.redis import redis_cache
+from app.database.database import get_pool_stats
+from app.service.analyze_sentiment import get_analysis_stats
+from app.service.analysis_worker import analysis_workers
+from app.service.user_service import get_hash_stats
+from app.lifespan import resources
+
+router = APIRouter()
+
+
+# GET /health/live
+# Liveness: the process is up and serving; touches no dependency
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+# GET /health/ready
+# Readiness: 200 once the required dependencies answer, 503 otherwise (take the instance out of rotation)
+@router.get("/ready")
+async def ready():
+    checks = await resources.check()
+    if resources.ready(checks):
+        return {"status": "ready", "checks": checks}
+    return JSONResponse(status_code=503, content={"status": "not ready", "checks": checks})
+
+
+# GET /health/stats
+@router.get("/stats")
+async def get_stats():
+    return {
+        "analysis": get_analysis_stats(),
+        "analysis_workers": await analysis_workers.stats(),
+        "analysis_cache": analysis_cache.get_stats(),
+        "content_cache": content_cache.get_stats(),
+        "db_pool": get_pool_stats(),
+        "redis": redis_cache.get_stats(),
+        "password_hashing": get_hash_stats(),
+    }
@@ -0,0 +1,41 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.caching.analysis_cache import analysis_cache
+from app.database.database import get_pool_stats
+from app.metrics import GaugeCallback, registry
+from app.service.analyze_sentiment import analysis_stats
+
+router = APIRouter()
+
+registry.register(GaugeCallback(
+    "analysis_in_flight", "Model calls currently in flight", lambda: analysis_stats["in_flight"],
+))
+registry.register(GaugeCallback(
+    "analysis_waiting", "Analyses waiting for a model concurrency slot", lambda: analysis_stats["waiting"],
+))
+registry.register(GaugeCallback(
+    "analysis_total", "Analyses by outcome since start", lambda: {
+        outcome: analysis_stats[outcome]
+        for outcome in ("completed", "failed", "timed_out", "answered_locally", "escalated")
+    }, labelname="outcome",
+))
+registry.register(GaugeCallback(
+    "analysis_cache_lookups", "Analysis cache lookups by result since start", lambda: {
+        result: count for result, count in analysis_cache.stats.items()
+    }, labelname="result",
+))
+registry.register(GaugeCallback(
+    "analysis_cache_hit_ratio", "Share of analysis cache lookups served without a model call",
+    lambda: analysis_cache.get_stats()["hit_ratio"],
+))
+registry.register(GaugeCallback(
+    "db_pool_checked_out", "Database connections currently checked out", lambda: {
+        name: pool.get("checked_out", 0) for name, pool in get_pool_stats().items()
+    }, labelname="engine",
+))
+
+
+# GET /metrics
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,24 +1,26 @@
 import re
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_async_db
 from app.database.models import User
 from app.database.schemas import UserCreate, UserLogin, UserResponse
-from app.service.user_service import create_token, hash_password, verify_password
+from app.service.user_service import create_token, hash_password_async, verify_and_update_password_async
 import logging
+from app.logging_config import SAMPLED
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.post("/signup", response_model=UserResponse)
-def signup(data: UserCreate, db: Session = Depends(get_db)):
+async def signup(data: UserCreate, db: AsyncSession = Depends(get_async_db)):
 
     # check existing user
-    existing = db.query(User).filter(User.email == data.email).first()
+    existing = await db.scalar(select(User.id).where(User.email == data.email))
     
     if existing:
-        logger.error(f"User already exists with email: {data.email}")
+        logger.error("User already exists with email: %s", data.email)
         raise HTTPException(status_code=400, detail="User already exists")
     
     # Password regex rule
@@ -29,25 +31,36 @@ def signup(data: UserCreate, db: Session = Depends(get_db)):
         logger.error("Password does not meet complexity requirements")
         raise HTTPException(status_code=400, detail=("Password must be at least 8 characters long and include an uppercase letter, a lowercase letter, a number, and a special character."))
     
-    hashed_password = hash_password(data.password)
+    hashed_password = await hash_password_async(data.password)
     new_user = User(email=data.email, password=hashed_password)
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    logger.info(f"New user created: {new_user.email}")
+    await db.commit()
+    await db.refresh(new_user)
+    logger.info("New user created: %s", new_user.email)
 
     return new_user
 
 
 @router.post("/login")
-def signin(data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
+async def signin(data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == data.email))
 
-    if not user or not verify_password(data.password, user.password):
-        logger.error(f"Invalid credentials for email: {data.email}")
+    if not user:
+        logger.error("Invalid credentials for email: %s", data.email)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    valid, new_hash = await verify_and_update_password_async(data.password, user.password)
+    if not valid:
+        logger.error("Invalid credentials for email: %s", data.email)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        # Stored hash uses a deprecated scheme/cost; upgrade it while we have the plaintext
+        user.password = new_hash
+        await db.commit()
+        logger.info("Rehashed password for user: %s", user.email)
+
     token = create_token({"id": user.id, "email": user.email})
-    logger.info(f"User signed in: {user.email}")
+    logger.info("User signed in: %s", user.email, extra=SAMPLED)
     return {"access_token": token, "token_type": "bearer"}
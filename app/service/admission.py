@@ -0,0 +1,135 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from app.caching.rate_limit import TokenBucketLimiter
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lower is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKGROUND = 2
+
+# Set by callers that are not serving a waiting user (batch requests, the analysis workers), so the
+# priority reaches the model call without threading it through every analysis function
+_priority: ContextVar[int] = ContextVar("model_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def model_priority(priority: int):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class ModelOverloaded(Exception):
+    """Raised when a model call is shed instead of queued."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class ModelAdmission:
+    """
+    Admission control for model calls in this process.
+
+    At most max_concurrency calls run at once. Further callers wait in a priority queue
+    (interactive, then batch, then background; FIFO within a priority) of at most max_waiting
+    entries. When the queue is full a newcomer displaces the lowest-priority waiter if it outranks
+    it and is shed otherwise; a waiter is also shed after max_wait seconds. With a budget, each
+    admitted call additionally takes a token from the shared bucket, waiting for one if needed.
+    Shed callers get ModelOverloaded at once rather than adding to everyone's latency.
+    """
+
+    def __init__(self, max_concurrency: int, max_waiting: int, max_wait: float, budget: Optional[TokenBucketLimiter] = None):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.budget = budget
+        self.in_flight = 0
+        self.waiters: List[list] = []
+        self.sequence = itertools.count()
+        self.stats = {"admitted": 0, "shed": 0, "displaced": 0, "wait_timeouts": 0, "budget_waits": 0}
+
+    async def acquire(self, priority: Optional[int] = None):
+        priority = _priority.get() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        if self.in_flight < self.max_concurrency and not self.waiters:
+            self.in_flight += 1
+        else:
+            await self._wait_turn(priority)
+        self.stats["admitted"] += 1
+        if self.budget is not None:
+            try:
+                await self._take_budget(deadline)
+            except BaseException:
+                self.release()
+                raise
+
+    async def _wait_turn(self, priority: int):
+        if len(self.waiters) >= self.max_waiting:
+            worst = max(self.waiters, default=None)
+            if worst is None or worst[0] <= priority:
+                self.stats["shed"] += 1
+                raise ModelOverloaded("Model queue is full", self.max_wait)
+            self._remove(worst)
+            self.stats["displaced"] += 1
+            worst[2].set_exception(ModelOverloaded("Displaced by higher-priority work", self.max_wait))
+
+        entry = [priority, next(self.sequence), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self.waiters, entry)
+        try:
+            # A resolved future means release() handed its slot over; in_flight already counts it
+            await asyncio.wait_for(entry[2], timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            self.stats["wait_timeouts"] += 1
+            raise ModelOverloaded("Timed out waiting for a model slot", self.max_wait)
+        except asyncio.CancelledError:
+            future = entry[2]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            else:
+                self._remove(entry)
+            raise
+
+    async def _take_budget(self, deadline: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            allowed, _, retry_after = await self.budget.take("model")
+            if allowed:
+                return
+            if loop.time() + retry_after > deadline:
+                self.stats["shed"] += 1
+                raise ModelOverloaded("Model call budget exhausted", retry_after)
+            self.stats["budget_waits"] += 1
+            await asyncio.sleep(retry_after)
+
+    def release(self):
+        while self.waiters:
+            entry = heapq.heappop(self.waiters)
+            if not entry[2].done():
+                entry[2].set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _remove(self, entry: list):
+        if entry in self.waiters:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "waiting": len(self.waiters),
+            "max_waiting": self.max_waiting,
+        }
@@ -0,0 +1,357 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import joinedload
+from app.config import settings
+from app.database.database import SessionLocal
+from app.database.models import Content
+from app.service.analyze_sentiment import analyze_text
+from app.service.admission import PRIORITY_BACKGROUND, model_priority
+from app.service.content_stats import counted, stats_change
+from app.caching.redis import redis_cache
+from app.caching.content_cache import content_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+REDIS_QUEUE_KEY = "analysis_queue"
+
+
+class InMemoryAnalysisQueue:
+    """
+    Process-local queue. Jobs are lost on restart, so pending rows are re-queued when the pool starts.
+    """
+    recover_on_start = True
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def put(self, content_id: int):
+        self.queue.put_nowait(content_id)
+
+    async def get(self, timeout: float) -> Optional[int]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def depth(self) -> int:
+        return self.queue.qsize()
+
+    async def requeue(self, content_ids: List[int]):
+        # The queue goes away with the process; the rows are re-queued from the table on the next start
+        return None
+
+
+class RedisAnalysisQueue:
+    """
+    Redis list shared by every API process; RPUSH to enqueue, BLPOP to claim.
+    """
+    recover_on_start = False
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+
+    async def put(self, content_id: int):
+        depth = await redis_cache.execute("llen", REDIS_QUEUE_KEY)
+        if depth >= self.maxsize:
+            raise asyncio.QueueFull()
+        await redis_cache.execute("rpush", REDIS_QUEUE_KEY, content_id)
+
+    async def get(self, timeout: float) -> Optional[int]:
+        client = redis_cache.blocking_client()
+        item = await redis_cache.guard(lambda: client.blpop([REDIS_QUEUE_KEY], timeout=timeout), "blpop")
+        if not item:
+            return None
+        return int(item[1])
+
+    async def depth(self) -> int:
+        return await redis_cache.execute("llen", REDIS_QUEUE_KEY)
+
+    async def requeue(self, content_ids: List[int]):
+        # BLPOP already removed these jobs; put them back at the head so another process takes them next
+        if content_ids:
+            await redis_cache.execute("lpush", REDIS_QUEUE_KEY, *content_ids)
+
+
+class DatabaseAnalysisQueue:
+    """
+    Uses the contents table itself as the queue: workers claim pending rows with FOR UPDATE SKIP LOCKED.
+    Postgres only.
+    """
+    recover_on_start = False
+    poll_interval = 0.5
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+
+    async def put(self, content_id: int):
+        # The row was committed as pending, which already makes it visible to the workers
+        return None
+
+    async def get(self, timeout: float) -> Optional[int]:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            content_id = await asyncio.to_thread(self._claim)
+            if content_id is not None or asyncio.get_running_loop().time() >= deadline:
+                return content_id
+            await asyncio.sleep(self.poll_interval)
+
+    async def depth(self) -> int:
+        return await asyncio.to_thread(self._count_pending)
+
+    async def requeue(self, content_ids: List[int]):
+        # Rows reset to pending are claimable again
+        return None
+
+    def _claim(self) -> Optional[int]:
+        with SessionLocal() as db:
+            row = db.execute(sql_text(
+                "SELECT id FROM contents WHERE status = :status "
+                "ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED"
+            ), {"status": STATUS_PENDING}).first()
+            if row is None:
+                db.rollback()
+                return None
+            db.execute(sql_text("UPDATE contents SET status = :status WHERE id = :id"),
+                       {"status": STATUS_PROCESSING, "id": row[0]})
+            db.commit()
+            return row[0]
+
+    def _count_pending(self) -> int:
+        with SessionLocal() as db:
+            return db.query(Content).filter(Content.status == STATUS_PENDING).count()
+
+
+QUEUE_BACKENDS = {
+    "memory": InMemoryAnalysisQueue,
+    "redis": RedisAnalysisQueue,
+    "database": DatabaseAnalysisQueue,
+}
+
+
+def _load_text(content_id: int) -> Optional[str]:
+    with SessionLocal() as db:
+        content = db.query(Content).options(joinedload(Content.blob)).filter(Content.id == content_id).first()
+        if not content or content.status == STATUS_COMPLETED:
+            return None
+        # Read before the commit expires the row and its blob
+        text = content.text
+        content.status = STATUS_PROCESSING
+        db.commit()
+        return text
+
+
+def _save_result(content_id: int, status: str, summary: Optional[str] = None, sentiment: Optional[str] = None) -> Optional[int]:
+    with SessionLocal() as db:
+        content = db.query(Content).options(joinedload(Content.blob)).filter(Content.id == content_id).first()
+        if not content:
+            return None
+        # A re-delivered job can finish an already completed row: swap its old contribution out
+        before = counted(content)
+        content.status = status
+        if status == STATUS_COMPLETED:
+            content.summary = summary
+            content.sentiment = sentiment
+            content.analyzed_at = datetime.now(timezone.utc)
+        change = stats_change(content.user_id, added=[counted(content)], removed=[before])
+        if change is not None:
+            db.execute(change)
+        db.commit()
+        return content.user_id
+
+
+def _reset_to_pending(content_ids: List[int]):
+    with SessionLocal() as db:
+        db.query(Content).filter(Content.id.in_(content_ids), Content.status == STATUS_PROCESSING).update(
+            {Content.status: STATUS_PENDING}, synchronize_session=False
+        )
+        db.commit()
+
+
+def _unfinished_ids() -> List[int]:
+    with SessionLocal() as db:
+        rows = (
+            db.query(Content.id)
+            .filter(Content.status.in_([STATUS_PENDING, STATUS_PROCESSING]))
+            .order_by(Content.id)
+            .all()
+        )
+        return [r[0] for r in rows]
+
+
+async def analyze_with_retry(text: str):
+    """
+    analyze_text at background priority, so queued interactive requests get model slots first.
+    model_client already retries transient model errors; the only failures retried here are the
+    ones turned away before reaching the model (circuit breaker open, model queue full), after
+    the Retry-After they came with, at most ANALYSIS_MAX_RETRIES times.
+    """
+    attempt = 0
+    while True:
+        try:
+            with model_priority(PRIORITY_BACKGROUND):
+                return await analyze_text(text)
+        except HTTPException as e:
+            retry_after = (e.headers or {}).get("Retry-After")
+            attempt += 1
+            if retry_after is None or attempt > settings.ANALYSIS_MAX_RETRIES:
+                raise
+            logger.warning("Analysis turned away (%s), retry %s in %ss", e.status_code, attempt, retry_after)
+            await asyncio.sleep(float(retry_after))
+
+
+class AnalysisWorkerPool:
+    """
+    In-process asyncio workers that fill in summary/sentiment for contents saved as pending.
+    """
+
+    def __init__(self, backend: str, workers: int, maxsize: int):
+        self.queue = QUEUE_BACKENDS[backend](maxsize)
+        self.workers = workers
+        self.tasks: List[asyncio.Task] = []
+        self.active = 0
+        self.in_flight = set()
+        self.accepting = False
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self, recover: bool = True):
+        if self.tasks:
+            return
+        self.accepting = True
+        if recover and self.queue.recover_on_start:
+            for content_id in await asyncio.to_thread(_unfinished_ids):
+                try:
+                    await self.queue.put(content_id)
+                except asyncio.QueueFull:
+                    logger.warning("Analysis queue full while recovering pending contents")
+                    break
+        self.tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        logger.info("Started %s analysis workers", self.workers)
+
+    async def enqueue(self, content_id: int):
+        if not self.accepting:
+            raise HTTPException(status_code=503, detail="Analysis workers are not accepting jobs. Please try again later.")
+        try:
+            await self.queue.put(content_id)
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Analysis queue is full. Please try again later.")
+
+    async def submit(self, content_id: int):
+        """
+        Like enqueue, but waits for room instead of failing, so bulk producers are slowed to the workers' pace.
+        """
+        while True:
+            if not self.accepting:
+                raise HTTPException(status_code=503, detail="Analysis workers are not accepting jobs. Please try again later.")
+            try:
+                await self.queue.put(content_id)
+                return
+            except asyncio.QueueFull:
+                await asyncio.sleep(0.05)
+
+    async def stop(self, timeout: float):
+        """
+        Stop taking new jobs, give queued and in-flight jobs up to `timeout` seconds to finish, then cancel.
+        Cancelled jobs go back to pending (and onto the queue, for Redis) so they are not stuck processing.
+        """
+        self.accepting = False
+        if not self.tasks:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if self.active == 0 and await self.queue.depth() == 0:
+                break
+            await asyncio.sleep(0.1)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        unfinished = sorted(self.in_flight)
+        self.in_flight.clear()
+        if unfinished:
+            try:
+                await asyncio.to_thread(_reset_to_pending, unfinished)
+                await self.queue.requeue(unfinished)
+            except Exception as e:
+                logger.error("Could not return %s unfinished analyses to the queue: %s", len(unfinished), e)
+            logger.warning("Returned %s unfinished analyses to pending", len(unfinished))
+        logger.info("Analysis workers stopped")
+
+    async def stats(self) -> dict:
+        try:
+            depth = await self.queue.depth()
+        except Exception:
+            depth = None
+        return {
+            "workers": len(self.tasks),
+            "active": self.active,
+            "queue_depth": depth,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    async def _run(self, worker_id: int):
+        while True:
+            try:
+                content_id = await self.queue.get(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Analysis worker %s could not read the queue: %s", worker_id, e)
+                await asyncio.sleep(1.0)
+                continue
+            if content_id is None:
+                continue
+            self.active += 1
+            self.in_flight.add(content_id)
+            cancelled = False
+            try:
+                await self._process(content_id)
+            except asyncio.CancelledError:
+                # Left in in_flight for stop() to hand back to the queue
+                cancelled = True
+                raise
+            except Exception as e:
+                # A database error must not take the worker down with the job
+                self.failed += 1
+                logger.error("Analysis worker %s failed on content %s: %s", worker_id, content_id, e)
+            finally:
+                self.active -= 1
+                if not cancelled:
+                    self.in_flight.discard(content_id)
+
+    async def _process(self, content_id: int):
+        text = await asyncio.to_thread(_load_text, content_id)
+        if text is None:
+            return
+        try:
+            summary, sentiment = await analyze_with_retry(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error("Analysis failed for content %s: %s", content_id, e)
+            user_id = await asyncio.to_thread(_save_result, content_id, STATUS_FAILED)
+        else:
+            user_id = await asyncio.to_thread(_save_result, content_id, STATUS_COMPLETED, summary, sentiment)
+            self.processed += 1
+        if user_id is not None:
+            # Re-analysis changes the item and every list page it appears on
+            await content_cache.invalidate(user_id, content_id)
+
+
+analysis_workers = AnalysisWorkerPool(
+    settings.ANALYSIS_QUEUE_BACKEND,
+    settings.ANALYSIS_WORKERS,
+    settings.ANALYSIS_QUEUE_MAXSIZE,
+)
@@ -1,22 +1,216 @@
+import asyncio
 import json
+import math
+import re
+import time
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from fastapi import HTTPException
-from google import genai
 from app.config import settings
-from google.genai import types
 from google.api_core import exceptions
+from app.caching.analysis_cache import analysis_cache, analysis_cache_key
+from app.caching.rate_limit import TokenBucketLimiter
+from app.service.admission import ModelAdmission, ModelOverloaded
+from app.service.model_client import ModelUnavailable, ResilientModelClient
+from app.service.model_backends import create_model_backend, genai_errors
+from app.service.local_analyzer import local_analyzer
+from app.metrics import model_call_duration
 import logging
 
 logger = logging.getLogger(__name__)
 
-GEMINI_API_KEY = settings.GEMINI_API_KEY
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Gemini by default; ANALYZER_BACKEND=fake swaps in the local stand-in (see model_backends)
+model_backend = create_model_backend()
+
+# Bump whenever the prompt below changes so cached analyses from the old prompt are not reused
+PROMPT_VERSION = "v1"
+
+# Past this many nested reduce steps, the combined chunk summaries go to the model as one prompt
+MAX_REDUCE_DEPTH = 3
+
+# Caps how many Gemini calls this worker has in flight; excess callers queue by priority or are shed
+model_admission = ModelAdmission(
+    settings.GEMINI_MAX_CONCURRENCY,
+    settings.MODEL_QUEUE_MAX_WAITING,
+    settings.MODEL_QUEUE_MAX_WAIT_SECONDS,
+    TokenBucketLimiter("model_budget", settings.MODEL_RATE_LIMIT_PER_SECOND, settings.MODEL_RATE_LIMIT_BURST)
+    if settings.MODEL_RATE_LIMIT_PER_SECOND > 0 else None,
+)
+
+# Retries, fallback model, circuit breaker and hedging around single model attempts.
+# Hedges only go out while no caller is queued for a model slot.
+model_client = ResilientModelClient(
+    settings.GEMINI_MODEL,
+    settings.MODEL_FALLBACK,
+    can_hedge=lambda: not model_admission.waiters,
+)
+
+analysis_stats = {
+    "in_flight": 0,
+    "waiting": 0,
+    "completed": 0,
+    "failed": 0,
+    "timed_out": 0,
+    "answered_locally": 0,
+    "escalated": 0,
+    "long_documents": 0,
+    "chunks": 0,
+}
+
+
+def get_analysis_stats() -> dict:
+    """
+    Snapshot of the analysis queue: calls waiting for a slot, calls in flight and totals.
+    """
+    return {
+        **analysis_stats,
+        "max_concurrency": settings.GEMINI_MAX_CONCURRENCY,
+        "timeout_seconds": settings.GEMINI_TIMEOUT_SECONDS,
+        "backend": model_backend.name,
+        "backend_calls": model_backend.calls,
+        "admission": model_admission.get_stats(),
+        "resilience": model_client.get_stats(),
+    }
+
+
+@asynccontextmanager
+async def _model_slot():
+    """
+    Hold one of the GEMINI_MAX_CONCURRENCY slots for a model call and record its outcome.
+    Raises ModelOverloaded when the call is shed by admission control.
+    """
+    analysis_stats["waiting"] += 1
+    try:
+        await model_admission.acquire()
+    finally:
+        analysis_stats["waiting"] -= 1
+
+    analysis_stats["in_flight"] += 1
+    start = time.perf_counter()
+    try:
+        yield
+        analysis_stats["completed"] += 1
+        model_call_duration.labels(model_backend.name, "ok").observe(time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        analysis_stats["timed_out"] += 1
+        model_call_duration.labels(model_backend.name, "timeout").observe(time.perf_counter() - start)
+        raise
+    except Exception:
+        analysis_stats["failed"] += 1
+        model_call_duration.labels(model_backend.name, "error").observe(time.perf_counter() - start)
+        raise
+    finally:
+        analysis_stats["in_flight"] -= 1
+        model_admission.release()
+
+
+async def _attempt(prompt: str, model: str, timeout: float) -> str:
+    # One try: a model slot, then the call under its own deadline (queueing does not count against it)
+    async with _model_slot():
+        return await asyncio.wait_for(model_backend.generate(prompt, model), timeout=timeout)
+
+
+async def generate(prompt: str) -> Tuple[str, str]:
+    """
+    Run one model call, bounded by the concurrency limit and the per-call deadline,
+    with the retry, fallback and hedging policies of model_client.
+    Returns the raw response and the model that gave it.
+    """
+    return await model_client.call(_attempt, prompt)
+
+
+async def generate_stream(prompt: str, model: str) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of generate(): yields response pieces as they arrive.
+    GEMINI_TIMEOUT_SECONDS bounds the whole stream, not each piece.
+    Pieces already sent cannot be taken back, so streams are not retried or hedged;
+    they do honour the circuit breaker and the fallback model through model_client.choose_model(),
+    which the caller uses to pick `model`.
+    """
+    async with _model_slot():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.GEMINI_TIMEOUT_SECONDS
+        pieces = model_backend.stream(prompt, model)
+        try:
+            while True:
+                try:
+                    piece = await asyncio.wait_for(pieces.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    model_client.record(model)
+                    return
+                yield piece
+        except Exception as e:
+            model_client.record(model, e)
+            raise
+        finally:
+            await pieces.aclose()
+
 
 async def analyze_text(text: str):
     """
     Analyze a given text: generate a summary and detect sentiment.
+    Short, clear-cut texts are answered by the local analyzer; the rest go to the model.
+    Identical texts are served from the analysis cache and concurrent duplicates share one model call.
     Returns: summary (str), sentiment (str: Positive/Negative/Neutral)
     """
-    prompt = f"""
+    local = analyze_locally(text)
+    if local is not None:
+        return local
+    result, _ = await _analyze_cached(text)
+    return result
+
+
+def _cache_key(text: str, model: Optional[str] = None) -> str:
+    # Looked up under the primary model; stored under the model that actually answered
+    return analysis_cache_key(text, model or model_client.primary, PROMPT_VERSION)
+
+
+async def _analyze_cached(text: str, depth: int = 0) -> Tuple[Tuple[str, str], str]:
+    """
+    (summary, sentiment) and the model that produced it, through the analysis cache.
+    """
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return await _analyze_model(text, depth)
+
+    async def compute():
+        result, model = await _analyze_model(text, depth)
+        return result, _cache_key(text, model)
+
+    key = _cache_key(text)
+    result, stored_key = await analysis_cache.get_or_compute(key, compute)
+    return result, model_client.primary if stored_key == key else model_client.fallback
+
+
+async def _analyze_model(text: str, depth: int = 0) -> Tuple[Tuple[str, str], str]:
+    tokens = estimate_tokens(text)
+    # Only texts that do not fit in one chunk are split, so every chunk is smaller than its document
+    if tokens > settings.LONG_DOCUMENT_MIN_TOKENS and tokens > settings.CHUNK_MAX_TOKENS and depth < MAX_REDUCE_DEPTH:
+        return await _analyze_long(text, depth)
+    return await _analyze_uncached(text)
+
+
+def analyze_locally(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Routing policy for the local tier: returns (summary, sentiment) when the text is short enough
+    and the local analyzer is confident, or None to escalate to the model.
+    """
+    if not settings.LOCAL_ANALYZER_ENABLED:
+        return None
+    if len(text) > settings.LOCAL_ANALYZER_MAX_CHARS:
+        analysis_stats["escalated"] += 1
+        return None
+    result = local_analyzer.analyze(text)
+    if result.confidence < settings.LOCAL_ANALYZER_MIN_CONFIDENCE:
+        analysis_stats["escalated"] += 1
+        return None
+    analysis_stats["answered_locally"] += 1
+    return result.summary, result.sentiment
+
+
+def _analysis_prompt(text: str) -> str:
+    # "summary" comes first so a streamed response can be shown before the sentiment arrives
+    return f"""
     You are an assistant. Summarize the following text in 2-3 sentences and detect its sentiment as Positive, Negative, or Neutral.
 
     Text:
@@ -29,38 +223,378 @@ async def analyze_text(text: str):
     }}
     """
 
-    try:
-        logger.info(f"Analyzing text with Gemini API: {text}")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+
+def _parse_analysis(raw_txt: str) -> Tuple[str, str]:
+    # Extract JSON safely
+    start = raw_txt.find("{")
+    end = raw_txt.rfind("}") + 1
+    json_str = raw_txt[start:end]
+
+    data = json.loads(json_str)
+    summary = data.get("summary", "")
+    sentiment = data.get("sentiment", "Neutral")
+    return summary, sentiment
+
+
+def model_error(e: Exception) -> HTTPException:
+    """
+    Map a failed model call to the HTTP error the API returns for it.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, ModelUnavailable):
+        logger.error("%s", e)
+        return HTTPException(
+            status_code=503,
+            detail="The analysis service is temporarily unavailable. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    if isinstance(e, ModelOverloaded):
+        logger.warning("Model call shed: %s", e)
+        return HTTPException(
+            status_code=503,
+            detail="The analysis service is busy. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
         )
-        raw_txt = response.text
-
-        # Extract JSON safely
-        start = raw_txt.find("{")
-        end = raw_txt.rfind("}") + 1
-        json_str = raw_txt[start:end]
-
-        data = json.loads(json_str)
-        logger.info(f"Gemini response data: {data}")
-        summary = data.get("summary", "")
-        logger.info(f"Summary extracted: {summary}")
-        sentiment = data.get("sentiment", "Neutral")
-        logger.info(f"Sentiment extracted: {sentiment}")
-        return summary, sentiment
-    except exceptions.DeadlineExceeded:
+    if isinstance(e, (exceptions.DeadlineExceeded, asyncio.TimeoutError)):
         logger.error("Gemini response timed out")
-        raise HTTPException(status_code=504, detail="The analysis request timed out. Please try again later.")
+        return HTTPException(status_code=504, detail="The analysis request timed out. Please try again later.")
+    if isinstance(e, exceptions.ResourceExhausted):
+        logger.error("Quota limit reached: %s", e)
+        return HTTPException(status_code=429, detail="Monthly quota exceeded. Please try again later.")
+    if isinstance(e, exceptions.ServiceUnavailable):
+        logger.error("Gemini service unavailable: %s", e)
+        return HTTPException(status_code=503, detail="The analysis service is temporarily unavailable. Please try again later.")
+    errors = genai_errors()
+    if errors is not None and isinstance(e, errors.APIError):
+        # The google-genai SDK raises its own error types rather than google.api_core ones
+        logger.error("Gemini API error %s: %s", e.code, e)
+        if e.code == 429:
+            return HTTPException(status_code=429, detail="Monthly quota exceeded. Please try again later.")
+        if e.code in (500, 503):
+            return HTTPException(status_code=503, detail="The analysis service is temporarily unavailable. Please try again later.")
+        if e.code == 504:
+            return HTTPException(status_code=504, detail="The analysis request timed out. Please try again later.")
+        return HTTPException(status_code=500, detail="Internal server error communicating with AI service.")
+    if isinstance(e, exceptions.GoogleAPICallError):
+        logger.error("An unexpected Google API error occurred: %s", e)
+        return HTTPException(status_code=500, detail="Internal server error communicating with AI service.")
+    logger.error("Error analyzing text: %s", e)
+    return HTTPException(status_code=500, detail="Internal server error during text analysis")
+
+
+async def _analyze_uncached(text: str):
+    try:
+        # Length only: request bodies and model output stay out of the logs
+        logger.debug("Analyzing %s chars with %s", len(text), model_backend.name)
+        raw_txt, model = await generate(_analysis_prompt(text))
+        return _parse_analysis(raw_txt), model
+    except Exception as e:
+        raise model_error(e)
+
 
-    except exceptions.ResourceExhausted as e:
-        logger.error(f"Quota limit reached: {e}")
-        raise HTTPException(status_code=429, detail="Monthly quota exceeded. Please try again later.")
+_paragraph_split = re.compile(r"\n\s*\n")
+_sentence_split = re.compile(r"(?<=[.!?])\s+")
 
-    except exceptions.GoogleAPICallError as e:
-        logger.error(f"An unexpected Google API error occurred: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error communicating with AI service.")
 
+def _split_units(text: str, max_tokens: int) -> List[str]:
+    # Paragraphs, then sentences for oversized paragraphs, then fixed slices for oversized sentences
+    units = []
+    for paragraph in _paragraph_split.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in _sentence_split.split(paragraph):
+            max_chars = max_tokens * 4
+            units.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+    return units
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a long text into chunks of at most `max_tokens` (estimated) along paragraph and sentence lines.
+
+    Boundaries are content-defined: once a chunk holds half the budget it is closed after any unit
+    whose hash is 0 mod 4, and always before it would overflow. An edit therefore only moves the
+    boundaries near it, so the other chunks keep their exact text and their cached analyses.
+    """
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit in _split_units(text, max_tokens):
+        tokens = estimate_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+        if current_tokens >= max_tokens // 2 and zlib.crc32(unit.encode("utf-8")) % 4 == 0:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+_SENTIMENT_SCORES = {"Positive": 1.0, "Neutral": 0.0, "Negative": -1.0}
+
+
+def aggregate_sentiment(parts: List[Tuple[str, int]]) -> str:
+    """
+    Length-weighted vote over (sentiment, tokens) pairs; anything within +-0.25 of zero is Neutral.
+    """
+    total = sum(tokens for _, tokens in parts)
+    if not total:
+        return "Neutral"
+    score = sum(_SENTIMENT_SCORES.get(sentiment, 0.0) * tokens for sentiment, tokens in parts) / total
+    if score > 0.25:
+        return "Positive"
+    if score < -0.25:
+        return "Negative"
+    return "Neutral"
+
+
+async def _analyze_long(text: str, depth: int = 0) -> Tuple[Tuple[str, str], str]:
+    """
+    Map-reduce for documents too long for one prompt: every chunk goes through the analysis
+    cache (so unchanged chunks of an edited document are free) at most CHUNK_CONCURRENCY at a
+    time, the chunk summaries are summarised once more, and the sentiment is the weighted vote
+    of the chunks. The result counts as the fallback model's if it answered any part. The first
+    failing chunk cancels the others. Reduce steps nest at most MAX_REDUCE_DEPTH deep.
+    """
+    chunks = split_into_chunks(text, settings.CHUNK_MAX_TOKENS)
+    analysis_stats["long_documents"] += 1
+    analysis_stats["chunks"] += len(chunks)
+    logger.debug("Analyzing long document in %s chunks", len(chunks))
+    limit = asyncio.Semaphore(settings.CHUNK_CONCURRENCY)
+
+    async def analyze_chunk(chunk: str):
+        async with limit:
+            return await _analyze_cached(chunk)
+
+    tasks = [asyncio.ensure_future(analyze_chunk(chunk)) for chunk in chunks]
+    try:
+        answers = await asyncio.gather(*tasks)
+    except BaseException:
+        # The document fails as a whole; stop spending model calls on the rest of it
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    partials = [result for result, _ in answers]
+    models = [model for _, model in answers]
+    sentiment = aggregate_sentiment([(s, estimate_tokens(chunk)) for (_, s), chunk in zip(partials, chunks)])
+    if len(partials) == 1:
+        summary = partials[0][0]
+    else:
+        # Reduce step; chunk summaries are short, but a huge document is simply reduced again in chunks
+        combined = "\n\n".join(f"Part {i}: {summary}" for i, (summary, _) in enumerate(partials, 1))
+        (summary, _), model = await _analyze_cached(combined, depth + 1)
+        models.append(model)
+    return (summary, sentiment), next((m for m in models if m != model_client.primary), model_client.primary)
+
+
+class _SummaryStream:
+    """
+    Pulls the "summary" string out of a JSON response while it is still arriving, so each
+    streamed piece can be forwarded as plain text.
+    """
+    _start = re.compile(r'"summary"\s*:\s*"')
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos: Optional[int] = None
+        self.done = False
+
+    def feed(self, piece: str) -> str:
+        self.buffer += piece
+        if self.done:
+            return ""
+        if self.pos is None:
+            match = self._start.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+        out = []
+        buffer, i = self.buffer, self.pos
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char == "\\":
+                # Wait for the whole escape sequence before decoding it
+                length = 6 if buffer[i + 1:i + 2] == "u" else 2
+                if i + length > len(buffer):
+                    break
+                out.append(json.loads(f'"{buffer[i:i + length]}"'))
+                i += length
+                continue
+            out.append(char)
+            i += 1
+        self.pos = i
+        return "".join(out)
+
+
+async def stream_analysis(text: str) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Analyze a text while streaming the summary: yields ("summary", text piece) events as the model
+    writes them, then one ("result", (summary, sentiment)). Local and cached answers arrive as a
+    single piece. Raises HTTPException like analyze_text.
+    """
+    result = analyze_locally(text)
+    if result is None and settings.ANALYSIS_CACHE_ENABLED:
+        result = await analysis_cache.get(_cache_key(text))
+    if result is None and estimate_tokens(text) > settings.LONG_DOCUMENT_MIN_TOKENS:
+        # Map-reduce has no single stream to forward; the summary arrives in one piece
+        result, _ = await _analyze_cached(text)
+    if result is not None:
+        yield "summary", result[0]
+        yield "result", result
+        return
+
+    summary_stream = _SummaryStream()
+    pieces = []
+    try:
+        model = model_client.choose_model()
+        async for piece in generate_stream(_analysis_prompt(text), model):
+            pieces.append(piece)
+            delta = summary_stream.feed(piece)
+            if delta:
+                yield "summary", delta
+        result = _parse_analysis("".join(pieces))
+    except Exception as e:
+        raise model_error(e)
+    if settings.ANALYSIS_CACHE_ENABLED:
+        await analysis_cache.put(_cache_key(text, model), result)
+    yield "result", result
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough rule of thumb for English prose; good enough to keep prompts under budget
+    return len(text) // 4 + 1
+
+
+def pack_prompts(items: List[Tuple[int, str]], max_tokens: int, max_items: int) -> List[List[Tuple[int, str]]]:
+    """
+    Greedily group (index, text) pairs so each multi-document prompt stays under the token budget.
+    A text that is over budget on its own still gets a group of one.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for index, text in items:
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, text))
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _analyze_group(group: List[Tuple[int, str]]) -> Dict[int, Union[Tuple[Tuple[str, str], str], Exception]]:
+    # Each text's (summary, sentiment) and the model that answered it, or the exception
+    if len(group) == 1:
+        index, text = group[0]
+        try:
+            return {index: await _analyze_model(text)}
+        except Exception as e:
+            return {index: e}
+
+    documents = "\n\n".join(f"[Document {index}]\n{text}" for index, text in group)
+    prompt = f"""
+    You are an assistant. For each document below, summarize it in 2-3 sentences and detect its sentiment as Positive, Negative, or Neutral.
+
+    {documents}
+
+    Format your response as a JSON array with one object per document, like:
+    [
+        {{"index": <document number>, "summary": "<your summary>", "sentiment": "<Positive/Negative/Neutral>"}}
+    ]
+    """
+
+    try:
+        logger.info("Analyzing batch of %s texts with Gemini API", len(group))
+        raw_txt, model = await generate(prompt)
     except Exception as e:
-        logger.error(f"Error analyzing text: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error during text analysis")
+        # Shed, breaker open or retries spent: one prompt per text would only multiply the load
+        error = model_error(e)
+        return {index: error for index, _ in group}
+    try:
+        start = raw_txt.find("[")
+        end = raw_txt.rfind("]") + 1
+        data = json.loads(raw_txt[start:end])
+    except ValueError as e:
+        logger.error("Batch response could not be parsed, falling back to single prompts: %s", e)
+        data = []
+    if not isinstance(data, list):
+        data = []
+
+    results = {}
+    for item in data:
+        if not isinstance(item, dict) or "index" not in item:
+            continue
+        try:
+            index = int(item["index"])
+        except (TypeError, ValueError):
+            continue
+        results[index] = (item.get("summary", ""), item.get("sentiment", "Neutral")), model
+
+    # Anything the model dropped or mangled gets a prompt of its own
+    missing = [(index, text) for index, text in group if index not in results]
+    if missing:
+        retried = await asyncio.gather(*(_analyze_group([pair]) for pair in missing))
+        for result in retried:
+            results.update(result)
+    return {index: results[index] for index, _ in group}
+
+
+async def analyze_texts(texts: List[str]) -> List[Union[Tuple[str, str], Exception]]:
+    """
+    Analyze many texts with as few model calls as possible.
+    Cached texts are answered from the analysis cache; the rest are packed into multi-document prompts.
+    Returns one (summary, sentiment) tuple or exception per input, in input order.
+    """
+    results: List[Union[Tuple[str, str], Exception, None]] = [None] * len(texts)
+    keys = [_cache_key(text) for text in texts]
+
+    misses = []
+    duplicates: Dict[str, List[int]] = {}
+    for index, text in enumerate(texts):
+        if keys[index] in duplicates:
+            # Same text earlier in this batch: analyse once, copy the result
+            duplicates[keys[index]].append(index)
+            continue
+        duplicates[keys[index]] = [index]
+        local = analyze_locally(text)
+        if local is not None:
+            results[index] = local
+            continue
+        cached = await analysis_cache.get(keys[index]) if settings.ANALYSIS_CACHE_ENABLED else None
+        if cached is not None:
+            results[index] = cached
+        else:
+            misses.append((index, text))
+
+    groups = pack_prompts(misses, settings.BATCH_PROMPT_MAX_TOKENS, settings.BATCH_PROMPT_MAX_ITEMS)
+    for group_results in await asyncio.gather(*(_analyze_group(group) for group in groups)):
+        for index, answer in group_results.items():
+            if isinstance(answer, Exception):
+                results[index] = answer
+                continue
+            results[index], model = answer
+            if settings.ANALYSIS_CACHE_ENABLED:
+                await analysis_cache.put(_cache_key(texts[index], model), results[index])
+
+    for same_text in duplicates.values():
+        for index in same_text[1:]:
+            results[index] = results[same_text[0]]
+    return results
@@ -0,0 +1,131 @@
+import hashlib
+from collections import Counter
+from typing import Iterable, List
+from sqlalchemy import delete, func, inspect, literal_column, select, update
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.database import engine, upsert
+from app.database.models import ContentBlob, compress_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def preview_of(text: str) -> str:
+    return text[:settings.CONTENTS_PREVIEW_CHARS]
+
+
+def add_blob_refs(texts: List[str]):
+    """
+    One INSERT ... ON CONFLICT DO UPDATE that stores every distinct text once and adds one
+    reference per text, plus the texts' hashes in input order for the contents rows. Execute it in
+    the transaction that inserts those rows, so a rollback takes the references back with them.
+    """
+    hashes = [text_hash(text) for text in texts]
+    refs = Counter(hashes)
+    rows = {}
+    for blob_hash, text in zip(hashes, texts):
+        if blob_hash in rows:
+            continue
+        data, compressed = compress_text(text, settings.BLOB_COMPRESS_MIN_BYTES)
+        row = {"hash": blob_hash, "data": data, "compressed": compressed, "size": len(text), "refcount": refs[blob_hash]}
+        if engine.dialect.name == "postgresql":
+            # Only a prefix: past about 1MB of lexemes Postgres fails the whole insert
+            row["search_vector"] = func.to_tsvector(literal_column("'english'::regconfig"), text[:settings.SEARCH_VECTOR_MAX_CHARS])
+        rows[blob_hash] = row
+    # Sorted so concurrent writers lock shared blobs in the same order
+    stmt = upsert(ContentBlob).values([rows[blob_hash] for blob_hash in sorted(rows)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ContentBlob.hash],
+        set_={"refcount": ContentBlob.refcount + stmt.excluded.refcount},
+    )
+    return stmt, hashes
+
+
+def release_blob_refs(hashes: Iterable[str]) -> list:
+    """Statements dropping one reference per hash and deleting the blobs no row points at any more."""
+    refs = Counter(blob_hash for blob_hash in hashes if blob_hash)
+    statements = [
+        update(ContentBlob)
+        .where(ContentBlob.hash == blob_hash)
+        .values(refcount=ContentBlob.refcount - count)
+        .execution_options(synchronize_session=False)
+        for blob_hash, count in sorted(refs.items())
+    ]
+    if refs:
+        statements.append(
+            delete(ContentBlob)
+            .where(ContentBlob.hash.in_(list(refs)), ContentBlob.refcount <= 0)
+            .execution_options(synchronize_session=False)
+        )
+    return statements
+
+
+# Columns later releases added to contents; create_all only creates missing tables, not columns
+_ADDED_COLUMNS = (
+    ("status", "VARCHAR NOT NULL DEFAULT 'completed'"),
+    ("analyzed_at", "TIMESTAMP WITH TIME ZONE"),
+    ("blob_hash", "VARCHAR(64)"),
+    ("preview", "TEXT"),
+)
+
+
+def missing_content_columns(db: Session) -> List[str]:
+    """Columns of _ADDED_COLUMNS the contents table lacks; backfill_blobs adds them."""
+    columns = {column["name"] for column in inspect(db.get_bind()).get_columns("contents")}
+    return [name for name, _ in _ADDED_COLUMNS if name not in columns]
+
+
+def backfill_blobs(db: Session, chunk_size: int) -> int:
+    """
+    Upgrades a contents table from the inline text column: adds the missing columns, then moves
+    each row's text into content_blobs one chunk at a time, in id order. Every chunk commits on its
+    own and clears the inline text, so an interrupted run resumes where it stopped.
+    Returns the number of rows moved.
+    """
+    columns = {column["name"] for column in inspect(db.get_bind()).get_columns("contents")}
+    for name, ddl in _ADDED_COLUMNS:
+        if name not in columns:
+            db.execute(sql_text(f"ALTER TABLE contents ADD COLUMN {name} {ddl}"))
+    for index in ("ix_contents_status ON contents (status)", "ix_contents_user_id_id ON contents (user_id, id)", "ix_contents_blob_hash ON contents (blob_hash)"):
+        db.execute(sql_text(f"CREATE INDEX IF NOT EXISTS {index}"))
+    db.commit()
+    if "text" not in columns:
+        return 0
+
+    moved = 0
+    while True:
+        rows = db.execute(
+            sql_text("SELECT id, text FROM contents WHERE blob_hash IS NULL AND text IS NOT NULL ORDER BY id LIMIT :limit"),
+            {"limit": chunk_size},
+        ).all()
+        if not rows:
+            break
+        stmt, hashes = add_blob_refs([text for _, text in rows])
+        db.execute(stmt)
+        db.execute(
+            sql_text("UPDATE contents SET blob_hash = :blob_hash, preview = :preview, text = NULL WHERE id = :id"),
+            [{"id": content_id, "blob_hash": blob_hash, "preview": preview_of(text)} for (content_id, text), blob_hash in zip(rows, hashes)],
+        )
+        db.commit()
+        moved += len(rows)
+        logger.info("Moved %s contents into blobs", moved)
+    return moved
+
+
+def get_blob_stats(db: Session) -> dict:
+    """Blobs, references and stored bytes, next to the characters the texts would take inline, once per row."""
+    blobs, refs, stored, logical = db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(ContentBlob.refcount), 0),
+            func.coalesce(func.sum(func.length(ContentBlob.data)), 0),
+            func.coalesce(func.sum(ContentBlob.size * ContentBlob.refcount), 0),
+        )
+    ).one()
+    return {"blobs": blobs, "references": refs, "stored_bytes": stored, "inline_chars": logical}
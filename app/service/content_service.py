@@ -1,24 +1,38 @@
-import json
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database.models import Content, User
-from app.database.schemas import ContentCreate, ContentListResponse, ContentResponse
-from fastapi.security import OAuth2PasswordBearer
-from app.service.analyze_sentiment import analyze_text  # async AI call
-from app.caching.redis import redis_client
+import asyncio
+import orjson
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import Text, and_, func, insert, literal_column, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.database.database import AsyncSessionLocal, async_engine
+from app.database.models import Content, ContentBlob, decompress_text, text_search_vector
+from app.service.user_service import AuthenticatedUser
+from app.database.schemas import ContentBatchCreate, ContentBatchItemResponse, ContentBatchResponse, ContentCreate, ContentResponse, ContentSearchResult
+from app.service.embedding_index import get_embedding_index, index_contents, unindex_content
+from app.service.analyze_sentiment import analyze_text, analyze_texts, stream_analysis  # async AI call
+from app.service.admission import PRIORITY_BATCH, model_priority
+from app.service.blob_store import add_blob_refs, preview_of, release_blob_refs
+from app.service.content_stats import counted, stats_change
+from app.caching.redis import redis_cache
+from app.caching.content_cache import content_cache, content_cache_key, make_etag, user_contents_cache_key
+from app.service.analysis_worker import STATUS_COMPLETED, STATUS_FAILED, STATUS_PENDING, STATUS_PROCESSING, analysis_workers
 
 import logging
+from app.logging_config import SAMPLED
 from app.config import settings
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
-CACHE_KEY = "contents_cache"
 CACHE_TTL = settings.REDIS_CACHE_TTL  # default = 60 seconds
 
-async def create_user_content(content: ContentCreate, db: Session, current_user: User)-> ContentResponse:
-    logger.info(f"Creating content for user: {current_user.email}")
+async def invalidate_user_contents_cache(user_id: int, content_id: Optional[int] = None):
+    # Unconditional DEL of the list pages (and the item, when given): one round-trip, a no-op when nothing is cached
+    logger.debug("Deleting contents from Redis cache")
+    await content_cache.invalidate(user_id, content_id)
+
+async def create_user_content(content: ContentCreate, db: AsyncSession, current_user: AuthenticatedUser)-> ContentResponse:
+    logger.info("Creating content for user: %s", current_user.email, extra=SAMPLED)
     
     try:
         # Basic validation
@@ -26,121 +40,430 @@ async def create_user_content(content: ContentCreate, db: Session, current_user:
             logger.error("Content text is empty")
             raise HTTPException(status_code=400, detail="Content text cannot be empty")
     
-        # Save content first
-        new_content = Content(user_id=current_user.id, text=content.text, summary=None, sentiment=None)
+        background = settings.CONTENT_ANALYSIS_MODE == "background"
+
+        # Save content first; the text goes to the blob store, the row only points at it
+        blobs, (blob_hash,) = add_blob_refs([content.text])
+        await db.execute(blobs)
+        new_content = Content(
+            user_id=current_user.id,
+            blob_hash=blob_hash,
+            preview=preview_of(content.text),
+            summary=None,
+            sentiment=None,
+            # Inline rows stay processing until the analysis is saved with them
+            status=STATUS_PENDING if background else STATUS_PROCESSING,
+        )
         db.add(new_content)
-        db.commit()
-        db.refresh(new_content)
+        await db.commit()
+        await db.refresh(new_content)
+        # Embedding and the index's file lock stay off the event loop
+        await asyncio.to_thread(index_contents, [(new_content.id, current_user.id, content.text)])
+
+        if background:
+            # Workers fill in summary & sentiment; the caller polls GET /contents/{id} for status
+            try:
+                await analysis_workers.enqueue(new_content.id)
+            except HTTPException:
+                await db.delete(new_content)
+                await db.flush()
+                for stmt in release_blob_refs([blob_hash]):
+                    await db.execute(stmt)
+                await db.commit()
+                await asyncio.to_thread(unindex_content, new_content.id)
+                raise
+            await invalidate_user_contents_cache(current_user.id)
+            logger.info("Queued content %s for analysis", new_content.id)
+            return _content_response(new_content, content.text)
 
         # Async call to AI to get summary & sentiment
-        summary, sentiment = await analyze_text(content.text)
-        logger.info(f"AI analysis complete. Summary: {summary}, Sentiment: {sentiment}")
+        try:
+            summary, sentiment = await analyze_text(content.text)
+        except HTTPException:
+            # Like the stream and batch paths, keep the row as failed rather than leave it processing
+            new_content.status = STATUS_FAILED
+            await db.commit()
+            await invalidate_user_contents_cache(current_user.id, new_content.id)
+            raise
+        logger.debug("AI analysis complete for content %s: %s", new_content.id, sentiment)
 
-        # Update DB record with AI results
+        # Update DB record with AI results, and the user's stats counters in the same transaction
         new_content.summary = summary
         new_content.sentiment = sentiment
-        db.commit()
-        cache_key = f"user_contents:{current_user.id}"
-        if redis_client:
-            try:
-                cached_data = redis_client.get(cache_key)
-                if cached_data:
-                    logger.debug("Deleting contents from Redis cache")
-                    # Convert JSON string back into list of dicts
-                    redis_client.delete(f"user_contents:{current_user.id}")
-            except Exception as e:
-                logger.error(f"Redis read error: {e}")
-        
-        logger.info(f"Content updated with AI analysis: {new_content}")
-        db.refresh(new_content)
+        new_content.status = STATUS_COMPLETED
+        new_content.analyzed_at = datetime.now(timezone.utc)
+        await db.execute(stats_change(current_user.id, added=[(sentiment, len(content.text), new_content.analyzed_at)]))
+        await db.commit()
+        # Drops the item too, in case a GET cached it while the analysis was running
+        await invalidate_user_contents_cache(current_user.id, new_content.id)
+
+        logger.debug("Content %s updated with AI analysis", new_content.id)
+        await db.refresh(new_content)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creating user content for user: {current_user.email}: {e}")
+        logger.error("Error creating user content for user: %s: %s", current_user.email, e)
+        raise HTTPException(status_code=500, detail=f"Error creating content for user: {current_user.email}")
+    logger.debug("Created content %s for user: %s", new_content.id, current_user.email)
+    return _content_response(new_content, content.text)
+
+def _content_response(content: Content, text: str) -> ContentResponse:
+    # Built from the text the caller already holds, instead of loading the row's blob back
+    return ContentResponse(id=content.id, text=text, summary=content.summary, sentiment=content.sentiment, status=content.status)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+# Strong references to detached completions so they are not garbage-collected mid-flight
+_detached_tasks = set()
+
+async def _finish_streamed_content(content_id: int, user_id: int, status: str, summary: Optional[str] = None, sentiment: Optional[str] = None) -> Optional[Content]:
+    # The request's session is closed once the response starts streaming, so use a fresh one
+    async with AsyncSessionLocal() as db:
+        content = await db.get(Content, content_id, options=[joinedload(Content.blob)])
+        if content is None:
+            return None
+        content.status = status
+        if status == STATUS_COMPLETED:
+            content.summary = summary
+            content.sentiment = sentiment
+            content.analyzed_at = datetime.now(timezone.utc)
+            await db.execute(stats_change(user_id, added=[counted(content)]))
+        await db.commit()
+    await invalidate_user_contents_cache(user_id, content_id)
+    return content
+
+async def _complete_detached(content_id: int, user_id: int, text: str):
+    # The client went away mid-stream: finish the analysis anyway so the row does not stay "processing"
+    try:
+        summary, sentiment = await analyze_text(text)
+    except HTTPException:
+        await _finish_streamed_content(content_id, user_id, STATUS_FAILED)
+        return
+    await _finish_streamed_content(content_id, user_id, STATUS_COMPLETED, summary, sentiment)
+
+async def stream_user_content(content: ContentCreate, db: AsyncSession, current_user: AuthenticatedUser) -> AsyncIterator[str]:
+    """
+    Save the content, then return server-sent events for its analysis:
+    "created" with the id, "summary" events with text as the model writes it, and finally "done"
+    with the saved row, or "error" with the status code and detail.
+    """
+    logger.info("Streaming content for user: %s", current_user.email, extra=SAMPLED)
+    if not content.text or len(content.text.strip()) == 0:
+        logger.error("Content text is empty")
+        raise HTTPException(status_code=400, detail="Content text cannot be empty")
+
+    try:
+        blobs, (blob_hash,) = add_blob_refs([content.text])
+        await db.execute(blobs)
+        new_content = Content(user_id=current_user.id, blob_hash=blob_hash, preview=preview_of(content.text), status=STATUS_PROCESSING)
+        db.add(new_content)
+        await db.commit()
+        await db.refresh(new_content)
+    except Exception as e:
+        logger.error("Error creating user content for user: %s: %s", current_user.email, e)
         raise HTTPException(status_code=500, detail=f"Error creating content for user: {current_user.email}")
-    logger.debug(f"Created content : {new_content} for user: {current_user.email}")
-    return new_content
-
-def get_all_user_contents(db: Session, current_user: User) -> List[ContentListResponse]:
-    logger.info(f"Fetching all contents for user: {current_user.email}")
-    cache_key = f"user_contents:{current_user.id}"
-    # Try cache first
-    if redis_client:
+    await asyncio.to_thread(index_contents, [(new_content.id, current_user.id, content.text)])
+    await invalidate_user_contents_cache(current_user.id)
+    content_id, user_id, text = new_content.id, current_user.id, content.text
+
+    async def events():
+        finished = False
+        try:
+            yield _sse("created", {"id": content_id, "status": STATUS_PROCESSING})
+            try:
+                async for kind, value in stream_analysis(text):
+                    if kind == "summary":
+                        yield _sse("summary", {"delta": value})
+                    else:
+                        summary, sentiment = value
+            except HTTPException as e:
+                finished = True
+                await _finish_streamed_content(content_id, user_id, STATUS_FAILED)
+                yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+                return
+            finished = True
+            saved = await _finish_streamed_content(content_id, user_id, STATUS_COMPLETED, summary, sentiment)
+            yield _sse("done", {
+                "id": content_id,
+                "text": text,
+                "summary": summary,
+                "sentiment": sentiment,
+                "status": saved.status if saved is not None else STATUS_COMPLETED,
+            })
+        finally:
+            if not finished:
+                task = asyncio.get_running_loop().create_task(_complete_detached(content_id, user_id, text))
+                _detached_tasks.add(task)
+                task.add_done_callback(_detached_tasks.discard)
+
+    return events()
+
+async def create_user_contents_batch(batch: ContentBatchCreate, db: AsyncSession, current_user: AuthenticatedUser) -> ContentBatchResponse:
+    logger.info("Creating batch of %s contents for user: %s", len(batch.texts), current_user.email)
+    if not batch.texts:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one text")
+    if len(batch.texts) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch cannot contain more than {settings.BATCH_MAX_ITEMS} texts")
+
+    background = settings.CONTENT_ANALYSIS_MODE == "background"
+    items = [ContentBatchItemResponse(index=i, status=STATUS_PENDING) for i in range(len(batch.texts))]
+    valid = []
+    for i, text in enumerate(batch.texts):
+        if not text or len(text.strip()) == 0:
+            items[i].status = STATUS_FAILED
+            items[i].error = "Content text cannot be empty"
+        else:
+            valid.append(i)
+    if not valid:
+        return ContentBatchResponse(items=items)
+
+    try:
+        # One upsert for the batch's distinct texts, then one multi-row INSERT ... RETURNING for the rows
+        blobs, hashes = add_blob_refs([batch.texts[i] for i in valid])
+        await db.execute(blobs)
+        rows = await db.execute(
+            insert(Content).returning(Content.id, sort_by_parameter_order=True),
+            [
+                {"user_id": current_user.id, "blob_hash": blob_hash, "preview": preview_of(batch.texts[i]), "status": STATUS_PENDING if background else STATUS_PROCESSING}
+                for i, blob_hash in zip(valid, hashes)
+            ],
+        )
+        ids = [r[0] for r in rows]
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error inserting content batch for user: %s: %s", current_user.email, e)
+        raise HTTPException(status_code=500, detail=f"Error creating contents for user: {current_user.email}")
+    for i, content_id in zip(valid, ids):
+        items[i].id = content_id
+    await asyncio.to_thread(index_contents, [(content_id, current_user.id, batch.texts[i]) for i, content_id in zip(valid, ids)])
+
+    if background:
+        for i in valid:
+            try:
+                await analysis_workers.enqueue(items[i].id)
+            except HTTPException as e:
+                # Row is saved as pending; a memory-queue restart or database queue will still pick it up
+                items[i].error = e.detail
+        await invalidate_user_contents_cache(current_user.id)
+        return ContentBatchResponse(items=items)
+
+    with model_priority(PRIORITY_BATCH):
+        results = await analyze_texts([batch.texts[i] for i in valid])
+    updates = []
+    completed = []
+    analyzed_at = datetime.now(timezone.utc)
+    for i, result in zip(valid, results):
+        if isinstance(result, Exception):
+            items[i].status = STATUS_FAILED
+            items[i].error = result.detail if isinstance(result, HTTPException) else "Error during text analysis"
+            updates.append({"id": items[i].id, "status": STATUS_FAILED})
+        else:
+            items[i].summary, items[i].sentiment = result
+            items[i].status = STATUS_COMPLETED
+            updates.append({"id": items[i].id, "summary": items[i].summary, "sentiment": items[i].sentiment, "status": STATUS_COMPLETED, "analyzed_at": analyzed_at})
+            completed.append((items[i].sentiment, len(batch.texts[i]), analyzed_at))
+
+    try:
+        # ORM bulk UPDATE by primary key, sent as a single executemany
+        await db.execute(update(Content), updates)
+        change = stats_change(current_user.id, added=completed)
+        if change is not None:
+            await db.execute(change)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error saving batch analysis for user: %s: %s", current_user.email, e)
+        raise HTTPException(status_code=500, detail=f"Error creating contents for user: {current_user.email}")
+    await invalidate_user_contents_cache(current_user.id)
+    return ContentBatchResponse(items=items)
+
+async def get_all_user_contents(db: AsyncSession, current_user: AuthenticatedUser, limit: int = settings.CONTENTS_PAGE_SIZE, after: Optional[int] = None, view: str = "full") -> Tuple[str, bytes, Optional[int]]:
+    """
+    One keyset page of the user's contents, ordered by id, as an encoded JSON array.
+    Returns the page's ETag, its body and the cursor for the next page (None on the last page).
+    """
+    logger.info("Fetching contents page for user: %s", current_user.email, extra=SAMPLED)
+    cache_key = user_contents_cache_key(current_user.id)
+    # Every page lives in one hash per user, so a single DEL invalidates them all
+    page_field = f"{after or 0}:{limit}:{view}"
+    # Try cache first; entries are "<etag>\n<next cursor>\n<body>" so a hit is served without re-encoding
+    if redis_cache.available():
         try:
-            cached_data = redis_client.get(cache_key)
+            cached_data = await redis_cache.execute("hget", cache_key, page_field)
             if cached_data:
-                logger.debug("Serving contents from Redis cache")
-                # Convert JSON string back into list of dicts
-                return json.loads(cached_data)
+                logger.debug("Serving contents page from Redis cache")
+                etag, next_after, body = cached_data.split("\n", 2)
+                return etag, body.encode("utf-8"), int(next_after) if next_after else None
         except Exception as e:
-            logger.error(f"Redis read error: {e}")
+            logger.error("Redis read error: %s", e)
 
     # Fallback to DB
     try:
-        results = (
-            db.query(Content.id, Content.text)
-            .filter(Content.user_id == current_user.id)
-            .all()
-        )
-        response = [{"id": r[0], "text": r[1]} for r in results]
+        if view == "preview":
+            # The stored preview column: the blobs, and the full texts, are never read
+            query = select(Content.id, Content.preview)
+        else:
+            query = select(Content.id, ContentBlob.data, ContentBlob.compressed).outerjoin(ContentBlob, ContentBlob.hash == Content.blob_hash)
+        query = query.where(Content.user_id == current_user.id)
+        if after is not None:
+            query = query.where(Content.id > after)
+        # Fetch one extra row to learn whether another page exists; served by the (user_id, id) index
+        results = (await db.execute(query.order_by(Content.id).limit(limit + 1))).all()
+        if view == "preview":
+            response = [{"id": r[0], "text": r[1]} for r in results[:limit]]
+        else:
+            response = [{"id": r[0], "text": decompress_text(r[1], r[2]) if r[1] is not None else None} for r in results[:limit]]
+        next_after = response[-1]["id"] if len(results) > limit else None
     except Exception as e:
-        logger.error(f"Error fetching user contents for user: {current_user.email}: {e}")
+        logger.error("Error fetching user contents for user: %s: %s", current_user.email, e)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching contents for user: {current_user.email}",
         )
 
-    logger.debug(f"Fetched contents from DB: {results}")
+    logger.debug("Fetched %s contents from DB", len(response))
+    body = orjson.dumps(response)
+    etag = make_etag(body)
 
     # Cache it
-    if redis_client:
+    if redis_cache.available():
         try:
-            logger.debug("Caching contents in Redis")
-            redis_client.setex(cache_key, CACHE_TTL, json.dumps(response))
+            logger.debug("Caching contents page in Redis")
+            page = f"{etag}\n{next_after if next_after is not None else ''}\n{body.decode('utf-8')}"
+            await redis_cache.pipeline(lambda pipe: pipe.hset(cache_key, page_field, page).expire(cache_key, CACHE_TTL))
         except Exception as e:
-            logger.error(f"Redis write error: {e}")
-    return results
+            logger.error("Redis write error: %s", e)
+    return etag, body, next_after
+
+def _blob_text(data: Optional[bytes], compressed: Optional[bool]) -> str:
+    # Rows an interrupted backfill-blobs has not reached yet have no blob
+    return decompress_text(data, compressed) if data is not None else ""
+
+async def search_user_contents(db: AsyncSession, current_user: AuthenticatedUser, q: str, mode: str = "text", limit: int = settings.SEARCH_PAGE_SIZE, offset: int = 0) -> Tuple[List[ContentSearchResult], Optional[int]]:
+    """
+    One page of the user's contents matching `q`, best match first.
+    mode=text: Postgres full-text search (GIN indexes over the blob's text and the summary), ranked
+    by ts_rank_cd; SQLite falls back to a case-insensitive match of every term against the text
+    (decompressed by the content_text SQL function) and summary, newest first.
+    mode=semantic: cosine similarity in the local embedding index.
+    Hits carry the full text, like GET /contents/{id}; only the page's blobs are read.
+    Returns the page and the offset of the next one (None on the last page).
+    """
+    logger.info("Searching contents for user: %s", current_user.email, extra=SAMPLED)
+    try:
+        if mode == "semantic":
+            index = get_embedding_index()
+            if index is None:
+                raise HTTPException(status_code=400, detail="Semantic search is not enabled")
+            hits = index.search(current_user.id, q, limit + 1, offset)
+            scores = dict(hits)
+            rows = (await db.execute(
+                select(Content.id, ContentBlob.data, ContentBlob.compressed, Content.summary, Content.sentiment)
+                .outerjoin(ContentBlob, ContentBlob.hash == Content.blob_hash)
+                .where(Content.user_id == current_user.id, Content.id.in_(list(scores)))
+            )).all()
+            by_id = {r[0]: r for r in rows}
+            results = [
+                ContentSearchResult(id=i, text=_blob_text(by_id[i][1], by_id[i][2]), summary=by_id[i][3], sentiment=by_id[i][4], score=scores[i])
+                for i, _ in hits if i in by_id
+            ]
+        else:
+            source = select(Content.id, ContentBlob.data, ContentBlob.compressed, Content.summary, Content.sentiment)
+            if async_engine.dialect.name == "postgresql":
+                source = source.join(ContentBlob, ContentBlob.hash == Content.blob_hash)
+                # Compressed texts cannot be indexed, so each blob carries the tsvector of its text
+                text_vector = ContentBlob.search_vector
+                summary_vector = text_search_vector(Content.summary)
+                query = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+                score = func.ts_rank_cd(text_vector.op("||")(summary_vector), query)
+                match = or_(text_vector.op("@@")(query), summary_vector.op("@@")(query))
+                order = (score.desc(), Content.id.desc())
+            else:
+                source = source.outerjoin(ContentBlob, ContentBlob.hash == Content.blob_hash)
+                text_column = func.content_text(ContentBlob.data, ContentBlob.compressed, type_=Text)
+                terms = q.split()[:10]
+                match = and_(*(
+                    or_(text_column.icontains(t, autoescape=True), Content.summary.icontains(t, autoescape=True))
+                    for t in terms
+                ))
+                score = literal_column("1.0")
+                order = (Content.id.desc(),)
+            rows = (await db.execute(
+                source.add_columns(score)
+                .where(Content.user_id == current_user.id, match)
+                .order_by(*order)
+                .offset(offset)
+                .limit(limit + 1)
+            )).all()
+            results = [ContentSearchResult(id=r[0], text=_blob_text(r[1], r[2]), summary=r[3], sentiment=r[4], score=float(r[5])) for r in rows]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error searching contents for user: %s: %s", current_user.email, e)
+        raise HTTPException(status_code=500, detail=f"Error searching contents for user: {current_user.email}")
+    next_offset = offset + limit if len(results) > limit else None
+    return results[:limit], next_offset
+
+async def get_user_content_response(content_id: int, db: AsyncSession, current_user: AuthenticatedUser) -> Tuple[str, bytes]:
+    """
+    ETag and encoded ContentResponse body for one content, from the response cache when possible.
+    Only finished rows are cached: analysed ones (analyzed_at set) and failed ones. Pending and
+    processing rows are about to change.
+    """
+    cache_key = content_cache_key(current_user.id, content_id)
+    cached = await content_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    content = await get_user_content(content_id, db, current_user)
+    # Validated straight off the ORM row and encoded in pydantic-core, with no intermediate dict
+    body = ContentResponse.model_validate(content).model_dump_json().encode("utf-8")
+    etag = make_etag(body)
+    if content.analyzed_at is not None or content.status == STATUS_FAILED:
+        await content_cache.put(cache_key, etag, body)
+    return etag, body
 
-def get_user_content(content_id: int, db: Session, current_user: User)-> ContentResponse:
-    logger.info(f"Fetching content with ID {content_id} for user: {current_user.email}")
+async def get_user_content(content_id: int, db: AsyncSession, current_user: AuthenticatedUser)-> ContentResponse:
+    logger.info("Fetching content with ID %s for user: %s", content_id, current_user.email, extra=SAMPLED)
     try:
-      content = db.query(Content).filter(Content.id == content_id, Content.user_id == current_user.id).first()
+      content = await db.scalar(select(Content).options(joinedload(Content.blob)).where(Content.id == content_id, Content.user_id == current_user.id))
       if not content:
-          logger.error(f"Content with ID {content_id} not found for user: {current_user.email}")
+          logger.error("Content with ID %s not found for user: %s", content_id, current_user.email)
           raise HTTPException(status_code=404, detail="Content not found")
     except HTTPException:
       raise
     except Exception as e:
-      logger.error(f"Error fetching user content with ID {content_id} for user: {current_user.email}: {e}")
+      logger.error("Error fetching user content with ID %s for user: %s: %s", content_id, current_user.email, e)
       raise HTTPException(status_code=500, detail=f"Error fetching content with ID {content_id} for user: {current_user.email}")
-    logger.debug(f"Fetched content: {content} for user: {current_user.email}")
+    logger.debug("Fetched content %s for user: %s", content.id, current_user.email)
     return content
 
 
-def delete_user_content(content_id: int, db: Session, current_user: User)-> dict:
-    logger.info(f"Deleting content with ID {content_id} for user: {current_user.email}")
+async def delete_user_content(content_id: int, db: AsyncSession, current_user: AuthenticatedUser)-> dict:
+    logger.info("Deleting content with ID %s for user: %s", content_id, current_user.email)
     try:
-      content = db.query(Content).filter(Content.id == content_id, Content.user_id == current_user.id).first()
+      content = await db.scalar(select(Content).options(joinedload(Content.blob)).where(Content.id == content_id, Content.user_id == current_user.id))
       if not content:
-          logger.error(f"Content with ID {content_id} not found for user: {current_user.email}")
+          logger.error("Content with ID %s not found for user: %s", content_id, current_user.email)
           raise HTTPException(status_code=404, detail="Content not found")
-      db.delete(content)
-      db.commit()
-      cache_key = f"user_contents:{current_user.id}"
-      if redis_client:
-            try:
-                cached_data = redis_client.get(cache_key)
-                if cached_data:
-                    logger.debug("Deleting contents from Redis cache")
-                    # Convert JSON string back into list of dicts
-                    redis_client.delete(f"user_contents:{current_user.id}")
-            except Exception as e:
-                logger.error(f"Redis read error: {e}")
+      change = stats_change(current_user.id, removed=[counted(content)])
+      await db.delete(content)
+      if change is not None:
+          await db.execute(change)
+      # The blob goes with its last reference, so the row must be gone first; other users' copies of
+      # the same text keep it alive
+      await db.flush()
+      for stmt in release_blob_refs([content.blob_hash]):
+          await db.execute(stmt)
+      await db.commit()
+      await asyncio.to_thread(unindex_content, content_id)
+      await invalidate_user_contents_cache(current_user.id, content_id)
     except HTTPException:
       raise
     except Exception as e:
-      logger.error(f"Error deleting user content with ID {content_id} for user: {current_user.email}: {e}")
+      logger.error("Error deleting user content with ID %s for user: %s: %s", content_id, current_user.email, e)
       raise HTTPException(status_code=500, detail=f"Error deleting content with ID {content_id} for user: {current_user.email}")
-    logger.debug(f"Deleted content with ID {content_id} for user: {current_user.email}")
+    logger.debug("Deleted content with ID %s for user: %s", content_id, current_user.email)
     return {"detail": "Content deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,151 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.database import upsert
+from app.database.models import Content, ContentBlob, ContentStat
+from app.database.schemas import ContentStatsBucket, ContentStatsResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUCKET_ALL = "all"
+SENTIMENTS = ("Positive", "Negative", "Neutral")
+
+# (sentiment, text length, analyzed_at) of one completed content
+Counted = Tuple[Optional[str], int, Optional[datetime]]
+
+
+def sentiment_key(sentiment: Optional[str]) -> str:
+    # The model is asked for Positive/Negative/Neutral; anything else is counted, not dropped
+    key = (sentiment or "").strip().capitalize()
+    return key if key in SENTIMENTS else "Other"
+
+
+def day_bucket(analyzed_at: Optional[datetime]) -> Optional[str]:
+    if analyzed_at is None:
+        return None
+    if analyzed_at.tzinfo is not None:
+        analyzed_at = analyzed_at.astimezone(timezone.utc)
+    return analyzed_at.date().isoformat()
+
+
+def counted(content: Content) -> Optional[Counted]:
+    """
+    What a content contributes to the stats: only rows completed with a sentiment, exactly the ones
+    the analysis paths and rebuild_content_stats add. Needs the row's blob loaded
+    (joinedload(Content.blob)) for the text length.
+    """
+    if content.status != "completed" or content.sentiment is None:
+        return None
+    return content.sentiment, content.blob.size if content.blob is not None else 0, content.analyzed_at
+
+
+def stats_change(user_id: int, added: Iterable[Optional[Counted]] = (), removed: Iterable[Optional[Counted]] = ()):
+    """
+    One INSERT ... ON CONFLICT DO UPDATE adding the deltas to the user's counters, or None when
+    nothing changes. Callers execute it in the transaction that writes the contents rows, so the
+    counters can never disagree with a committed row. None entries (uncounted rows) are skipped.
+    """
+    deltas: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for sign, entries in ((1, added), (-1, removed)):
+        for entry in entries:
+            if entry is None:
+                continue
+            sentiment, chars, analyzed_at = entry
+            key = sentiment_key(sentiment)
+            day = day_bucket(analyzed_at)
+            for bucket in (BUCKET_ALL, day) if day else (BUCKET_ALL,):
+                delta = deltas[(bucket, key)]
+                delta[0] += sign
+                delta[1] += sign * chars
+    rows = [
+        {"user_id": user_id, "bucket": bucket, "sentiment": sentiment, "count": count, "text_chars": chars}
+        for (bucket, sentiment), (count, chars) in deltas.items()
+        if count or chars
+    ]
+    if not rows:
+        return None
+    stmt = upsert(ContentStat).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[ContentStat.user_id, ContentStat.bucket, ContentStat.sentiment],
+        set_={
+            "count": ContentStat.count + stmt.excluded.count,
+            "text_chars": ContentStat.text_chars + stmt.excluded.text_chars,
+        },
+    )
+
+
+async def get_user_content_stats(db: AsyncSession, user_id: int) -> ContentStatsResponse:
+    """
+    Reads the "all" counters and the last CONTENT_STATS_TREND_DAYS day buckets: at most a few
+    rows per day from the primary key, however many contents the user has.
+    """
+    today = datetime.now(timezone.utc).date()
+    days = [(today - timedelta(days=n)).isoformat() for n in reversed(range(settings.CONTENT_STATS_TREND_DAYS))]
+    bucket_filter = ContentStat.bucket == BUCKET_ALL
+    if days:
+        bucket_filter = or_(bucket_filter, ContentStat.bucket >= days[0])
+    rows = await db.execute(
+        select(ContentStat.bucket, ContentStat.sentiment, ContentStat.count, ContentStat.text_chars)
+        .where(ContentStat.user_id == user_id, bucket_filter)
+    )
+
+    sentiments: Dict[str, int] = {}
+    text_chars = 0
+    trend: Dict[str, Dict[str, int]] = {day: {} for day in days}
+    for bucket, sentiment, count, chars in rows:
+        if count < 0:
+            logger.warning("Negative content stats for user %s (%s/%s); run rebuild-stats", user_id, bucket, sentiment)
+        if count <= 0:
+            continue
+        if bucket == BUCKET_ALL:
+            sentiments[sentiment] = count
+            text_chars += chars
+        elif bucket in trend:
+            trend[bucket][sentiment] = count
+    total = sum(sentiments.values())
+    return ContentStatsResponse(
+        total=total,
+        sentiments=sentiments,
+        average_text_length=round(text_chars / total, 1) if total else 0.0,
+        trend=[ContentStatsBucket(day=day, total=sum(counts.values()), sentiments=counts) for day, counts in trend.items()],
+    )
+
+
+def rebuild_content_stats(db: Session) -> int:
+    """
+    Recomputes every user's counters from the contents table, for databases that predate
+    content_stats or counters that drifted. Rows completed before analyzed_at existed only count
+    towards the totals. Run it while nothing is writing contents.
+    """
+    day = func.date(Content.analyzed_at)
+    grouped = db.execute(
+        select(Content.user_id, Content.sentiment, day, func.count(), func.coalesce(func.sum(ContentBlob.size), 0))
+        .outerjoin(ContentBlob, ContentBlob.hash == Content.blob_hash)
+        .where(Content.status == "completed", Content.sentiment.is_not(None))
+        .group_by(Content.user_id, Content.sentiment, day)
+    )
+    counters: Dict[Tuple[int, str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for user_id, sentiment, analyzed_day, count, chars in grouped:
+        key = sentiment_key(sentiment)
+        buckets = (BUCKET_ALL, str(analyzed_day)) if analyzed_day else (BUCKET_ALL,)
+        for bucket in buckets:
+            counter = counters[(user_id, bucket, key)]
+            counter[0] += count
+            counter[1] += chars
+    db.execute(delete(ContentStat))
+    if counters:
+        db.execute(
+            insert(ContentStat),
+            [
+                {"user_id": user_id, "bucket": bucket, "sentiment": sentiment, "count": count, "text_chars": chars}
+                for (user_id, bucket, sentiment), (count, chars) in counters.items()
+            ],
+        )
+    db.commit()
+    logger.info("Rebuilt content stats: %s counter rows", len(counters))
+    return len(counters)
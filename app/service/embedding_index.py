@@ -0,0 +1,324 @@
+import asyncio
+import fcntl
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_word = re.compile(r"[a-z0-9']+")
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """
+    Local hashed embedding: unigrams and bigrams hashed into `dim` buckets with a sign bit,
+    sublinear term weighting, L2-normalised. Lexical rather than truly semantic, but free,
+    deterministic and good at "more like this" over short documents.
+    """
+    words = _word.findall(text.lower())
+    features = words + [a + " " + b for a, b in zip(words, words[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % dim).astype(np.int64), signs)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class EmbeddingIndex:
+    """
+    Cosine-similarity index over content embeddings, scoped by user.
+
+    Vectors live in one (capacity x dim) float32 array and (content id, user id) pairs in a
+    parallel int64 array; with a path both are memory-mapped files, so the index survives restarts
+    without re-embedding and the OS pages it in on demand. Each user's row numbers are kept in
+    memory, so a search is one brute-force matrix-vector product over the caller's rows only:
+    cost grows with that user's corpus, not with the whole table.
+
+    With a path, every API process (and `reindex`) can share the files: a lock file serialises
+    writers, and a small state file holds the row count and a layout generation. Each process
+    picks up rows others appended, and reloads after a compaction, growth or rebuild elsewhere.
+    Writes only touch mapped memory; flush() persists them and runs off the request path.
+    """
+
+    def __init__(self, dim: int, path: Optional[str] = None, capacity: int = 1024):
+        self.dim = dim
+        self.path = path
+        self.lock = threading.Lock()
+        self.lock_file = None
+        self.dirty = False
+        self.count = 0
+        self.layout = 0
+        self.user_rows: Dict[int, List[int]] = {}
+        self.row_of: Dict[int, int] = {}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.lock_file = open(path + ".lock", "a+")
+        with self._locked():
+            if path and os.path.exists(path + ".meta"):
+                self._load()
+            else:
+                self._allocate(capacity)
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        with self.lock:
+            if self.lock_file is not None:
+                fcntl.flock(self.lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if self.lock_file is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def _open(self, suffix: str, dtype, shape, mode: str):
+        if not self.path:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path + suffix, dtype=dtype, mode=mode, shape=shape)
+
+    def _allocate(self, capacity: int):
+        self.vectors = self._open(".vectors", np.float32, (capacity, self.dim), "w+")
+        # Column 0: content id (0 = empty slot), column 1: user id (-1 = deleted)
+        self.meta = self._open(".meta", np.int64, (capacity, 2), "w+")
+        # Layout generation, rows used
+        self.state = self._open(".state", np.int64, (2,), "w+")
+        self.count = 0
+        self.layout = 0
+        self.user_rows = {}
+        self.row_of = {}
+
+    def _load(self):
+        rows = os.path.getsize(self.path + ".meta") // (2 * 8)
+        self.meta = np.memmap(self.path + ".meta", dtype=np.int64, mode="r+", shape=(rows, 2))
+        self.vectors = np.memmap(self.path + ".vectors", dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        if os.path.exists(self.path + ".state"):
+            self.state = np.memmap(self.path + ".state", dtype=np.int64, mode="r+", shape=(2,))
+        else:
+            # Written before the state file existed: the rows in use end at the first empty slot
+            empty = np.flatnonzero(self.meta[:, 0] == 0)
+            self.state = np.memmap(self.path + ".state", dtype=np.int64, mode="w+", shape=(2,))
+            self.state[1] = int(empty[0]) if len(empty) else rows
+        self.layout = int(self.state[0])
+        self.count = 0
+        self.user_rows = {}
+        self.row_of = {}
+        self._scan(int(self.state[1]))
+        logger.info("Loaded embedding index with %s vectors from %s", len(self.row_of), self.path)
+
+    def _scan(self, count: int):
+        # Map the rows from self.count up to `count`; a re-added id drops its old row
+        for row in range(self.count, count):
+            content_id, user_id = int(self.meta[row, 0]), int(self.meta[row, 1])
+            if user_id < 0:
+                continue
+            old = self.row_of.get(content_id)
+            if old is not None and old in self.user_rows.get(user_id, ()):
+                self.user_rows[user_id].remove(old)
+            self.user_rows.setdefault(user_id, []).append(row)
+            self.row_of[content_id] = row
+        self.count = count
+
+    def _sync(self):
+        """
+        Catch up with writes made by other processes since this one last held the lock.
+        Rows they only tombstoned stay mapped here until the next reload; search skips them.
+        """
+        if not self.path:
+            return
+        if int(self.state[0]) != self.layout:
+            self._load()
+        elif int(self.state[1]) > self.count:
+            self._scan(int(self.state[1]))
+
+    def _relayout(self):
+        # Row numbers changed or the files grew: every other process reloads
+        self.state[0] += 1
+        self.layout = int(self.state[0])
+        self.dirty = True
+
+    def _grow(self):
+        capacity = max(len(self.meta) * 2, 1024)
+        if not self.path:
+            vectors, meta = self.vectors, self.meta
+            self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            self.meta = np.zeros((capacity, 2), dtype=np.int64)
+            self.vectors[:len(vectors)] = vectors
+            self.meta[:len(meta)] = meta
+            return
+        # Extend the files in place: other processes' maps of the old size stay valid until they reload
+        self.vectors.flush()
+        self.meta.flush()
+        del self.vectors, self.meta
+        os.truncate(self.path + ".vectors", capacity * self.dim * 4)
+        os.truncate(self.path + ".meta", capacity * 2 * 8)
+        self.vectors = np.memmap(self.path + ".vectors", dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.meta = np.memmap(self.path + ".meta", dtype=np.int64, mode="r+", shape=(capacity, 2))
+        self._relayout()
+
+    def _compact(self):
+        """
+        Move the live rows to the front, reclaiming the slots of removed and replaced contents.
+        """
+        live = np.flatnonzero(self.meta[:self.count, 1] >= 0)
+        self.vectors[:len(live)] = self.vectors[live]
+        self.meta[:len(live)] = self.meta[live]
+        self.meta[len(live):self.count] = 0
+        self.user_rows = {}
+        self.row_of = {}
+        self.count = 0
+        self._scan(len(live))
+        self.state[1] = self.count
+        self._relayout()
+        logger.info("Compacted embedding index to %s vectors", self.count)
+
+    def _make_room(self):
+        # Reclaim tombstones when they are at least half the rows, grow otherwise
+        dead = self.count - int(np.count_nonzero(self.meta[:self.count, 1] >= 0))
+        if dead * 2 >= self.count > 0:
+            self._compact()
+        if self.count == len(self.meta):
+            self._grow()
+
+    def add_many(self, items: Iterable[Tuple[int, int, str]]):
+        """
+        Index (content id, user id, text) triples; re-adding an id replaces its vector.
+        """
+        embedded = [(content_id, user_id, embed(text, self.dim)) for content_id, user_id, text in items]
+        if not embedded:
+            return
+        with self._locked():
+            self._sync()
+            for content_id, user_id, vector in embedded:
+                self._remove(content_id)
+                if self.count == len(self.meta):
+                    self._make_room()
+                row = self.count
+                self.vectors[row] = vector
+                self.meta[row] = (content_id, user_id)
+                self.user_rows.setdefault(user_id, []).append(row)
+                self.row_of[content_id] = row
+                self.count += 1
+            self.state[1] = self.count
+            self.dirty = True
+
+    def add(self, content_id: int, user_id: int, text: str):
+        self.add_many([(content_id, user_id, text)])
+
+    def remove(self, content_id: int):
+        with self._locked():
+            self._sync()
+            if self._remove(content_id):
+                self.dirty = True
+
+    def _remove(self, content_id: int) -> bool:
+        row = self.row_of.pop(content_id, None)
+        if row is None:
+            return False
+        user_id = int(self.meta[row, 1])
+        if user_id < 0:
+            # Another process removed it already
+            return False
+        self.meta[row, 1] = -1
+        self.user_rows[user_id].remove(row)
+        return True
+
+    def clear(self):
+        with self._locked():
+            self._sync()
+            self.meta[:] = 0
+            self.count = 0
+            self.user_rows = {}
+            self.row_of = {}
+            self.state[1] = 0
+            self._relayout()
+
+    def search(self, user_id: int, query: str, limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+        """
+        (content id, cosine similarity) pairs for the user's closest contents, best first.
+        """
+        query_vector = embed(query, self.dim)
+        if not query_vector.any():
+            return []
+        with self._locked(shared=True):
+            self._sync()
+            rows = self.user_rows.get(user_id)
+            if not rows:
+                return []
+            rows = np.asarray(rows)
+            rows = rows[self.meta[rows, 1] == user_id]
+            if not len(rows):
+                return []
+            scores = self.vectors[rows] @ query_vector
+            wanted = min(offset + limit, len(rows))
+            # Partial sort: only the top `wanted` scores are ordered
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            top = top[np.argsort(-scores[top], kind="stable")][offset:]
+            return [(int(self.meta[rows[i], 0]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def flush(self):
+        """
+        Write the mapped pages back to the files, if anything changed since the last flush.
+        """
+        with self.lock:
+            if not self.dirty or not self.path:
+                return
+            self.vectors.flush()
+            self.meta.flush()
+            self.state.flush()
+            self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+
+_index: Optional[EmbeddingIndex] = None
+
+
+def get_embedding_index() -> Optional[EmbeddingIndex]:
+    """
+    The process-wide index, opened on first use; None when EMBEDDING_INDEX_ENABLED is off.
+    """
+    global _index
+    if not settings.EMBEDDING_INDEX_ENABLED:
+        return None
+    if _index is None:
+        _index = EmbeddingIndex(settings.EMBEDDING_DIM, settings.EMBEDDING_INDEX_PATH or None)
+    return _index
+
+
+def index_contents(items: Iterable[Tuple[int, int, str]]):
+    index = get_embedding_index()
+    if index is not None:
+        index.add_many(items)
+
+
+def unindex_content(content_id: int):
+    index = get_embedding_index()
+    if index is not None:
+        index.remove(content_id)
+
+
+def flush_embedding_index():
+    if _index is not None:
+        _index.flush()
+
+
+async def flush_periodically(interval: float):
+    """
+    Persist the index every `interval` seconds in a thread, so requests never wait on msync.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_embedding_index)
+        except Exception as e:
+            logger.error("Could not flush the embedding index: %s", e)
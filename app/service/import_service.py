@@ -0,0 +1,171 @@
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import insert
+from app.config import settings
+from app.database.database import SessionLocal
+from app.database.models import Content
+from app.database.schemas import ContentImportResponse
+from app.service.analysis_worker import STATUS_PENDING, AnalysisWorkerPool, analysis_workers
+from app.service.blob_store import add_blob_refs, preview_of
+from app.service.embedding_index import index_contents
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Only the first few bad lines are echoed back; the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+Checkpoint = Callable[[int, int], Awaitable[None]]
+Throttle = Callable[[int], Awaitable[None]]
+
+
+async def iter_ndjson_stream(chunks: AsyncIterator[bytes], start_line: int = 0) -> AsyncIterator[Tuple[int, int, bytes]]:
+    """
+    Split a byte stream into (line number, end byte offset, line) without buffering more than one partial line.
+    Lines up to and including `start_line` are skipped without being parsed.
+    """
+    # Pieces of the current partial line, joined once it ends, so a long line is not re-copied per chunk
+    pieces: List[bytes] = []
+    line_no = 0
+    offset = 0
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            pieces.append(chunk[start:end])
+            line = b"".join(pieces)
+            pieces.clear()
+            start = end + 1
+            line_no += 1
+            offset += len(line) + 1
+            if line_no > start_line:
+                yield line_no, offset, line
+        if start < len(chunk):
+            pieces.append(chunk[start:])
+    if pieces:
+        line = b"".join(pieces)
+        line_no += 1
+        offset += len(line)
+        if line_no > start_line:
+            yield line_no, offset, line
+
+
+async def iter_ndjson_file(lines: Iterator[bytes], start_line: int = 0, start_offset: int = 0) -> AsyncIterator[Tuple[int, int, bytes]]:
+    """
+    Same contract as iter_ndjson_stream for a binary file object that has already been seeked to `start_offset`.
+    """
+    line_no = start_line
+    offset = start_offset
+    for line in lines:
+        line_no += 1
+        offset += len(line)
+        yield line_no, offset, line.rstrip(b"\r\n")
+        # File iteration is synchronous; yield to the loop so analysis workers keep running
+        await asyncio.sleep(0)
+
+
+def _insert_chunk(rows: List[dict]) -> List[int]:
+    with SessionLocal() as db:
+        blobs, hashes = add_blob_refs([row["text"] for row in rows])
+        db.execute(blobs)
+        result = db.execute(
+            insert(Content).returning(Content.id, sort_by_parameter_order=True),
+            [
+                {"user_id": row["user_id"], "blob_hash": blob_hash, "preview": preview_of(row["text"]), "status": row["status"]}
+                for row, blob_hash in zip(rows, hashes)
+            ],
+        )
+        ids = [r[0] for r in result]
+        db.commit()
+    index_contents((content_id, row["user_id"], row["text"]) for content_id, row in zip(ids, rows))
+    return ids
+
+
+async def import_ndjson(
+    lines: AsyncIterator[Tuple[int, int, bytes]],
+    user_id: int,
+    field: str = "text",
+    chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+    checkpoint: Optional[Checkpoint] = None,
+    throttle: Optional[Throttle] = None,
+    analyze: bool = True,
+    start_line: int = 0,
+    start_offset: int = 0,
+) -> ContentImportResponse:
+    """
+    Stream NDJSON records into contents in fixed-size chunks.
+
+    Rows are written as pending and fed to the analysis workers. When the shared worker pool is not running
+    (the CLI), a private pool is started and the import returns once it has analysed every row. Either way
+    the producer waits whenever the analysis queue is full, so memory stays bounded by chunk size + queue
+    size regardless of input size.
+    `checkpoint(line, offset)` is awaited after every committed chunk; `start_line`/`start_offset` are where
+    `lines` resumes from. `throttle(rows)` is awaited before each chunk is written, so a rate limit can
+    slow the import down.
+    """
+    result = ContentImportResponse(last_line=start_line)
+    pool = None
+    own_pool = False
+    if analyze:
+        if analysis_workers.accepting:
+            pool = analysis_workers
+        else:
+            pool = AnalysisWorkerPool("memory", settings.IMPORT_ANALYSIS_WORKERS, settings.IMPORT_ANALYSIS_QUEUE_SIZE)
+            await pool.start(recover=False)
+            own_pool = True
+
+    rows: List[dict] = []
+    last_line = start_line
+    last_offset = start_offset
+
+    async def flush():
+        if throttle:
+            await throttle(len(rows))
+        ids = await asyncio.to_thread(_insert_chunk, rows)
+        result.imported += len(ids)
+        result.last_line = last_line
+        if checkpoint:
+            await checkpoint(last_line, last_offset)
+        rows.clear()
+        if pool:
+            for content_id in ids:
+                await pool.submit(content_id)
+
+    try:
+        async for line_no, offset, line in lines:
+            last_line, last_offset = line_no, offset
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                text = record[field]
+                if not isinstance(text, str) or not text.strip():
+                    raise ValueError(f"'{field}' must be a non-empty string")
+            except (ValueError, KeyError, TypeError) as e:
+                result.failed += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append(f"line {line_no}: {e}")
+                continue
+            rows.append({"user_id": user_id, "text": text, "status": STATUS_PENDING})
+            if len(rows) >= chunk_size:
+                await flush()
+        if rows:
+            await flush()
+        result.last_line = last_line
+        if checkpoint:
+            await checkpoint(last_line, last_offset)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Import failed after line %s: %s", result.last_line, e)
+        raise HTTPException(status_code=500, detail=f"Import failed; resume from line {result.last_line}")
+    finally:
+        if own_pool:
+            # Wait for this import's analyses before returning
+            await pool.stop(timeout=float("inf"))
+    logger.info("Imported %s contents for user %s (%s failed lines)", result.imported, user_id, result.failed)
+    return result
@@ -0,0 +1,101 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+import numpy as np
+
+# Word weights in [-1, 1]; anything not listed carries no sentiment
+LEXICON: Dict[str, float] = {
+    "good": 0.6, "great": 0.8, "excellent": 0.9, "amazing": 0.9, "awesome": 0.9, "wonderful": 0.9,
+    "fantastic": 0.9, "love": 0.8, "loved": 0.8, "loves": 0.8, "like": 0.4, "liked": 0.4, "enjoy": 0.6,
+    "enjoyed": 0.6, "happy": 0.7, "glad": 0.6, "pleased": 0.6, "best": 0.8, "better": 0.4, "nice": 0.5,
+    "perfect": 0.9, "recommend": 0.6, "fast": 0.3, "easy": 0.4, "helpful": 0.6, "reliable": 0.5,
+    "beautiful": 0.7, "brilliant": 0.8, "impressive": 0.7, "thanks": 0.4, "thank": 0.4, "win": 0.5,
+    "bad": -0.6, "terrible": -0.9, "awful": -0.9, "horrible": -0.9, "worst": -0.9, "worse": -0.5,
+    "hate": -0.8, "hated": -0.8, "poor": -0.6, "sad": -0.6, "angry": -0.7, "annoying": -0.6,
+    "disappointed": -0.7, "disappointing": -0.7, "broken": -0.6, "slow": -0.3, "bug": -0.4, "bugs": -0.4,
+    "crash": -0.6, "crashes": -0.6, "fail": -0.6, "failed": -0.6, "fails": -0.6, "useless": -0.8,
+    "waste": -0.7, "refund": -0.4, "problem": -0.4, "problems": -0.4, "issue": -0.3, "issues": -0.3,
+    "expensive": -0.3, "difficult": -0.4, "confusing": -0.5, "ugly": -0.6, "lose": -0.5, "lost": -0.4,
+}
+NEGATORS = frozenset(["not", "no", "never", "isn't", "wasn't", "don't", "doesn't", "didn't", "can't", "won't", "hardly"])
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or that the this to was were will with you we they".split()
+)
+
+_word = re.compile(r"[a-z']+")
+_sentence_split = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass(frozen=True)
+class LocalAnalysis:
+    summary: str
+    sentiment: str
+    confidence: float
+
+
+class LocalAnalyzer:
+    """
+    In-process sentiment and extractive summary, cheap enough to try before every model call.
+
+    Sentiment is a lexicon score computed over a token-id array (negators flip the following word).
+    Confidence is high only when the sentiment words agree with each other and there are enough of
+    them, so mixed or sentiment-free texts come back with low confidence and are left to the model.
+    """
+
+    def __init__(self, lexicon: Dict[str, float] = LEXICON, neutral_band: float = 0.2):
+        self.vocabulary = {word: i for i, word in enumerate(lexicon)}
+        self.weights = np.fromiter(lexicon.values(), dtype=np.float32, count=len(lexicon))
+        self.neutral_band = neutral_band
+
+    def analyze(self, text: str, max_sentences: int = 2) -> LocalAnalysis:
+        sentiment, confidence = self.sentiment(text)
+        return LocalAnalysis(self.summarize(text, max_sentences), sentiment, confidence)
+
+    def sentiment(self, text: str):
+        tokens = _word.findall(text.lower())
+        if not tokens:
+            return "Neutral", 0.0
+        ids = np.fromiter((self.vocabulary.get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+        negated = np.fromiter((t in NEGATORS for t in tokens), dtype=bool, count=len(tokens))
+        # A negator flips the word right after it ("not good")
+        sign = np.where(np.roll(negated, 1) & (np.arange(len(tokens)) > 0), -1.0, 1.0)
+        hits = ids >= 0
+        if not hits.any():
+            return "Neutral", 0.0
+        weights = self.weights[ids[hits]] * sign[hits]
+        total = float(weights.sum())
+        magnitude = float(np.abs(weights).sum())
+        # Agreement: 1 when every hit points the same way; evidence saturates after ~1.5 units of weight
+        confidence = (abs(total) / magnitude) * min(1.0, magnitude / 1.5)
+        score = total / np.sqrt(len(tokens))
+        if score > self.neutral_band:
+            return "Positive", confidence
+        if score < -self.neutral_band:
+            return "Negative", confidence
+        return "Neutral", confidence
+
+    def summarize(self, text: str, max_sentences: int = 2) -> str:
+        sentences = [s.strip() for s in _sentence_split.split(text.strip()) if s.strip()]
+        if len(sentences) <= max_sentences:
+            return " ".join(sentences)
+        tokenized: List[List[str]] = [
+            [w for w in _word.findall(s.lower()) if w not in STOPWORDS] for s in sentences
+        ]
+        vocabulary: Dict[str, int] = {}
+        for words in tokenized:
+            for w in words:
+                vocabulary.setdefault(w, len(vocabulary))
+        if not vocabulary:
+            return " ".join(sentences[:max_sentences])
+        # Sentence x term count matrix; a sentence scores the mean document frequency of its words
+        counts = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+        for row, words in enumerate(tokenized):
+            for w in words:
+                counts[row, vocabulary[w]] += 1
+        frequency = counts.sum(axis=0) / counts.sum()
+        scores = (counts @ frequency) / np.maximum(counts.sum(axis=1), 1)
+        best = np.sort(np.argsort(-scores, kind="stable")[:max_sentences])
+        return " ".join(sentences[i] for i in best)
+
+
+local_analyzer = LocalAnalyzer()
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import sys
+from types import ModuleType
+from typing import AsyncIterator, Optional
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def genai_errors() -> Optional[ModuleType]:
+    """
+    google.genai.errors if the SDK has been imported, else None. The SDK takes about half a second
+    to import, so it is only loaded once a Gemini client is needed; until then none of its errors
+    can have been raised, and callers can skip the isinstance checks against them.
+    """
+    return sys.modules.get("google.genai.errors")
+
+
+class ModelBackend:
+    """
+    What analyze_text needs from a model: one prompt in, the raw response text out.
+    Errors should be raised as google.genai.errors so callers map them the same way for every backend.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.calls = 0
+
+    def warm(self):
+        """
+        Do any slow one-off setup (imports, clients) now rather than on the first call. Blocking; run in a thread.
+        """
+
+    async def generate(self, prompt: str, model: str) -> str:
+        raise NotImplementedError
+
+    async def stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        """
+        Yield the response text in pieces as it is generated. Backends without streaming send it in one piece.
+        """
+        yield await self.generate(prompt, model)
+
+
+class GeminiBackend(ModelBackend):
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str]):
+        super().__init__()
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        # Built on first use: importing the SDK and constructing the client is the slowest part of a cold start
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def warm(self):
+        self.client
+
+    async def generate(self, prompt: str, model: str) -> str:
+        self.calls += 1
+        response = await self.client.aio.models.generate_content(model=model, contents=prompt)
+        return response.text
+
+    async def stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        self.calls += 1
+        async for chunk in await self.client.aio.models.generate_content_stream(model=model, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+_positive_words = {"good", "great", "excellent", "love", "happy", "amazing", "wonderful", "best", "fantastic", "like"}
+_negative_words = {"bad", "terrible", "awful", "hate", "sad", "worst", "poor", "horrible", "angry", "broken"}
+_word = re.compile(r"[a-z']+")
+_document = re.compile(r"\[Document (\d+)\]\n(.*?)(?=\n\n\[Document \d+\]|\n\s*Format your response)", re.S)
+_single_text = re.compile(r"Text:\n(.*?)\n\s*Format your response", re.S)
+
+
+class FakeBackend(ModelBackend):
+    """
+    Deterministic local stand-in for Gemini, for tests and benchmarks.
+
+    Answers the same prompts analyze_text sends (single and multi-document) with well-formed JSON:
+    the first sentence as summary and a word-list sentiment. Latency and failures are injected
+    from a seeded RNG so runs are repeatable.
+    """
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    async def generate(self, prompt: str, model: str) -> str:
+        self.calls += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._respond(prompt)
+
+    async def stream(self, prompt: str, model: str, pieces: int = 8) -> AsyncIterator[str]:
+        """
+        First piece after a tenth of the configured latency, the rest spread over the remainder,
+        roughly how a streaming model front-loads time to first token.
+        """
+        self.calls += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay * 0.1)
+        text = self._respond(prompt)
+        size = max(1, -(-len(text) // pieces))
+        for start in range(0, len(text), size):
+            if start and delay:
+                await asyncio.sleep(delay * 0.9 / pieces)
+            yield text[start:start + size]
+
+    def _delay(self) -> float:
+        return (self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000
+
+    def _respond(self, prompt: str) -> str:
+        if self.error_rate and self.random.random() < self.error_rate:
+            # Alternate between the two transient failures Gemini actually returns
+            from google.genai import errors
+            if self.random.random() < 0.5:
+                raise errors.ClientError(429, {"error": {"code": 429, "message": "injected", "status": "RESOURCE_EXHAUSTED"}})
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "injected", "status": "UNAVAILABLE"}})
+
+        documents = _document.findall(prompt)
+        if documents:
+            return json.dumps([
+                {"index": int(index), **self.analyze(text)} for index, text in documents
+            ])
+        match = _single_text.search(prompt)
+        return json.dumps(self.analyze(match.group(1) if match else prompt))
+
+    @staticmethod
+    def analyze(text: str) -> dict:
+        text = text.strip()
+        words = _word.findall(text.lower())
+        score = sum(w in _positive_words for w in words) - sum(w in _negative_words for w in words)
+        if score > 0:
+            sentiment = "Positive"
+        elif score < 0:
+            sentiment = "Negative"
+        else:
+            sentiment = "Neutral"
+        first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+        return {"summary": f"{first_sentence[:200]} [{digest}]", "sentiment": sentiment}
+
+
+def create_model_backend() -> ModelBackend:
+    if settings.ANALYZER_BACKEND == "fake":
+        return FakeBackend(
+            latency_ms=settings.FAKE_MODEL_LATENCY_MS,
+            jitter_ms=settings.FAKE_MODEL_JITTER_MS,
+            error_rate=settings.FAKE_MODEL_ERROR_RATE,
+            seed=settings.FAKE_MODEL_SEED,
+        )
+    return GeminiBackend(settings.GEMINI_API_KEY)
@@ -0,0 +1,221 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from google.api_core import exceptions
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
+from app.config import settings
+from app.service.model_backends import genai_errors
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One model attempt: (prompt, model name, timeout in seconds) -> raw response text
+Attempt = Callable[[str, str, float], Awaitable[str]]
+
+TRANSIENT_API_CODES = {429, 500, 502, 503, 504}
+
+
+class ModelUnavailable(Exception):
+    """Raised without calling the model while its circuit breaker is open and there is no fallback."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+def is_transient(e: BaseException) -> bool:
+    """
+    Errors worth another attempt: timeouts, throttling and 5xx from the model service.
+    """
+    if isinstance(e, (asyncio.TimeoutError, exceptions.DeadlineExceeded, exceptions.ResourceExhausted, exceptions.ServiceUnavailable)):
+        return True
+    errors = genai_errors()
+    return errors is not None and isinstance(e, errors.APIError) and e.code in TRANSIENT_API_CODES
+
+
+def is_throttled(e: BaseException) -> bool:
+    if isinstance(e, exceptions.ResourceExhausted):
+        return True
+    errors = genai_errors()
+    return errors is not None and isinstance(e, errors.APIError) and e.code == 429
+
+
+class ModelBreaker:
+    """
+    Per-model circuit breaker: after `threshold` consecutive transient failures the model is skipped
+    for `reset_seconds`; the next call after that is a trial, and one more failure reopens it.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.open_until = 0.0
+
+    def allow(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.open_until = time.monotonic() + self.reset_seconds
+
+
+class LatencyTracker:
+    """
+    Recent successful call latencies, for choosing when to hedge.
+    """
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self.samples) < min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class ResilientModelClient:
+    """
+    Wraps single model attempts with the policies a flaky, rate-limited API needs:
+
+    - retries: transient errors are retried with jittered exponential backoff, at most
+      MODEL_MAX_ATTEMPTS times and within MODEL_TOTAL_TIMEOUT_SECONDS overall; each attempt gets
+      GEMINI_TIMEOUT_SECONDS or whatever is left of the budget, if less.
+    - fallback: once the primary model is throttled (429) or its breaker is open, attempts go to
+      MODEL_FALLBACK instead.
+    - circuit breaker: a model failing MODEL_BREAKER_THRESHOLD times in a row is skipped for
+      MODEL_BREAKER_RESET_SECONDS, so callers fail fast instead of queueing behind timeouts.
+    - hedging (MODEL_HEDGE_ENABLED): if an attempt is still running after the recent
+      MODEL_HEDGE_QUANTILE latency, a second identical attempt is started and the first answer
+      wins. Hedges are skipped while `can_hedge()` is false, i.e. when model slots are contended.
+    """
+
+    def __init__(self, primary: str, fallback: Optional[str] = None, can_hedge: Callable[[], bool] = lambda: True):
+        self.primary = primary
+        self.fallback = fallback or None
+        self.can_hedge = can_hedge
+        self.breakers: Dict[str, ModelBreaker] = {}
+        self.latency = LatencyTracker()
+        self.stats = {"attempts": 0, "retries": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0, "short_circuited": 0}
+
+    def breaker(self, model: str) -> ModelBreaker:
+        breaker = self.breakers.get(model)
+        if breaker is None:
+            breaker = self.breakers[model] = ModelBreaker(settings.MODEL_BREAKER_THRESHOLD, settings.MODEL_BREAKER_RESET_SECONDS)
+        return breaker
+
+    def choose_model(self, throttled: bool = False) -> str:
+        """
+        The model the next attempt should use; raises ModelUnavailable when none is healthy.
+        """
+        model = self.primary
+        if self.fallback and (throttled or not self.breaker(self.primary).allow()):
+            model = self.fallback
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise ModelUnavailable(f"Model {model} is failing; circuit breaker is open", breaker.open_until - time.monotonic())
+        if model != self.primary:
+            self.stats["fallbacks"] += 1
+        return model
+
+    def record(self, model: str, error: Optional[BaseException] = None):
+        if error is None:
+            self.breaker(model).record_success()
+        elif is_transient(error):
+            self.breaker(model).record_failure()
+
+    async def call(self, attempt: Attempt, prompt: str) -> Tuple[str, str]:
+        """
+        Returns the response and the model that gave it, which is the fallback once it took over.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.MODEL_TOTAL_TIMEOUT_SECONDS
+        throttled = False
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(settings.MODEL_MAX_ATTEMPTS) | stop_after_delay(settings.MODEL_TOTAL_TIMEOUT_SECONDS),
+            wait=wait_random_exponential(multiplier=settings.MODEL_RETRY_BACKOFF_SECONDS, max=settings.MODEL_RETRY_MAX_BACKOFF_SECONDS),
+            retry=retry_if_exception(is_transient),
+            before_sleep=self._log_retry,
+            reraise=True,
+        )
+        async for attempt_state in retrying:
+            with attempt_state:
+                model = self.choose_model(throttled)
+                try:
+                    return await self._hedged(attempt, prompt, model, deadline - loop.time()), model
+                except Exception as e:
+                    throttled = throttled or is_throttled(e)
+                    raise
+
+    def _log_retry(self, retry_state):
+        self.stats["retries"] += 1
+        logger.warning(
+            "Transient model error (%s), retry %s in %.2fs",
+            retry_state.outcome.exception(), retry_state.attempt_number, retry_state.next_action.sleep,
+        )
+
+    async def _hedged(self, attempt: Attempt, prompt: str, model: str, remaining: float) -> str:
+        timeout = min(settings.GEMINI_TIMEOUT_SECONDS, remaining)
+        if timeout <= 0:
+            raise asyncio.TimeoutError()
+        delay = self._hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._timed(attempt, prompt, model, timeout)
+
+        first = asyncio.ensure_future(self._timed(attempt, prompt, model, timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not self.can_hedge():
+            return await first
+        self.stats["hedges"] += 1
+        hedge = asyncio.ensure_future(self._timed(attempt, prompt, model, timeout - delay))
+        pending = {first, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, attempt: Attempt, prompt: str, model: str, timeout: float) -> str:
+        self.stats["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            result = await attempt(prompt, model, timeout)
+        except Exception as e:
+            self.record(model, e)
+            raise
+        self.record(model)
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not settings.MODEL_HEDGE_ENABLED:
+            return None
+        return self.latency.quantile(settings.MODEL_HEDGE_QUANTILE, settings.MODEL_HEDGE_MIN_SAMPLES)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "primary": self.primary,
+            "fallback": self.fallback,
+            "open_breakers": [model for model, breaker in self.breakers.items() if not breaker.allow()],
+            "hedge_after_seconds": self._hedge_delay(),
+        }
@@ -1,13 +1,20 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, Request, status
 from jose import ExpiredSignatureError, JWTError
 from passlib.context import CryptContext
+from sqlalchemy import event
 import jwt
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from datetime import datetime, timedelta
 from app.config import settings
 import logging
 
-from app.database.database import get_db
+from app.database.database import SessionLocal
 from app.database.models import User
 logger = logging.getLogger(__name__)
 
@@ -27,14 +34,86 @@ def hash_password(password: str):
 def verify_password(plain, hashed):
     return pwd_context.verify(plain, hashed)
 
+
+def verify_and_update_password(plain, hashed) -> Tuple[bool, Optional[str]]:
+    """
+    Verify, and return a fresh hash when the stored one uses a scheme or cost the context marks deprecated.
+    """
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+# bcrypt gets its own executor so a login storm cannot starve the shared threadpool
+_hash_executor: Optional[Executor] = None
+_hash_pending = 0
+hash_stats = {"completed": 0, "failed": 0, "rejected": 0}
+
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        # By default the cores are shared out between the API processes
+        workers = settings.PASSWORD_HASH_WORKERS or max(1, (os.cpu_count() or 1) // settings.APP_WORKERS)
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            # bcrypt releases the GIL, but a process pool also spreads the work past one core's worth of threads
+            _hash_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    return _hash_executor
+
+
+async def _run_hashing(func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_QUEUE_LIMIT:
+        hash_stats["rejected"] += 1
+        logger.warning("Password hashing queue is full, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), func, *args)
+    except Exception:
+        hash_stats["failed"] += 1
+        raise
+    finally:
+        _hash_pending -= 1
+    hash_stats["completed"] += 1
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+
+async def verify_and_update_password_async(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hashing(verify_and_update_password, plain, hashed)
+
+
+def get_hash_stats() -> dict:
+    return {
+        **hash_stats,
+        "pending": _hash_pending,
+        "queue_limit": settings.PASSWORD_HASH_QUEUE_LIMIT,
+        "executor": settings.PASSWORD_HASH_EXECUTOR,
+    }
+
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
 def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGO])
         return payload
-    except ExpiredSignatureError as e:
+    except (ExpiredSignatureError, jwt.ExpiredSignatureError) as e:
         # Re-raise the specific exception you want to catch in the middleware
         raise ExpiredSignatureError("Token has expired") from e
-    except JWTError as e:
+    except (JWTError, jwt.InvalidTokenError) as e:
         # Re-raise the specific exception you want to catch in the middleware
         raise JWTError("Invalid token") from e
     
@@ -46,7 +125,61 @@ def create_token(data: dict):
     payload["nbf"] = datetime.utcnow()
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGO)
 
-def get_current_user(request: Request) -> User:
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """
+    What the routes need to know about the caller. Attached to request.state.user by JWTMiddleware
+    in place of a User row, so authenticating a request does not need a DB session.
+    """
+    id: int
+    email: str
+
+
+# user id -> AuthenticatedUser for users recently confirmed to exist
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+
+def _load_principal(user_id: int) -> Optional[AuthenticatedUser]:
+    with SessionLocal() as db:
+        row = db.query(User.id, User.email).filter(User.id == user_id).first()
+        if not row:
+            return None
+        return AuthenticatedUser(id=row[0], email=row[1])
+
+
+async def resolve_principal(payload: dict) -> Optional[AuthenticatedUser]:
+    """
+    Map verified token claims to the caller. With AUTH_TRUST_TOKEN_CLAIMS the claims are used as-is;
+    otherwise the user's existence is confirmed once per PRINCIPAL_CACHE_TTL seconds.
+    """
+    user_id = payload.get("id")
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and payload.get("email"):
+        return AuthenticatedUser(id=user_id, email=payload["email"])
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = await asyncio.to_thread(_load_principal, user_id)
+        if principal is not None:
+            principal_cache[user_id] = principal
+    return principal
+
+
+def invalidate_principal(user_id: int):
+    """
+    Call when a user is deleted or their email changes so the next request re-reads the row.
+    Only this process's cache is cleared; other processes notice within PRINCIPAL_CACHE_TTL.
+    """
+    principal_cache.pop(user_id, None)
+
+
+# Every ORM delete or update of a user goes through here, whichever route or command issues it
+@event.listens_for(User, "after_delete")
+@event.listens_for(User, "after_update")
+def _forget_principal(mapper, connection, user: User):
+    invalidate_principal(user.id)
+
+
+def get_current_user(request: Request) -> AuthenticatedUser:
     if not hasattr(request.state, "user") or request.state.user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,146 @@
+"""
+Storage and read cost of contents text held inline (before) versus in the deduplicated,
+compressed blob store (after).
+
+    python -m benchmarks.bench_blob_store --rows 20000 --distinct 2000 --users 100
+
+Builds two SQLite databases from the same rows: one with the old inline `contents.text` column and
+one through the same add_blob_refs/preview path the API uses. Rows are drawn from `--distinct`
+articles of 300-6000 characters, so on average each text is uploaded rows/distinct times. Reports
+the database file sizes, then the time to page through every user's contents the way GET /contents
+does, with the full text and with view=preview.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_blob_store.db")
+LEGACY_PATH = os.path.join(tempfile.gettempdir(), "bench_blob_store_inline.db")
+for path in (DB_PATH, LEGACY_PATH):
+    if os.path.exists(path):
+        os.remove(path)
+os.environ["DATABASE_URL"] = "sqlite:///" + DB_PATH
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+from sqlalchemy import create_engine, insert, select, text as sql_text
+
+from app.config import settings
+from app.database.database import SessionLocal, create_schema, engine
+from app.database.models import Content, ContentBlob, decompress_text
+from app.service.blob_store import add_blob_refs, get_blob_stats, preview_of
+
+PAGE = 100
+
+
+def make_corpus(distinct: int, seed: int = 7):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(800)]
+    articles = []
+    for _ in range(distinct):
+        words = []
+        length = rng.randint(300, 6000)
+        while sum(len(w) + 1 for w in words) < length:
+            words.append(rng.choice(vocabulary))
+        articles.append(" ".join(words) + ".")
+    return articles
+
+
+def load_inline(rows):
+    legacy = create_engine("sqlite:///" + LEGACY_PATH)
+    with legacy.begin() as conn:
+        conn.execute(sql_text("CREATE TABLE contents (id INTEGER PRIMARY KEY, user_id INTEGER, text TEXT, summary TEXT, sentiment VARCHAR, status VARCHAR)"))
+        conn.execute(sql_text("CREATE INDEX ix_contents_user_id_id ON contents (user_id, id)"))
+        conn.execute(
+            sql_text("INSERT INTO contents (user_id, text, status) VALUES (:user_id, :text, 'completed')"),
+            [{"user_id": user_id, "text": text} for user_id, text in rows],
+        )
+    with legacy.connect() as conn:
+        conn.execute(sql_text("VACUUM"))
+    return legacy
+
+
+def load_blobs(rows, chunk: int = 1000):
+    create_schema()
+    with SessionLocal() as db:
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            blobs, hashes = add_blob_refs([text for _, text in part])
+            db.execute(blobs)
+            db.execute(insert(Content), [
+                {"user_id": user_id, "blob_hash": blob_hash, "preview": preview_of(text), "status": "completed"}
+                for (user_id, text), blob_hash in zip(part, hashes)
+            ])
+            db.commit()
+        stats = get_blob_stats(db)
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(sql_text("VACUUM"))
+    return stats
+
+
+def page_all(conn, users: int, query, decode=None) -> float:
+    start = time.perf_counter()
+    for user_id in range(users):
+        after = 0
+        while True:
+            rows = conn.execute(query, {"user_id": user_id, "after": after, "limit": PAGE}).all()
+            if decode is not None:
+                [decode(row) for row in rows]
+            if len(rows) < PAGE:
+                break
+            after = rows[-1][0]
+    return time.perf_counter() - start
+
+
+def inline_queries():
+    full = sql_text("SELECT id, text FROM contents WHERE user_id = :user_id AND id > :after ORDER BY id LIMIT :limit")
+    preview = sql_text(f"SELECT id, substr(text, 1, {settings.CONTENTS_PREVIEW_CHARS}) FROM contents WHERE user_id = :user_id AND id > :after ORDER BY id LIMIT :limit")
+    return full, preview
+
+
+def blob_queries():
+    from sqlalchemy import bindparam
+
+    where = (Content.user_id == bindparam("user_id"), Content.id > bindparam("after"))
+    full = (
+        select(Content.id, ContentBlob.data, ContentBlob.compressed)
+        .outerjoin(ContentBlob, ContentBlob.hash == Content.blob_hash)
+        .where(*where).order_by(Content.id).limit(bindparam("limit"))
+    )
+    preview = select(Content.id, Content.preview).where(*where).order_by(Content.id).limit(bindparam("limit"))
+    return full, preview
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    articles = make_corpus(args.distinct)
+    rng = random.Random(11)
+    rows = [(i % args.users, rng.choice(articles)) for i in range(args.rows)]
+
+    legacy = load_inline(rows)
+    stats = load_blobs(rows)
+    inline_size, blob_size = os.path.getsize(LEGACY_PATH), os.path.getsize(DB_PATH)
+    print(f"{args.rows} rows, {args.distinct} distinct texts, {stats['inline_chars'] / args.rows:.0f} chars on average")
+    print(f"{'inline contents.text':>24}: {inline_size / 1e6:8.1f} MB")
+    print(f"{'blob store':>24}: {blob_size / 1e6:8.1f} MB  ({inline_size / blob_size:.1f}x smaller; "
+          f"{stats['blobs']} blobs, {stats['stored_bytes'] / 1e6:.1f} MB of blob data)")
+
+    full, preview = inline_queries()
+    with legacy.connect() as conn:
+        inline_full = page_all(conn, args.users, full)
+        inline_preview = page_all(conn, args.users, preview)
+    full, preview = blob_queries()
+    with engine.connect() as conn:
+        blob_full = page_all(conn, args.users, full, decode=lambda row: decompress_text(row[1], row[2]))
+        blob_preview = page_all(conn, args.users, preview)
+    print(f"page every user's contents ({PAGE} per page)")
+    print(f"{'full, inline':>24}: {inline_full * 1e3:8.1f}ms")
+    print(f"{'full, blob store':>24}: {blob_full * 1e3:8.1f}ms")
+    print(f"{'preview, inline':>24}: {inline_preview * 1e3:8.1f}ms")
+    print(f"{'preview, blob store':>24}: {blob_preview * 1e3:8.1f}ms")
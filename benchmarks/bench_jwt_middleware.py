@@ -0,0 +1,91 @@
+"""
+Requests/sec through JWTMiddleware in its three auth modes.
+
+    python -m benchmarks.bench_jwt_middleware --requests 5000 --concurrency 50
+
+"per-request lookup" clears the principal cache before every request, which is what the middleware
+used to cost (one SELECT on users per request); the other two modes are the current behaviour.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_jwt.db"))
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGO", "HS256")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+import httpx
+from fastapi import FastAPI, Request
+
+from app.config import settings
+from app.database.database import SessionLocal, create_schema
+from app.database.models import User
+from app.middleware.jwt_middleware import JWTMiddleware
+from app.service import user_service
+
+PATH = "/intelligent_content_api/v1/ping"
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get(PATH)
+    def ping(request: Request):
+        return {"id": request.state.user.id}
+
+    app.add_middleware(JWTMiddleware)
+    return app
+
+
+def ensure_user() -> User:
+    create_schema()
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == "bench@example.com").first()
+        if not user:
+            user = User(email="bench@example.com", password="x")
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        return user
+
+
+async def run(mode: str, requests: int, concurrency: int, token: str) -> float:
+    settings.AUTH_TRUST_TOKEN_CLAIMS = mode == "trusted claims"
+    user_service.principal_cache.clear()
+    transport = httpx.ASGITransport(app=build_app())
+    headers = {"Authorization": f"Bearer {token}"}
+    remaining = requests
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                if mode == "per-request lookup":
+                    user_service.principal_cache.clear()
+                response = await client.get(PATH, headers=headers)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    user = ensure_user()
+    token = user_service.create_token({"id": user.id, "email": user.email})
+    for mode in ("per-request lookup", "principal cache", "trusted claims"):
+        rps = asyncio.run(run(mode, args.requests, args.concurrency, token))
+        print(f"{mode:>20}: {rps:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
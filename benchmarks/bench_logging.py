@@ -0,0 +1,93 @@
+"""
+Per-request logging overhead for the dev and production logging profiles.
+
+    python -m benchmarks.bench_logging --requests 20000
+
+Replays the log calls one POST /contents makes, before this change (eager f-strings at INFO,
+including the full text, the model response and an ORM repr) and after it (lazy %-formatting,
+payloads at DEBUG, the per-request line sampled), with output sent to /dev/null. The production
+profile is reported twice: time spent on the request path, and total time until the listener
+thread has written everything.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+from app.logging_config import SAMPLED, setup_logging, shutdown_logging
+
+logger = logging.getLogger("app.service.content_service")
+TEXT = "FastAPI makes building APIs pleasant. " * 40
+RESPONSE = {"summary": "FastAPI is pleasant to build APIs with. " * 3, "sentiment": "Positive"}
+
+
+class Content:
+    def __init__(self):
+        self.id = 42
+        self.text = TEXT
+        self.summary = RESPONSE["summary"]
+
+    def __repr__(self):
+        return f"<Content id={self.id} text={self.text!r} summary={self.summary!r}>"
+
+
+CONTENT = Content()
+EMAIL = "bench@example.com"
+
+
+def eager_request():
+    logger.info(f"Creating content for user: {EMAIL}")
+    logger.info(f"Analyzing text with Gemini API: {TEXT}")
+    logger.info(f"Gemini response data: {RESPONSE}")
+    logger.info(f"Summary extracted: {RESPONSE['summary']}")
+    logger.info(f"Sentiment extracted: {RESPONSE['sentiment']}")
+    logger.info(f"AI analysis complete. Summary: {RESPONSE['summary']}, Sentiment: {RESPONSE['sentiment']}")
+    logger.info(f"Content updated with AI analysis: {CONTENT}")
+    logger.debug(f"Created content : {CONTENT} for user: {EMAIL}")
+
+
+def lazy_request():
+    logger.info("Creating content for user: %s", EMAIL, extra=SAMPLED)
+    logger.debug("Analyzing %s chars with %s", len(TEXT), "gemini")
+    logger.debug("AI analysis complete for content %s: %s", CONTENT.id, RESPONSE["sentiment"])
+    logger.debug("Content %s updated with AI analysis", CONTENT.id)
+    logger.debug("Created content %s for user: %s", CONTENT.id, EMAIL)
+
+
+def measure(profile: str, request, requests: int):
+    setup_logging(profile)
+    start = time.perf_counter()
+    for _ in range(requests):
+        request()
+    on_path = time.perf_counter() - start
+    shutdown_logging()
+    total = time.perf_counter() - start
+    return on_path / requests * 1e6, total / requests * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = []
+    real_stderr = sys.stderr
+    sys.stderr = open(os.devnull, "w")
+    try:
+        for name, profile, request in (
+            ("dev, eager f-strings (before)", "dev", eager_request),
+            ("dev, lazy", "dev", lazy_request),
+            ("production, eager f-strings", "production", eager_request),
+            ("production, lazy + sampled", "production", lazy_request),
+        ):
+            results.append((name, *measure(profile, request, args.requests)))
+    finally:
+        sys.stderr.close()
+        sys.stderr = real_stderr
+
+    print(f"{args.requests} simulated requests, output to /dev/null")
+    for name, on_path, total in results:
+        print(f"{name:>30}: {on_path:7.2f}us/request on the request path, {total:7.2f}us/request including writes")
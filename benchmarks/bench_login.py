@@ -0,0 +1,91 @@
+"""
+Login latency percentiles under concurrent load, with content reads running alongside.
+
+    python -m benchmarks.bench_login --logins 200 --concurrency 32
+    PASSWORD_HASH_EXECUTOR=process python -m benchmarks.bench_login
+
+Reports p50/p95/p99 for POST /users/login and for GET /contents issued during the login storm,
+plus how many logins were shed with 503 by the hashing queue limit.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_login.db")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + DB_PATH)
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGO", "HS256")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+import httpx
+
+from app.database.database import create_schema
+from app.main import app
+
+PREFIX = "/intelligent_content_api/v1"
+CREDENTIALS = {"email": "bench@example.com", "password": "Abcd@1234"}
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {"p50": samples[0] if samples else 0.0, "p95": 0.0, "p99": 0.0}
+    cuts = statistics.quantiles(samples, n=100)
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def report(name, samples):
+    p = percentiles([s * 1000 for s in samples])
+    print(f"{name:>14}: n={len(samples):5d}  p50={p['p50']:7.1f}ms  p95={p['p95']:7.1f}ms  p99={p['p99']:7.1f}ms")
+
+
+async def main(logins: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post(f"{PREFIX}/users/signup", json=CREDENTIALS)
+        token = (await client.post(f"{PREFIX}/users/login", json=CREDENTIALS)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        login_latencies, read_latencies = [], []
+        shed = 0
+        remaining = logins
+        done = False
+
+        async def login_worker():
+            nonlocal remaining, shed
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.post(f"{PREFIX}/users/login", json=CREDENTIALS)
+                if response.status_code == 503:
+                    shed += 1
+                    continue
+                login_latencies.append(time.perf_counter() - start)
+
+        async def reader():
+            while not done:
+                start = time.perf_counter()
+                await client.get(f"{PREFIX}/contents/", headers=headers)
+                read_latencies.append(time.perf_counter() - start)
+
+        readers = [asyncio.create_task(reader()) for _ in range(4)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        done = True
+        await asyncio.gather(*readers)
+
+    print(f"{logins} logins at concurrency {concurrency} in {elapsed:.2f}s ({shed} shed with 503)")
+    report("login", login_latencies)
+    report("GET /contents", read_latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    create_schema()
+    asyncio.run(main(args.logins, args.concurrency))
@@ -0,0 +1,91 @@
+"""
+Cost of turning a page of contents into response bytes, before and after the orjson/raw-bytes path.
+
+    python -m benchmarks.bench_serialization --sizes 10 1000 10000
+
+For each page size it times, per page:
+  - response_model + json (before): validate every row against ContentListResponse, run it
+    through jsonable_encoder and encode with the stdlib json module, as FastAPI did for GET /contents
+  - TypeAdapter.dump_json: pydantic v2 validation from attributes and encoding in pydantic-core
+  - orjson (after, miss): what get_all_user_contents does on a cache miss
+  - cache hit, json.loads + re-encode (before): the old Redis hit path
+  - cache hit, raw bytes (after): the cached body as stored, only re-encoded from str to bytes
+"""
+import argparse
+import json
+import os
+import time
+from typing import List
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.database.schemas import ContentListResponse
+
+TEXT = "FastAPI makes building APIs pleasant, and this text is about as long as a short review. " * 3
+
+
+class Row:
+    __slots__ = ("id", "text")
+
+    def __init__(self, id: int, text: str):
+        self.id = id
+        self.text = text
+
+
+def timeit(fn, budget: float = 0.5) -> float:
+    fn()
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < budget:
+        fn()
+        runs += 1
+    return (time.perf_counter() - start) / runs
+
+
+def bench(size: int):
+    rows = [Row(i, TEXT) for i in range(size)]
+    tuples = [(row.id, row.text) for row in rows]
+    adapter = TypeAdapter(List[ContentListResponse])
+    cached_old = json.dumps([{"id": i, "text": t} for i, t in tuples])
+    # Redis hands values back as str (decode_responses=True), so a hit still pays one UTF-8 encode
+    cached_new = orjson.dumps([{"id": i, "text": t} for i, t in tuples]).decode("utf-8")
+
+    def before():
+        models = [ContentListResponse.model_validate(row) for row in rows]
+        return json.dumps(jsonable_encoder(models)).encode("utf-8")
+
+    def type_adapter():
+        return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+    def after():
+        return orjson.dumps([{"id": i, "text": t} for i, t in tuples])
+
+    def hit_before():
+        return json.dumps(json.loads(cached_old)).encode("utf-8")
+
+    def hit_after():
+        return cached_new.encode("utf-8")
+
+    return [
+        ("response_model + json (before)", timeit(before)),
+        ("TypeAdapter.dump_json", timeit(type_adapter)),
+        ("orjson (after, miss)", timeit(after)),
+        ("cache hit, re-encode (before)", timeit(hit_before)),
+        ("cache hit, raw bytes (after)", timeit(hit_after)),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        results = bench(size)
+        baseline = results[0][1]
+        print(f"{size} items")
+        for name, seconds in results:
+            print(f"{name:>32}: {seconds * 1e3:9.3f}ms/page  {baseline / seconds:8.1f}x")
@@ -0,0 +1,73 @@
+"""
+Cold-start cost: how long `import app.main` takes, how long the lifespan startup takes, and the
+latency of the first requests after it.
+
+    python -m benchmarks.bench_startup --runs 5
+
+Every run is a fresh interpreter, so module caches and the import system start cold (the OS file
+cache stays warm). Reports the median over the runs. /health/live touches no dependency;
+/health/ready waits on the database, Redis and model-client checks, so it is what a load balancer
+sees before the first real request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PREFIX = "/intelligent_content_api/v1"
+
+
+def child():
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_startup.db"))
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    os.environ.setdefault("JWT_ALGO", "HS256")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("REDIS_SOCKET_TIMEOUT", "0.2")
+
+    start = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    import asyncio
+    import httpx
+
+    async def first_requests():
+        timings = {"import": imported - start}
+        begin = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            timings["startup"] = time.perf_counter() - begin
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name in ("live", "ready"):
+                    begin = time.perf_counter()
+                    await client.get(f"{PREFIX}/health/{name}")
+                    timings[f"first /health/{name}"] = time.perf_counter() - begin
+        return timings
+
+    print(json.dumps(asyncio.run(first_requests())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        sys.exit(0)
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"median of {args.runs} cold starts")
+    for name in runs[0]:
+        print(f"{name:>20}: {statistics.median(run[name] for run in runs) * 1000:8.1f}ms")
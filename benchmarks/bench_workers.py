@@ -0,0 +1,117 @@
+"""
+Throughput of `python -m app.cli serve` at 1, 2, 4 and 8 worker processes over real HTTP.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --seconds 10 --concurrency 64
+
+For each worker count it starts the server on a fresh SQLite database, signs up one user per
+client, then lets the clients loop over the CPU-bound requests of a real session for a fixed time:
+login (bcrypt + JWT signing) and GET /contents (JWT verification + JSON). The rate limiter is
+off and the model is the local fake backend, so the numbers measure this process's own CPU work.
+Gains stop at the machine's core count (shown in the output).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PREFIX = "/intelligent_content_api/v1"
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    db_path = os.path.join(tempfile.gettempdir(), f"bench_workers_{workers}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    env = {
+        **os.environ,
+        "DATABASE_URL": "sqlite:///" + db_path,
+        "JWT_SECRET": "bench-secret",
+        "JWT_ALGO": "HS256",
+        "GEMINI_API_KEY": "bench",
+        "ANALYZER_BACKEND": "fake",
+        "RATE_LIMIT_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.cli", "serve", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1", "--migrate"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_live(client: httpx.AsyncClient, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{PREFIX}/health/live")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+async def drive(base_url: str, seconds: float, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+        await wait_until_live(client)
+        credentials = [{"email": f"bench-{i}@example.com", "password": "Abcd@1234"} for i in range(concurrency)]
+        for creds in credentials:
+            await client.post(f"{PREFIX}/users/signup", json=creds)
+
+        latencies, errors = [], 0
+        stop_at = time.perf_counter() + seconds
+
+        async def session(creds):
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                login = await client.post(f"{PREFIX}/users/login", json=creds)
+                if login.status_code != 200:
+                    errors += 1
+                    continue
+                headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+                for _ in range(4):
+                    if (await client.get(f"{PREFIX}/contents/", headers=headers)).status_code != 200:
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(session(creds) for creds in credentials))
+        elapsed = time.perf_counter() - begin
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "requests_per_second": len(latencies) * 5 / elapsed,
+        "session_p50_ms": cuts[49] * 1000,
+        "session_p95_ms": cuts[94] * 1000,
+        "errors": errors,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores, {args.concurrency} clients, {args.seconds:.0f}s per run")
+    baseline = None
+    for workers in args.workers:
+        server = start_server(workers, args.port)
+        try:
+            result = asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.seconds, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        baseline = baseline or result["requests_per_second"]
+        print(
+            f"{workers} worker(s): {result['requests_per_second']:8.1f} req/s ({result['requests_per_second'] / baseline:4.2f}x)"
+            f"  session p50={result['session_p50_ms']:7.1f}ms p95={result['session_p95_ms']:7.1f}ms  errors={result['errors']}"
+        )
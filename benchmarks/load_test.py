@@ -0,0 +1,193 @@
+"""
+End-to-end load test against the fake model backend, so runs are repeatable without Gemini.
+
+    python -m benchmarks.load_test --requests 500 --concurrency 32 --output results.json
+    python -m benchmarks.load_test --latency-ms 200 --jitter-ms 100 --error-rate 0.05
+    python -m benchmarks.load_test --compare results.json
+
+Drives POST /contents, GET /contents and GET /contents/{id} through the ASGI app in a weighted
+mix and reports throughput, p50/p95/p99 per endpoint and the DB statements, Redis commands and
+model calls spent per request. --output saves the numbers with the git commit for later runs to
+--compare against.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_load.db")
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + DB_PATH)
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGO", "HS256")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ["ANALYZER_BACKEND"] = "fake"
+# A handful of users drive the whole load; per-user limits would measure the limiter, not the service
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from sqlalchemy import event
+
+from app.caching.redis import redis_cache
+from app.config import settings
+from app.database.database import async_engine, create_schema, engine
+from app.main import app
+from app.service import analyze_sentiment
+
+PREFIX = "/intelligent_content_api/v1"
+WORDS = "the service is great good fine slow bad terrible quick report summary user data".split()
+
+db_statements = 0
+
+
+def _count_statement(*args):
+    global db_statements
+    db_statements += 1
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _count_statement)
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {"p50": samples[0] if samples else 0.0, "p95": 0.0, "p99": 0.0}
+    cuts = statistics.quantiles(samples, n=100)
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))).capitalize() + "."
+
+
+async def run(requests: int, concurrency: int, mix: dict, seed: int) -> dict:
+    rng = random.Random(seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        credentials = {"email": f"load-{seed}@example.com", "password": "Abcd@1234"}
+        await client.post(f"{PREFIX}/users/signup", json=credentials)
+        token = (await client.post(f"{PREFIX}/users/login", json=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Seed a few rows so reads have something to hit from the first request
+        ids = []
+        for _ in range(10):
+            response = await client.post(f"{PREFIX}/contents/", json={"text": make_text(rng)}, headers=headers)
+            ids.append(response.json()["id"])
+
+        plan = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+        latencies = {name: [] for name in mix}
+        statuses = {name: {} for name in mix}
+        queue = list(reversed(plan))
+
+        async def worker():
+            while queue:
+                name = queue.pop()
+                start = time.perf_counter()
+                if name == "create":
+                    response = await client.post(f"{PREFIX}/contents/", json={"text": make_text(rng)}, headers=headers)
+                    if response.status_code in (200, 202):
+                        ids.append(response.json()["id"])
+                elif name == "list":
+                    response = await client.get(f"{PREFIX}/contents/", headers=headers)
+                else:
+                    response = await client.get(f"{PREFIX}/contents/{rng.choice(ids)}", headers=headers)
+                latencies[name].append(time.perf_counter() - start)
+                code = str(response.status_code)
+                statuses[name][code] = statuses[name].get(code, 0) + 1
+
+        db_before = db_statements
+        redis_before = redis_cache.stats["calls"]
+        model_before = analyze_sentiment.model_backend.calls
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "commit": git_commit(),
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "mix": mix,
+            "seed": seed,
+            "latency_ms": settings.FAKE_MODEL_LATENCY_MS,
+            "jitter_ms": settings.FAKE_MODEL_JITTER_MS,
+            "error_rate": settings.FAKE_MODEL_ERROR_RATE,
+        },
+        "elapsed_seconds": elapsed,
+        "throughput_rps": requests / elapsed,
+        "per_request": {
+            "db_statements": (db_statements - db_before) / requests,
+            "redis_calls": (redis_cache.stats["calls"] - redis_before) / requests,
+            "model_calls": (analyze_sentiment.model_backend.calls - model_before) / requests,
+        },
+        "endpoints": {
+            name: {"count": len(samples), "status": statuses[name], **percentiles([s * 1000 for s in samples])}
+            for name, samples in latencies.items()
+        },
+    }
+
+
+def report(results: dict, baseline: dict = None):
+    config = results["config"]
+    print(f"{config['requests']} requests at concurrency {config['concurrency']} in {results['elapsed_seconds']:.2f}s "
+          f"({results['throughput_rps']:.1f} req/s, commit {results['commit']})")
+    if baseline:
+        change = (results["throughput_rps"] / baseline["throughput_rps"] - 1) * 100
+        print(f"  vs {baseline['commit']}: {baseline['throughput_rps']:.1f} req/s ({change:+.1f}%)")
+    for name, stats in results["endpoints"].items():
+        line = f"{name:>8}: n={stats['count']:5d}  p50={stats['p50']:7.1f}ms  p95={stats['p95']:7.1f}ms  p99={stats['p99']:7.1f}ms  {stats['status']}"
+        if baseline and name in baseline["endpoints"]:
+            line += f"  (p95 was {baseline['endpoints'][name]['p95']:.1f}ms)"
+        print(line)
+    per_request = results["per_request"]
+    print(f"per request: {per_request['db_statements']:.2f} DB statements, "
+          f"{per_request['redis_calls']:.2f} Redis calls, {per_request['model_calls']:.2f} model calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--create", type=int, default=20, help="weight of POST /contents")
+    parser.add_argument("--list", type=int, default=30, help="weight of GET /contents")
+    parser.add_argument("--get", type=int, default=50, help="weight of GET /contents/{id}")
+    parser.add_argument("--latency-ms", type=float, default=None)
+    parser.add_argument("--jitter-ms", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    args = parser.parse_args()
+
+    backend = analyze_sentiment.model_backend
+    for attr, value in (("latency_ms", args.latency_ms), ("jitter_ms", args.jitter_ms), ("error_rate", args.error_rate)):
+        if value is not None:
+            setattr(backend, attr, value)
+            setattr(settings, f"FAKE_MODEL_{attr.upper()}", value)
+    backend.random.seed(args.seed)
+
+    create_schema()
+    mix = {name: weight for name, weight in (("create", args.create), ("list", args.list), ("get", args.get)) if weight > 0}
+    results = asyncio.run(run(args.requests, args.concurrency, mix, args.seed))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
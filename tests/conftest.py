@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "intelligent_content_test.db")
+if os.path.exists(TEST_DB_PATH):
+    os.remove(TEST_DB_PATH)
+
+# Settings are read at import time, so give the app a throwaway environment before anything imports it
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + TEST_DB_PATH)
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("JWT_ALGO", "HS256")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+# Each run starts from an empty database, so let the app create its tables at startup
+os.environ.setdefault("DB_AUTO_MIGRATE", "true")
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.caching.analysis_cache import analysis_cache
+from app.config import settings
+from app.database.database import SessionLocal
+from app.database.models import Content
+from app.main import app
+from app.service import analysis_worker, analyze_sentiment, embedding_index
+from app.service.analysis_worker import InMemoryAnalysisQueue, analysis_workers, analyze_with_retry
+from app.service.embedding_index import EmbeddingIndex
+from app.service.model_backends import FakeBackend
+
+PREFIX = "/intelligent_content_api/v1"
+
+
+@pytest.fixture
+def background(monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_ANALYSIS_MODE", "background")
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    # asyncio queues belong to one event loop, and every TestClient runs its own
+    monkeypatch.setattr(analysis_workers, "queue", InMemoryAnalysisQueue(settings.ANALYSIS_QUEUE_MAXSIZE))
+    backend = FakeBackend()
+    monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+    analysis_cache.clear()
+    with TestClient(app) as client:
+        yield client, backend
+
+
+def _auth_headers(client, email):
+    credentials = {"email": email, "password": "Abcd@1234"}
+    assert client.post(f"{PREFIX}/users/signup", json=credentials).status_code == 200
+    response = client.post(f"{PREFIX}/users/login", json=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _status(content_id: int) -> str:
+    with SessionLocal() as db:
+        return db.get(Content, content_id).status
+
+
+def test_background_mode_returns_202_and_completes(background):
+    client, _ = background
+    headers = _auth_headers(client, "background@example.com")
+
+    created = client.post(f"{PREFIX}/contents/", json={"text": "Queued for the workers."}, headers=headers)
+    assert created.status_code == 202
+    assert created.json()["status"] == "pending"
+
+    content_id = created.json()["id"]
+    assert _wait_for(lambda: _status(content_id) == "completed")
+    fetched = client.get(f"{PREFIX}/contents/{content_id}", headers=headers).json()
+    assert fetched["status"] == "completed"
+    assert fetched["summary"] and fetched["sentiment"]
+
+
+def test_stop_returns_cancelled_analyses_to_pending(background):
+    client, backend = background
+    headers = _auth_headers(client, "drain@example.com")
+    backend.latency_ms = 10_000
+
+    content_id = client.post(f"{PREFIX}/contents/", json={"text": "Still analysing at shutdown."}, headers=headers).json()["id"]
+    assert _wait_for(lambda: content_id in analysis_workers.in_flight)
+
+    client.portal.call(analysis_workers.stop, 0.05)
+    assert _status(content_id) == "pending"
+    assert not analysis_workers.in_flight
+
+    # The next start picks the row up again
+    backend.latency_ms = 0
+    client.portal.call(analysis_workers.start)
+    assert _wait_for(lambda: _status(content_id) == "completed")
+
+
+def test_worker_retries_only_jobs_turned_away_before_the_model(monkeypatch):
+    errors = [
+        HTTPException(status_code=503, detail="breaker open", headers={"Retry-After": "0"}),
+        HTTPException(status_code=503, detail="model failed"),
+    ]
+    calls = []
+
+    async def analyze_text(text):
+        calls.append(text)
+        raise errors[len(calls) - 1]
+
+    monkeypatch.setattr(analysis_worker, "analyze_text", analyze_text)
+    # model_client already retried the second error; the worker must not multiply those attempts
+    with pytest.raises(HTTPException) as failed:
+        asyncio.run(analyze_with_retry("text"))
+    assert failed.value.detail == "model failed"
+    assert len(calls) == 2
+
+
+def test_rows_dropped_when_the_queue_is_full_leave_the_index(background, monkeypatch):
+    client, _ = background
+    headers = _auth_headers(client, "queuefull@example.com")
+    index = EmbeddingIndex(settings.EMBEDDING_DIM)
+    monkeypatch.setattr(settings, "EMBEDDING_INDEX_ENABLED", True)
+    monkeypatch.setattr(embedding_index, "_index", index)
+
+    async def enqueue(content_id):
+        raise HTTPException(status_code=503, detail="Analysis queue is full. Please try again later.")
+
+    monkeypatch.setattr(analysis_workers, "enqueue", enqueue)
+    response = client.post(f"{PREFIX}/contents/", json={"text": "Never analysed, never searchable."}, headers=headers)
+    assert response.status_code == 503
+    assert len(index) == 0
@@ -0,0 +1,409 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import HTTPException
+from google.genai import errors
+
+from app.caching.analysis_cache import AnalysisCache, analysis_cache
+from app.caching.shared_store import SharedLocalStore
+from app.config import settings
+from app.service import analyze_sentiment
+from app.service.admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, ModelAdmission, ModelOverloaded
+from app.service.model_backends import FakeBackend, ModelBackend
+from app.service.model_client import ResilientModelClient
+
+
+class SlowBackend(ModelBackend):
+    """Model backend that sleeps like a slow Gemini call and records peak concurrency."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.peak = 0
+        self.active = 0
+
+    async def generate(self, prompt, model):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+
+        return json.dumps({"summary": "short", "sentiment": "Positive"})
+
+
+class FlakyBackend(FakeBackend):
+    """Fake backend that raises the given errors (or sleeps the given seconds) on successive calls, then answers."""
+
+    def __init__(self, *script):
+        super().__init__()
+        self.script = list(script)
+        self.models = []
+
+    async def generate(self, prompt, model):
+        self.models.append(model)
+        step = self.script.pop(0) if self.script else None
+        if isinstance(step, Exception):
+            self.calls += 1
+            raise step
+        if step:
+            await asyncio.sleep(step)
+        return await super().generate(prompt, model)
+
+
+def _api_error(code):
+    return errors.ServerError(code, {"error": {"code": code, "message": "injected"}}) if code >= 500 else errors.ClientError(code, {"error": {"code": code, "message": "injected"}})
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    analysis_cache.clear()
+    yield
+    analysis_cache.clear()
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    def install(delay, concurrency=4, timeout=5.0):
+        backend = SlowBackend(delay)
+        monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+        monkeypatch.setattr(analyze_sentiment, "model_admission", ModelAdmission(concurrency, 100, timeout))
+        monkeypatch.setattr(analyze_sentiment, "model_client", ResilientModelClient(settings.GEMINI_MODEL))
+        monkeypatch.setattr(settings, "GEMINI_MAX_CONCURRENCY", concurrency)
+        monkeypatch.setattr(settings, "GEMINI_TIMEOUT_SECONDS", timeout)
+        return backend
+
+    return install
+
+
+@pytest.fixture
+def flaky_model(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    monkeypatch.setattr(settings, "MODEL_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "MODEL_BREAKER_THRESHOLD", 3)
+
+    def install(*script, fallback=None):
+        backend = FlakyBackend(*script)
+        monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+        monkeypatch.setattr(analyze_sentiment, "model_client", ResilientModelClient("primary", fallback))
+        return backend
+
+    return install
+
+
+def test_analysis_does_not_block_event_loop(slow_model):
+    slow_model(delay=0.2)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        tick_task = asyncio.create_task(ticker())
+        summary, sentiment = await analyze_sentiment.analyze_text("hello")
+        tick_task.cancel()
+        return ticks, summary, sentiment
+
+    ticks, summary, sentiment = asyncio.run(scenario())
+    assert (summary, sentiment) == ("short", "Positive")
+    # Other coroutines kept running while the model call was in flight
+    assert ticks >= 10
+
+
+def test_throughput_scales_up_to_concurrency_limit(slow_model):
+    backend = slow_model(delay=0.2, concurrency=4)
+
+    async def scenario():
+        start = time.perf_counter()
+        await asyncio.gather(*(analyze_sentiment.analyze_text(f"text {i}") for i in range(8)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(scenario())
+    assert backend.peak == 4
+    # Two waves of four, not eight sequential calls
+    assert elapsed < 0.8
+
+
+def test_slow_call_hits_deadline(slow_model):
+    slow_model(delay=1.0, timeout=0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(analyze_sentiment.analyze_text("hello"))
+
+    assert exc_info.value.status_code == 504
+    stats = analyze_sentiment.get_analysis_stats()
+    assert stats["in_flight"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_duplicate_texts_share_one_model_call(slow_model):
+    backend = slow_model(delay=0.1)
+
+    async def scenario():
+        first = await asyncio.gather(*(analyze_sentiment.analyze_text("same  text") for _ in range(5)))
+        second = await analyze_sentiment.analyze_text("same text")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert backend.calls == 1
+    assert all(result == ("short", "Positive") for result in first)
+    assert second == ("short", "Positive")
+    stats = analysis_cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["local_hits"] == 1
+
+
+def test_fake_backend_answers_batch_prompts(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+
+    texts = ["I love this. More text.", "This is terrible.", "Plain words here."]
+    results = asyncio.run(analyze_sentiment.analyze_texts(texts))
+
+    assert [sentiment for _, sentiment in results] == ["Positive", "Negative", "Neutral"]
+    assert results[0][0].startswith("I love this.")
+    # All three fit in one packed prompt
+    assert backend.calls == 1
+
+
+def test_batch_turned_away_fails_whole_instead_of_fanning_out(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    prompts = []
+
+    async def generate(prompt):
+        prompts.append(prompt)
+        raise ModelOverloaded("model queue full", retry_after=2)
+
+    monkeypatch.setattr(analyze_sentiment, "generate", generate)
+    results = asyncio.run(analyze_sentiment.analyze_texts(["First text.", "Second text.", "Third text."]))
+
+    assert len(prompts) == 1
+    assert all(isinstance(result, HTTPException) and result.status_code == 503 for result in results)
+    assert results[0].headers["Retry-After"] == "2"
+
+
+def test_unparseable_batch_answer_falls_back_to_single_prompts(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    prompts = []
+
+    async def generate(prompt):
+        prompts.append("batch" if "[Document " in prompt else "single")
+        if "[Document " in prompt:
+            return "Sorry, I cannot answer in JSON today.", "primary"
+        return json.dumps({"summary": "short", "sentiment": "Neutral"}), "primary"
+
+    monkeypatch.setattr(analyze_sentiment, "generate", generate)
+    results = asyncio.run(analyze_sentiment.analyze_texts(["First text.", "Second text."]))
+
+    assert prompts == ["batch", "single", "single"]
+    assert results == [("short", "Neutral"), ("short", "Neutral")]
+
+
+def test_clear_cut_short_text_skips_the_model(slow_model):
+    backend = slow_model(delay=0.01)
+
+    summary, sentiment = asyncio.run(analyze_sentiment.analyze_text("Great app, I love it. Fast and reliable!"))
+    assert sentiment == "Positive"
+    assert summary == "Great app, I love it. Fast and reliable!"
+
+    # Mixed signals are escalated to the model
+    asyncio.run(analyze_sentiment.analyze_text("Great design but terrible battery and awful support."))
+    assert backend.calls == 1
+
+
+def test_long_document_only_reanalyzes_edited_chunks(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+    monkeypatch.setattr(settings, "LONG_DOCUMENT_MIN_TOKENS", 400)
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 100)
+
+    paragraphs = [f"Paragraph {i} talks about topic {i} in some detail. " * 3 for i in range(12)]
+    chunks = analyze_sentiment.split_into_chunks("\n\n".join(paragraphs), 100)
+    assert len(chunks) > 2
+    assert all(analyze_sentiment.estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+    summary, sentiment = asyncio.run(analyze_sentiment.analyze_text("\n\n".join(paragraphs)))
+    assert summary and sentiment == "Neutral"
+    first_run = backend.calls
+    # One call per chunk plus the reduce step
+    assert first_run == len(chunks) + 1
+
+    paragraphs[-1] = "A completely rewritten closing paragraph with new words. " * 3
+    asyncio.run(analyze_sentiment.analyze_text("\n\n".join(paragraphs)))
+    # The untouched leading chunks came from the cache
+    assert backend.calls - first_run < len(chunks)
+
+
+def test_failing_chunk_cancels_the_rest_of_the_document(monkeypatch):
+    class OneBadChunk(SlowBackend):
+        async def generate(self, prompt, model):
+            if "Paragraph 0 " in prompt:
+                # Fails once the other chunks are waiting on the model
+                await asyncio.sleep(0.2)
+                raise _api_error(400)
+            return await super().generate(prompt, model)
+
+    backend = OneBadChunk(delay=5.0)
+    monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+    monkeypatch.setattr(settings, "LONG_DOCUMENT_MIN_TOKENS", 400)
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 100)
+    text = "\n\n".join(f"Paragraph {i} talks about topic {i} in some detail. " * 3 for i in range(12))
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await analyze_sentiment.analyze_text(text)
+        return backend.active
+
+    start = time.perf_counter()
+    assert asyncio.run(scenario()) == 0
+    assert time.perf_counter() - start < 2.0
+
+
+def test_chunks_as_large_as_the_long_document_threshold_do_not_recurse(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    monkeypatch.setattr(settings, "LONG_DOCUMENT_MIN_TOKENS", 100)
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 1000)
+
+    summary, _ = asyncio.run(asyncio.wait_for(analyze_sentiment.analyze_text("A fairly long note. " * 40), 5))
+    assert summary
+    assert backend.calls == 1
+
+
+def test_admission_prefers_interactive_work_and_sheds_when_full():
+    admission = ModelAdmission(max_concurrency=1, max_waiting=1, max_wait=5.0)
+
+    async def scenario():
+        await admission.acquire(PRIORITY_INTERACTIVE)
+        background = asyncio.create_task(admission.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        # The queue is full: an interactive caller takes the background caller's place...
+        interactive = asyncio.create_task(admission.acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(ModelOverloaded):
+            await background
+        # ...and a second background caller is shed at once
+        with pytest.raises(ModelOverloaded):
+            await admission.acquire(PRIORITY_BACKGROUND)
+        admission.release()
+        await interactive
+        admission.release()
+        return admission.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["waiting"]) == (0, 0)
+    assert (stats["admitted"], stats["shed"], stats["displaced"]) == (2, 1, 1)
+
+
+def test_shed_model_call_maps_to_503_with_retry_after():
+    error = analyze_sentiment.model_error(ModelOverloaded("Model queue is full", 2.5))
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "3"
+
+
+def test_transient_errors_are_retried(flaky_model):
+    backend = flaky_model(_api_error(503), asyncio.TimeoutError())
+
+    summary, sentiment = asyncio.run(analyze_sentiment.analyze_text("Retried text about the release."))
+    assert summary
+    assert backend.models == ["primary"] * 3
+    assert analyze_sentiment.model_client.stats["retries"] == 2
+
+
+def test_throttled_primary_falls_back_to_the_cheaper_model(flaky_model):
+    backend = flaky_model(_api_error(429), fallback="fallback")
+
+    asyncio.run(analyze_sentiment.analyze_text("Throttled text about the release."))
+    assert backend.models == ["primary", "fallback"]
+
+
+def test_fallback_answers_are_cached_under_the_fallback_model(flaky_model):
+    flaky_model(_api_error(429), fallback="fallback")
+    text = "Throttled text about the release."
+
+    asyncio.run(analyze_sentiment.analyze_text(text))
+    assert analyze_sentiment._cache_key(text, "fallback") in analysis_cache.local
+    # The primary model's entry stays empty, so the next request asks the primary again
+    assert analyze_sentiment._cache_key(text) not in analysis_cache.local
+
+
+def test_breaker_fails_fast_once_the_model_keeps_failing(flaky_model):
+    backend = flaky_model(*[_api_error(503)] * 3)
+
+    with pytest.raises(HTTPException) as first:
+        asyncio.run(analyze_sentiment.analyze_text("Doomed text about the release."))
+    assert first.value.status_code == 503
+    assert backend.calls == 3
+
+    # The breaker is open: no further model calls until it resets
+    with pytest.raises(HTTPException) as second:
+        asyncio.run(analyze_sentiment.analyze_text("Another text about the release."))
+    assert second.value.status_code == 503
+    assert int(second.value.headers["Retry-After"]) >= 1
+    assert backend.calls == 3
+
+
+def test_slow_call_is_hedged_after_the_tail_latency(flaky_model, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "MODEL_HEDGE_MIN_SAMPLES", 5)
+    backend = flaky_model(2.0)
+    for _ in range(5):
+        analyze_sentiment.model_client.latency.observe(0.05)
+
+    start = time.perf_counter()
+    asyncio.run(analyze_sentiment.analyze_text("Hedged text about the release."))
+    assert time.perf_counter() - start < 1.0
+    assert backend.models == ["primary", "primary"]
+    assert analyze_sentiment.model_client.stats["hedge_wins"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_coalesced_ones():
+    cache = AnalysisCache(16, 60, 60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return ("summary", "Positive"), "analysis:key"
+
+    async def scenario():
+        owner = asyncio.create_task(cache.get_or_compute("analysis:key", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("analysis:key", compute))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        # The client behind the first request went away; the second still gets its answer
+        result = await waiter
+        assert owner.cancelled() and not waiter.cancelled()
+        return result
+
+    assert asyncio.run(scenario()) == (("summary", "Positive"), "analysis:key")
+    assert len(calls) == 2
+    assert not cache.in_flight
+
+
+def test_shared_tier_lets_worker_processes_reuse_an_analysis(tmp_path):
+    # Two caches over one file stand in for two API processes on the same host
+    path = str(tmp_path / "analysis.db")
+    first = AnalysisCache(16, 60, 60, SharedLocalStore(path, 60))
+    second = AnalysisCache(16, 60, 60, SharedLocalStore(path, 60))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return ("summary", "Positive"), "analysis:key"
+
+    asyncio.run(first.get_or_compute("analysis:key", compute))
+    assert asyncio.run(second.get_or_compute("analysis:key", compute)) == (("summary", "Positive"), "analysis:key")
+    assert len(calls) == 1
+    assert second.stats["shared_hits"] == 1
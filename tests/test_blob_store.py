@@ -0,0 +1,94 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, Text, create_engine, insert, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from app import cli
+from app.config import settings
+from app.database.database import Base
+from app.database.models import ContentBlob, ContentStat
+from app.service import blob_store
+from app.service.blob_store import add_blob_refs, backfill_blobs, get_blob_stats, text_hash
+from app.service.content_stats import rebuild_content_stats
+
+
+def _baseline_schema(engine):
+    # users and contents exactly as the first release created them: no status, no blobs
+    metadata = MetaData()
+    Table("users", metadata, Column("id", Integer, primary_key=True, index=True), Column("email", String, unique=True, index=True), Column("password", String))
+    contents = Table(
+        "contents", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id")),
+        Column("text", Text),
+        Column("summary", Text, nullable=True),
+        Column("sentiment", String, nullable=True),
+    )
+    metadata.create_all(engine)
+    return contents
+
+
+def test_backfill_upgrades_a_baseline_database():
+    path = os.path.join(tempfile.gettempdir(), "blob_backfill_test.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine("sqlite:///" + path)
+    contents = _baseline_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(contents), [
+            {"id": 1, "user_id": 1, "text": "shared", "summary": "s", "sentiment": "Positive"},
+            {"id": 2, "user_id": 2, "text": "shared", "summary": "s", "sentiment": "Positive"},
+            {"id": 3, "user_id": 1, "text": "own", "summary": "o", "sentiment": "Negative"},
+        ])
+    # What `backfill-blobs` runs first: create_all adds the new tables but no columns
+    Base.metadata.create_all(engine, tables=[ContentBlob.__table__, ContentStat.__table__])
+
+    with Session(engine) as db:
+        assert backfill_blobs(db, chunk_size=2) == 3
+        # A second run finds nothing left to move
+        assert backfill_blobs(db, chunk_size=2) == 0
+        rows = db.execute(text("SELECT id, blob_hash, preview, text, status FROM contents ORDER BY id")).all()
+        assert rows == [
+            (1, text_hash("shared"), "shared", None, "completed"),
+            (2, text_hash("shared"), "shared", None, "completed"),
+            (3, text_hash("own"), "own", None, "completed"),
+        ]
+        assert db.get(ContentBlob, text_hash("shared")).refcount == 2
+        assert get_blob_stats(db)["blobs"] == 2
+
+        rebuild_content_stats(db)
+        totals = db.query(ContentStat.user_id, ContentStat.sentiment, ContentStat.count).filter(ContentStat.bucket == "all").order_by(ContentStat.user_id, ContentStat.sentiment).all()
+        assert totals == [(1, "Negative", 1), (1, "Positive", 1), (2, "Positive", 1)]
+    engine.dispose()
+
+
+def test_migrate_refuses_a_baseline_database_until_it_is_backfilled(monkeypatch, capsys):
+    path = os.path.join(tempfile.gettempdir(), "blob_migrate_test.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine("sqlite:///" + path)
+    _baseline_schema(engine)
+    monkeypatch.setattr(cli, "SessionLocal", lambda: Session(engine))
+    monkeypatch.setattr(cli, "create_schema", lambda: Base.metadata.create_all(engine, tables=[ContentBlob.__table__, ContentStat.__table__]))
+
+    assert cli._migrate(None) == 1
+    assert "status, analyzed_at, blob_hash, preview" in capsys.readouterr().err
+    with Session(engine) as db:
+        backfill_blobs(db, chunk_size=10)
+    assert cli._migrate(None) == 0
+    engine.dispose()
+
+
+def test_postgres_search_vector_covers_only_a_prefix(monkeypatch):
+    monkeypatch.setattr(blob_store, "engine", SimpleNamespace(dialect=SimpleNamespace(name="postgresql")))
+    monkeypatch.setattr(settings, "SEARCH_VECTOR_MAX_CHARS", 10)
+    text_value = "abcdefghijklmnopqrstuvwxyz"
+
+    stmt, _ = add_blob_refs([text_value])
+    params = stmt.compile(dialect=sqlite.dialect()).params
+    # The blob keeps the whole text; only the tsvector input is cut
+    assert params["data_m0"] == text_value.encode()
+    assert params["to_tsvector_1"] == text_value[:10]
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import re
+import time
+
+import orjson
+import pytest
+from cachetools import TTLCache
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from app.caching.analysis_cache import analysis_cache
+from app.caching.content_cache import content_cache, content_cache_key
+from app.caching.rate_limit import TokenBucketLimiter
+from app.caching.redis import redis_cache
+from app.config import settings
+from app.database.database import AsyncSessionLocal, SessionLocal
+from app.database.models import Content, ContentBlob, ContentStat, User
+from app.database.schemas import ContentResponse
+from app.main import app
+from app.middleware import rate_limit_middleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.service import analyze_sentiment, content_service
+from app.service.blob_store import add_blob_refs, text_hash
+from app.service.content_stats import rebuild_content_stats
+from app.service.model_backends import FakeBackend
+from app.service.model_client import ResilientModelClient
+from app.service.user_service import AuthenticatedUser
+
+PREFIX = "/intelligent_content_api/v1"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend())
+    analysis_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _auth_headers(client, email):
+    credentials = {"email": email, "password": "Abcd@1234"}
+    assert client.post(f"{PREFIX}/users/signup", json=credentials).status_code == 200
+    response = client.post(f"{PREFIX}/users/login", json=credentials)
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_content_lifecycle(client):
+    headers = _auth_headers(client, "lifecycle@example.com")
+
+    created = client.post(f"{PREFIX}/contents/", json={"text": "FastAPI is great."}, headers=headers)
+    assert created.status_code == 200
+    body = created.json()
+    assert body["summary"].startswith("FastAPI is great.")
+    assert (body["sentiment"], body["status"]) == ("Positive", "completed")
+
+    fetched = client.get(f"{PREFIX}/contents/{body['id']}", headers=headers)
+    assert fetched.json() == body
+
+    assert client.delete(f"{PREFIX}/contents/{body['id']}", headers=headers).status_code == 200
+    assert client.get(f"{PREFIX}/contents/{body['id']}", headers=headers).status_code == 404
+
+
+@pytest.fixture
+def failing_model(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    monkeypatch.setattr(settings, "MODEL_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend(error_rate=1.0))
+    monkeypatch.setattr(analyze_sentiment, "model_client", ResilientModelClient(settings.GEMINI_MODEL))
+
+
+def test_failed_inline_analysis_marks_the_row_failed(client, failing_model):
+    headers = _auth_headers(client, "failed@example.com")
+
+    assert client.post(f"{PREFIX}/contents/", json={"text": "Never analysed."}, headers=headers).status_code >= 400
+    (row,) = client.get(f"{PREFIX}/contents/", headers=headers).json()
+    fetched = client.get(f"{PREFIX}/contents/{row['id']}", headers=headers).json()
+    assert (fetched["status"], fetched["summary"], fetched["sentiment"]) == ("failed", None, None)
+
+
+def test_content_reads_are_cached_with_etags(client, monkeypatch):
+    # Redis is not running in tests; the in-process layer stands in for it
+    monkeypatch.setattr(content_cache, "local", TTLCache(maxsize=100, ttl=60))
+    headers = _auth_headers(client, "etag@example.com")
+    content_id = client.post(f"{PREFIX}/contents/", json={"text": "FastAPI is great."}, headers=headers).json()["id"]
+
+    first = client.get(f"{PREFIX}/contents/{content_id}", headers=headers)
+    etag = first.headers["ETag"]
+    hits = content_cache.stats["hits"]
+    second = client.get(f"{PREFIX}/contents/{content_id}", headers=headers)
+    assert (second.content, second.headers["ETag"]) == (first.content, etag)
+    assert content_cache.stats["hits"] == hits + 1
+
+    not_modified = client.get(f"{PREFIX}/contents/{content_id}", headers={**headers, "If-None-Match": f"W/{etag}"})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    page = client.get(f"{PREFIX}/contents/", headers=headers)
+    assert client.get(f"{PREFIX}/contents/", headers={**headers, "If-None-Match": page.headers["ETag"]}).status_code == 304
+
+    client.delete(f"{PREFIX}/contents/{content_id}", headers=headers)
+    assert client.get(f"{PREFIX}/contents/{content_id}", headers={**headers, "If-None-Match": etag}).status_code == 404
+
+
+def test_content_bodies_are_encoded_straight_from_the_rows(client):
+    headers = _auth_headers(client, "encoding@example.com")
+    text = "Café ☕ naïve \"quoted\" — ok"
+    content_id = client.post(f"{PREFIX}/contents/", json={"text": text}, headers=headers).json()["id"]
+
+    single = client.get(f"{PREFIX}/contents/{content_id}", headers=headers)
+    with SessionLocal() as db:
+        row = db.query(Content).options(joinedload(Content.blob)).filter(Content.id == content_id).one()
+        expected = ContentResponse.model_validate(row).model_dump_json().encode("utf-8")
+    assert single.content == expected
+    assert single.json()["text"] == text
+
+    # The list body is orjson output as-is, served without a decode/re-encode round trip
+    page = client.get(f"{PREFIX}/contents/", headers=headers)
+    assert page.content == orjson.dumps([{"id": content_id, "text": text}])
+    assert page.headers["content-type"] == "application/json"
+
+
+def test_reads_during_inline_analysis_are_not_cached(client, monkeypatch):
+    monkeypatch.setattr(content_cache, "local", TTLCache(maxsize=100, ttl=60))
+    headers = _auth_headers(client, "racing@example.com")
+    with SessionLocal() as db:
+        user = AuthenticatedUser(id=db.query(User.id).filter(User.email == "racing@example.com").scalar(), email="racing@example.com")
+    analyze = content_service.analyze_text
+    seen = {}
+
+    async def analyze_while_reading(text):
+        # A GET of the row lands while the model is still working on it
+        with SessionLocal() as db:
+            content_id = db.query(func.max(Content.id)).filter(Content.user_id == user.id).scalar()
+        async with AsyncSessionLocal() as db:
+            _, body = await content_service.get_user_content_response(content_id, db, user)
+        seen["body"] = json.loads(body)
+        assert await content_cache.get(content_cache_key(user.id, content_id)) is None
+        # Even an entry cached before the analysis finished is dropped once it is saved
+        await content_cache.put(content_cache_key(user.id, content_id), "stale", body)
+        return await analyze(text)
+
+    monkeypatch.setattr(content_service, "analyze_text", analyze_while_reading)
+    created = client.post(f"{PREFIX}/contents/", json={"text": "FastAPI is great."}, headers=headers).json()
+
+    assert seen["body"]["status"] == "processing"
+    assert client.get(f"{PREFIX}/contents/{created['id']}", headers=headers).json() == created
+
+
+def test_writes_over_the_rate_limit_get_429(monkeypatch):
+    # Its own middleware, settings and process-local buckets: nothing another test (or a Redis
+    # left over from an earlier run) spent can drain this bucket
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_SECOND", 0.01)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 6)
+    monkeypatch.setattr(settings, "RATE_LIMIT_WRITE_COST", 5)
+    monkeypatch.setattr(redis_cache, "available", lambda: False)
+
+    async def route(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    limited = RateLimitMiddleware(route)
+
+    async def authenticated(scope, receive, send):
+        # What JWTMiddleware leaves in the scope
+        scope["state"] = {"user": AuthenticatedUser(id=1, email="limited@example.com")}
+        await limited(scope, receive, send)
+
+    client = TestClient(authenticated)
+    assert client.post("/contents/").status_code == 200
+    response = client.post("/contents/")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Reads are cheaper and still go through
+    assert client.get("/contents/").status_code == 200
+
+
+def test_zero_rate_turns_the_limit_off_instead_of_failing(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_SECOND", 0)
+
+    async def route(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    limited = RateLimitMiddleware(route)
+
+    async def authenticated(scope, receive, send):
+        scope["state"] = {"user": AuthenticatedUser(id=1, email="unlimited@example.com")}
+        await limited(scope, receive, send)
+
+    assert TestClient(authenticated).post("/contents/").status_code == 200
+
+
+def test_batches_are_charged_per_text(client, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(redis_cache, "available", lambda: False)
+    monkeypatch.setattr(rate_limit_middleware, "bulk_limiter", TokenBucketLimiter("bulk_texts", 0.01, 3))
+    headers = _auth_headers(client, "bulk@example.com")
+
+    assert client.post(f"{PREFIX}/contents/batch", json={"texts": ["One.", "Two."]}, headers=headers).status_code == 200
+    # A single request, but two more texts than the bucket has left
+    response = client.post(f"{PREFIX}/contents/batch", json={"texts": ["Three.", "Four."]}, headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(client.get(f"{PREFIX}/contents/", headers=headers).json()) == 2
+
+
+def test_bulk_charges_larger_than_the_burst_wait_their_turn(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(redis_cache, "available", lambda: False)
+    limiter = TokenBucketLimiter("bulk_texts", 100, 2)
+    monkeypatch.setattr(rate_limit_middleware, "bulk_limiter", limiter)
+
+    start = time.perf_counter()
+    asyncio.run(rate_limit_middleware.take_bulk_texts(1, 6, wait=True))
+    # Two tokens up front, then four more at 100 per second
+    assert 0.02 <= time.perf_counter() - start < 1.0
+
+
+def test_stats_follow_creates_batches_and_deletes(client):
+    headers = _auth_headers(client, "stats@example.com")
+    good = client.post(f"{PREFIX}/contents/", json={"text": "FastAPI is great."}, headers=headers).json()
+    client.post(f"{PREFIX}/contents/batch", json={"texts": ["A terrible day.", "Just text."]}, headers=headers)
+
+    stats = client.get(f"{PREFIX}/contents/stats", headers=headers).json()
+    assert stats["total"] == 3
+    assert stats["sentiments"] == {"Positive": 1, "Negative": 1, "Neutral": 1}
+    assert stats["average_text_length"] == round((17 + 15 + 10) / 3, 1)
+    assert len(stats["trend"]) == settings.CONTENT_STATS_TREND_DAYS
+    assert stats["trend"][-1]["total"] == 3
+
+    client.delete(f"{PREFIX}/contents/{good['id']}", headers=headers)
+    stats = client.get(f"{PREFIX}/contents/stats", headers=headers).json()
+    assert (stats["total"], stats["sentiments"]) == (2, {"Negative": 1, "Neutral": 1})
+    assert stats["trend"][-1]["sentiments"] == {"Negative": 1, "Neutral": 1}
+
+    # The counters match what a full recount produces
+    with SessionLocal() as db:
+        rebuild_content_stats(db)
+    assert client.get(f"{PREFIX}/contents/stats", headers=headers).json() == stats
+    assert client.get(f"{PREFIX}/contents/stats", headers=_auth_headers(client, "nostats@example.com")).json()["total"] == 0
+
+
+class DroppingBackend(FakeBackend):
+    """Leaves "dropped" and "doomed" texts out of batch answers and rejects "doomed" ones on their own."""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    async def generate(self, prompt, model):
+        self.prompts.append("batch" if "[Document " in prompt else "single")
+        if "[Document " not in prompt and "doomed" in prompt:
+            from google.genai import errors
+            raise errors.ClientError(400, {"error": {"code": 400, "message": "injected"}})
+        raw = await super().generate(prompt, model)
+        if "[Document " not in prompt:
+            return raw
+        texts = dict(re.findall(r"\[Document (\d+)\]\n(.*?)\n", prompt))
+        return json.dumps([item for item in json.loads(raw) if not re.search("dropped|doomed", texts[str(item["index"])])])
+
+
+def test_batch_reports_each_item_and_retries_dropped_ones_alone(client, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_ANALYZER_ENABLED", False)
+    backend = DroppingBackend()
+    monkeypatch.setattr(analyze_sentiment, "model_backend", backend)
+    headers = _auth_headers(client, "batch@example.com")
+    texts = ["A wonderful release.", "", "A dropped note.", "A doomed note."]
+
+    response = client.post(f"{PREFIX}/contents/batch", json={"texts": texts}, headers=headers)
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3]
+    assert [item["status"] for item in items] == ["completed", "failed", "completed", "failed"]
+    assert items[0]["sentiment"] == "Positive" and items[2]["summary"].startswith("A dropped note.")
+    assert items[1]["id"] is None and items[1]["error"] == "Content text cannot be empty"
+    assert items[3]["id"] is not None and items[3]["error"]
+    # One prompt for the batch, then one each for the two items the model left out
+    assert backend.prompts == ["batch", "single", "single"]
+
+    # The failed item is saved as failed and kept out of the stats; the others are completed
+    statuses = {item["id"]: client.get(f"{PREFIX}/contents/{item['id']}", headers=headers).json()["status"] for item in items if item["id"]}
+    assert sorted(statuses.values()) == ["completed", "completed", "failed"]
+    assert client.get(f"{PREFIX}/contents/stats", headers=headers).json()["total"] == 2
+
+
+def test_deleting_uncounted_rows_leaves_stats_untouched(client, failing_model):
+    headers = _auth_headers(client, "uncounted@example.com")
+    client.post(f"{PREFIX}/contents/", json={"text": "Never analysed."}, headers=headers)
+    failed_id = client.get(f"{PREFIX}/contents/", headers=headers).json()[0]["id"]
+    # A completed row without results, as rows left by interrupted analyses used to be
+    with SessionLocal() as db:
+        blobs, (blob_hash,) = add_blob_refs(["No results."])
+        db.execute(blobs)
+        row = Content(user_id=db.get(Content, failed_id).user_id, blob_hash=blob_hash, preview="No results.", status="completed")
+        db.add(row)
+        db.commit()
+        empty_id = row.id
+
+    for content_id in (failed_id, empty_id):
+        assert client.delete(f"{PREFIX}/contents/{content_id}", headers=headers).status_code == 200
+    with SessionLocal() as db:
+        assert db.query(ContentStat).filter(ContentStat.count < 0).count() == 0
+    assert client.get(f"{PREFIX}/contents/stats", headers=headers).json()["total"] == 0
+
+
+def test_identical_texts_share_one_compressed_blob(client):
+    text = "The same long article, uploaded by more than one user. " * 100
+    first = _auth_headers(client, "blob-a@example.com")
+    second = _auth_headers(client, "blob-b@example.com")
+    ids = [client.post(f"{PREFIX}/contents/", json={"text": text}, headers=h).json()["id"] for h in (first, second)]
+
+    with SessionLocal() as db:
+        blob = db.get(ContentBlob, text_hash(text))
+        assert (blob.refcount, blob.compressed, blob.text) == (2, True, text)
+        assert len(blob.data) < len(text) // 10
+    assert client.get(f"{PREFIX}/contents/{ids[1]}", headers=second).json()["text"] == text
+    assert client.get(f"{PREFIX}/contents/", params={"view": "preview"}, headers=first).json()[0]["text"] == text[:settings.CONTENTS_PREVIEW_CHARS]
+
+    client.delete(f"{PREFIX}/contents/{ids[0]}", headers=first)
+    with SessionLocal() as db:
+        assert db.get(ContentBlob, text_hash(text)).refcount == 1
+    assert client.get(f"{PREFIX}/contents/", headers=second).json() == [{"id": ids[1], "text": text}]
+    client.delete(f"{PREFIX}/contents/{ids[1]}", headers=second)
+    with SessionLocal() as db:
+        assert db.get(ContentBlob, text_hash(text)) is None
+
+
+def test_contents_are_paginated_by_cursor(client):
+    headers = _auth_headers(client, "pages@example.com")
+    for i in range(5):
+        client.post(f"{PREFIX}/contents/", json={"text": f"text {i}"}, headers=headers)
+
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 2}
+        if after:
+            params["after"] = after
+        response = client.get(f"{PREFIX}/contents/", params=params, headers=headers)
+        seen += [item["text"] for item in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+
+    assert seen == [f"text {i}" for i in range(5)]
+
+
+def test_contents_are_scoped_to_the_caller(client):
+    owner = _auth_headers(client, "owner@example.com")
+    other = _auth_headers(client, "other@example.com")
+    content_id = client.post(f"{PREFIX}/contents/", json={"text": "private"}, headers=owner).json()["id"]
+
+    assert client.get(f"{PREFIX}/contents/{content_id}", headers=other).status_code == 404
+    assert client.get(f"{PREFIX}/contents/", headers=other).json() == []
+
+
+def test_metrics_are_public_and_record_route_templates(client):
+    headers = _auth_headers(client, "metrics@example.com")
+    created = client.post(f"{PREFIX}/contents/", json={"text": "Metrics text"}, headers=headers).json()
+    client.get(f"{PREFIX}/contents/{created['id']}", headers=headers)
+
+    response = client.get(f"{PREFIX}/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/contents/{content_id}",status="200"}' in body
+    assert "jwt_decode_duration_seconds_count" in body
+    assert 'db_query_duration_seconds_count{engine="async"}' in body
+    assert "analysis_cache_hit_ratio" in body
+
+
+def test_stream_sends_summary_pieces_then_saves(client):
+    headers = _auth_headers(client, "stream@example.com")
+    text = "Streaming keeps the interface responsive while the summary is written. " * 5
+
+    events = []
+    with client.stream("POST", f"{PREFIX}/contents/stream", json={"text": text}, headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                events.append([line[7:], None])
+            elif line.startswith("data: "):
+                events[-1][1] = json.loads(line[6:])
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "created" and kinds[-1] == "done"
+    assert kinds.count("summary") > 1
+    streamed = "".join(data["delta"] for kind, data in events if kind == "summary")
+    done = events[-1][1]
+    assert streamed == done["summary"]
+    assert done["status"] == "completed"
+
+    saved = client.get(f"{PREFIX}/contents/{done['id']}", headers=headers).json()
+    assert (saved["summary"], saved["status"]) == (done["summary"], "completed")
+
+
+def test_search_ranks_matches_and_respects_owner(client, monkeypatch):
+    from app.config import settings
+    from app.service import embedding_index
+
+    monkeypatch.setattr(settings, "EMBEDDING_INDEX_ENABLED", True)
+    monkeypatch.setattr(embedding_index, "_index", None)
+    owner = _auth_headers(client, "search@example.com")
+    other = _auth_headers(client, "search-other@example.com")
+    client.post(f"{PREFIX}/contents/", json={"text": "Notes about postgres index tuning."}, headers=owner)
+    client.post(f"{PREFIX}/contents/", json={"text": "A recipe for bread."}, headers=owner)
+    client.post(f"{PREFIX}/contents/", json={"text": "Someone else's postgres notes."}, headers=other)
+
+    text_hits = client.get(f"{PREFIX}/contents/search", params={"q": "postgres"}, headers=owner).json()
+    assert [hit["text"] for hit in text_hits] == ["Notes about postgres index tuning."]
+
+    # Terms past the stored preview, in a text long enough to be compressed, still match, and the hit has the whole text
+    long_text = "Filler sentence about nothing much. " * 100 + "The word zeppelin appears only here."
+    client.post(f"{PREFIX}/contents/", json={"text": long_text}, headers=owner)
+    deep_hits = client.get(f"{PREFIX}/contents/search", params={"q": "ZEPPELIN"}, headers=owner).json()
+    assert [hit["text"] for hit in deep_hits] == [long_text]
+
+    semantic = client.get(f"{PREFIX}/contents/search", params={"q": "postgres index", "mode": "semantic"}, headers=owner).json()
+    assert semantic[0]["text"] == "Notes about postgres index tuning."
+    assert all(hit["text"] != "Someone else's postgres notes." for hit in semantic)
+    monkeypatch.setattr(embedding_index, "_index", None)
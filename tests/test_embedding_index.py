@@ -0,0 +1,57 @@
+from app.service.embedding_index import EmbeddingIndex
+
+
+def test_search_is_scoped_to_user_and_ranked(tmp_path):
+    index = EmbeddingIndex(dim=128, path=str(tmp_path / "index"), capacity=2)
+    index.add_many([
+        (1, 10, "postgres full text search with a gin index"),
+        (2, 10, "baking sourdough bread at home"),
+        (3, 10, "search ranking for postgres queries"),
+        (4, 20, "postgres full text search with a gin index"),
+    ])
+
+    hits = index.search(10, "postgres search", limit=5)
+    assert [content_id for content_id, _ in hits][:2] in ([1, 3], [3, 1])
+    assert 4 not in [content_id for content_id, _ in hits]
+    assert index.search(10, "postgres search", limit=1, offset=1)[0][0] == hits[1][0]
+
+
+def test_index_survives_reopen_and_removal(tmp_path):
+    path = str(tmp_path / "index")
+    index = EmbeddingIndex(dim=64, path=path)
+    index.add_many([(1, 10, "alpha beta"), (2, 10, "alpha gamma")])
+    index.remove(1)
+
+    reopened = EmbeddingIndex(dim=64, path=path)
+    assert len(reopened) == 1
+    assert [content_id for content_id, _ in reopened.search(10, "alpha", limit=5)] == [2]
+
+
+def test_processes_sharing_the_files_see_each_others_writes(tmp_path):
+    # Two instances over the same files stand in for two API processes
+    path = str(tmp_path / "index")
+    first = EmbeddingIndex(dim=64, path=path, capacity=2)
+    second = EmbeddingIndex(dim=64, path=path)
+
+    first.add_many([(1, 10, "alpha beta"), (2, 10, "alpha gamma"), (3, 10, "alpha delta")])
+    assert sorted(content_id for content_id, _ in second.search(10, "alpha", limit=5)) == [1, 2, 3]
+
+    second.remove(2)
+    assert sorted(content_id for content_id, _ in first.search(10, "alpha", limit=5)) == [1, 3]
+
+    # A rebuild elsewhere (python -m app.cli reindex) replaces what the server had loaded
+    first.clear()
+    first.add(4, 10, "alpha epsilon")
+    assert [content_id for content_id, _ in second.search(10, "alpha", limit=5)] == [4]
+
+
+def test_removed_rows_are_reclaimed(tmp_path):
+    index = EmbeddingIndex(dim=32, path=str(tmp_path / "index"), capacity=4)
+    for content_id in range(1, 41):
+        index.add(content_id, 10, f"note {content_id} about alpha")
+        if content_id > 2:
+            index.remove(content_id - 2)
+
+    assert len(index) == 2
+    assert len(index.meta) == 4
+    assert sorted(content_id for content_id, _ in index.search(10, "alpha", limit=5)) == [39, 40]
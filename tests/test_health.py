@@ -0,0 +1,72 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.caching.redis import RedisUnavailable
+from app.lifespan import resources
+from app.main import app
+from app.service import analyze_sentiment
+from app.service.model_backends import FakeBackend
+
+PREFIX = "/intelligent_content_api/v1/health"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend())
+    with TestClient(app) as client:
+        yield client
+
+
+def _down(error):
+    async def check():
+        raise error
+    return check
+
+
+async def _up():
+    return None
+
+
+def test_ready_when_every_dependency_answers(client, monkeypatch):
+    # No Redis server runs under the tests
+    monkeypatch.setitem(resources.checks, "redis", _up)
+    response = client.get(f"{PREFIX}/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"] == {"database": "ok", "redis": "ok", "model": "ok"}
+
+
+def test_ready_without_redis_or_the_model(client, monkeypatch):
+    monkeypatch.setitem(resources.checks, "redis", _down(RedisUnavailable("breaker open")))
+    monkeypatch.setitem(resources.checks, "model", _down(RuntimeError("no credentials")))
+
+    response = client.get(f"{PREFIX}/ready")
+    assert response.status_code == 200
+    checks = response.json()["checks"]
+    assert checks["database"] == "ok"
+    assert checks["redis"] == "error: RedisUnavailable"
+    assert checks["model"] == "error: RuntimeError"
+
+
+def test_not_ready_without_the_database_but_still_live(client, monkeypatch):
+    monkeypatch.setitem(resources.checks, "database", _down(ConnectionRefusedError()))
+
+    response = client.get(f"{PREFIX}/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not ready"
+    assert response.json()["checks"]["database"] == "error: ConnectionRefusedError"
+
+    # Liveness touches no dependency, so the process is not restarted over a database outage
+    live = client.get(f"{PREFIX}/live")
+    assert live.status_code == 200
+    assert live.json() == {"status": "alive"}
+
+
+def test_stats_need_a_token(client):
+    assert client.get(f"{PREFIX}/stats").status_code == 401
+
+    credentials = {"email": "stats@example.com", "password": "Abcd@1234"}
+    client.post("/intelligent_content_api/v1/users/signup", json=credentials)
+    token = client.post("/intelligent_content_api/v1/users/login", json=credentials).json()["access_token"]
+    response = client.get(f"{PREFIX}/stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert "db_pool" in response.json()
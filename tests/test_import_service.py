@@ -0,0 +1,183 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import cli
+from app.caching.analysis_cache import analysis_cache
+from app.config import settings
+from app.database.database import SessionLocal
+from app.database.models import Content, User
+from app.main import app
+from app.service import analyze_sentiment
+from app.service.analysis_worker import InMemoryAnalysisQueue, analysis_workers
+from app.service.blob_store import add_blob_refs, preview_of
+from app.service.import_service import import_ndjson, iter_ndjson_stream
+from app.service.model_backends import FakeBackend
+
+PREFIX = "/intelligent_content_api/v1"
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def _collect(chunks, start_line=0):
+    async def run():
+        return [item async for item in iter_ndjson_stream(chunks, start_line)]
+
+    return asyncio.run(run())
+
+
+def test_lines_split_across_chunks_are_reassembled():
+    lines = _collect(_chunks(b'{"text": "o', b'ne"}\n{"te', b'xt": "two"}\n', b'{"text": "three"}'))
+
+    assert [line for _, _, line in lines] == [b'{"text": "one"}', b'{"text": "two"}', b'{"text": "three"}']
+    assert [line_no for line_no, _, _ in lines] == [1, 2, 3]
+    # Offsets point just past each line so a file reader can seek straight to the next one
+    assert [offset for _, offset, _ in lines] == [16, 32, 49]
+
+
+def test_start_line_skips_already_imported_lines():
+    lines = _collect(_chunks(b"a\nb\nc\n"), start_line=2)
+
+    assert lines == [(3, 6, b"c")]
+
+
+def test_long_lines_in_many_small_chunks():
+    line = b'{"text": "' + b"x" * 5000 + b'"}'
+    lines = _collect(_chunks(*(line[i:i + 7] for i in range(0, len(line), 7)), b"\n", b"tail"))
+
+    assert [item for _, _, item in lines] == [line, b"tail"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend())
+    # asyncio queues belong to one event loop, and every TestClient runs its own
+    monkeypatch.setattr(analysis_workers, "queue", InMemoryAnalysisQueue(settings.ANALYSIS_QUEUE_MAXSIZE))
+    analysis_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def background_client(monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_ANALYSIS_MODE", "background")
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend())
+    monkeypatch.setattr(analysis_workers, "queue", InMemoryAnalysisQueue(settings.ANALYSIS_QUEUE_MAXSIZE))
+    analysis_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+class DurableQueue(InMemoryAnalysisQueue):
+    """Stands in for the redis and database queues: the jobs in it outlive the process."""
+    recover_on_start = False
+
+
+def _signup(client, email):
+    credentials = {"email": email, "password": "Abcd@1234"}
+    assert client.post(f"{PREFIX}/users/signup", json=credentials).status_code == 200
+    token = client.post(f"{PREFIX}/users/login", json=credentials).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _user_rows(email):
+    with SessionLocal() as db:
+        user_id = db.query(User.id).filter(User.email == email).scalar()
+        return db.query(Content.status).filter(Content.user_id == user_id).order_by(Content.id).all()
+
+
+def _ndjson(*texts):
+    return "".join(json.dumps({"text": text}) + "\n" for text in texts).encode()
+
+
+def test_import_endpoint_queues_rows_and_resumes_from_start_line(background_client):
+    client = background_client
+    headers = _signup(client, "import@example.com")
+    body = _ndjson("First imported note.", "Second imported note.") + b"not json\n" + _ndjson("Fourth imported note.")
+
+    response = client.post(f"{PREFIX}/contents/import", content=body, headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"], result["last_line"]) == (3, 1, 4)
+    assert result["errors"][0].startswith("line 3:")
+
+    # The workers finish the analyses after the request returned
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and any(status != "completed" for (status,) in _user_rows("import@example.com")):
+        time.sleep(0.02)
+    assert [status for (status,) in _user_rows("import@example.com")] == ["completed"] * 3
+
+    # Re-sending the body after line 2 only imports what follows it
+    resumed = client.post(f"{PREFIX}/contents/import", params={"start_line": 2}, content=body, headers=headers).json()
+    assert (resumed["imported"], resumed["failed"]) == (1, 1)
+    assert len(_user_rows("import@example.com")) == 4
+
+
+def test_import_endpoint_refuses_sync_mode_with_a_memory_queue(client):
+    headers = _signup(client, "sync-import@example.com")
+
+    response = client.post(f"{PREFIX}/contents/import", content=_ndjson("Would be lost on restart."), headers=headers)
+    assert response.status_code == 409
+    assert _user_rows("sync-import@example.com") == []
+
+
+def test_sync_mode_workers_finish_jobs_queued_before_a_restart(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_QUEUE_BACKEND", "redis")
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend())
+    queue = DurableQueue(settings.ANALYSIS_QUEUE_MAXSIZE)
+    monkeypatch.setattr(analysis_workers, "queue", queue)
+    # An import committed and queued this row, then the process stopped before a worker got to it
+    with SessionLocal() as db:
+        user = User(email="restart-import@example.com", password="unused")
+        db.add(user)
+        blobs, (blob_hash,) = add_blob_refs(["Queued before the restart."])
+        db.execute(blobs)
+        content = Content(owner=user, blob_hash=blob_hash, preview=preview_of("Queued before the restart."), status="pending")
+        db.add(content)
+        db.commit()
+        queue.queue.put_nowait(content.id)
+
+    with TestClient(app):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and _user_rows("restart-import@example.com") != [("completed",)]:
+            time.sleep(0.02)
+    assert _user_rows("restart-import@example.com") == [("completed",)]
+
+
+def test_each_chunk_is_throttled_before_it_is_written(client):
+    _signup(client, "throttled@example.com")
+    with SessionLocal() as db:
+        user_id = db.query(User.id).filter(User.email == "throttled@example.com").scalar()
+    body = _ndjson("One.", "Two.", "Three.", "Four.", "Five.")
+    throttled = []
+
+    async def throttle(count):
+        throttled.append((count, len(_user_rows("throttled@example.com"))))
+
+    async def run():
+        return await import_ndjson(iter_ndjson_stream(_chunks(body)), user_id, chunk_size=2, throttle=throttle, analyze=False)
+
+    assert asyncio.run(run()).imported == 5
+    # (texts in the chunk, rows already written when it was charged)
+    assert throttled == [(2, 0), (2, 2), (1, 4)]
+
+
+def test_cli_import_resumes_from_its_checkpoint(client, tmp_path):
+    _signup(client, "cli-import@example.com")
+    path, checkpoint = tmp_path / "contents.jsonl", tmp_path / "contents.ckpt"
+    first = _ndjson("One from the file.")
+    path.write_bytes(first + _ndjson("Two from the file.", "Three from the file."))
+    # Left behind by a run that committed line 1 and then died
+    checkpoint.write_text(json.dumps({"line": 1, "offset": len(first)}))
+
+    args = ["import", str(path), "--user-email", "cli-import@example.com", "--checkpoint", str(checkpoint), "--chunk-size", "1"]
+    assert cli.main(args) == 0
+    assert json.loads(checkpoint.read_text()) == {"line": 3, "offset": path.stat().st_size}
+    # Only the lines after the checkpoint were imported, and analysed before the command returned
+    assert [status for (status,) in _user_rows("cli-import@example.com")] == ["completed"] * 2
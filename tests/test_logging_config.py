@@ -0,0 +1,31 @@
+import json
+import logging
+
+from app.logging_config import SAMPLED, JsonFormatter, SamplingFilter
+
+
+def _record(msg, *args, **extra):
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_truncates_arguments_and_extra_fields():
+    formatter = JsonFormatter(max_field_chars=20)
+    line = formatter.format(_record("text=%s", "x" * 50, content_id=7, body="y" * 50))
+
+    entry = json.loads(line)
+    assert entry["message"] == "text=" + "x" * 20 + "...[30 more]"
+    assert entry["content_id"] == 7
+    assert entry["body"] == "y" * 20 + "...[30 more]"
+    assert entry["level"] == "INFO"
+
+
+def test_sampling_filter_only_drops_marked_records():
+    drop_all = SamplingFilter(rate=0.0)
+
+    assert not drop_all.filter(_record("per request", **SAMPLED))
+    assert drop_all.filter(_record("not sampled"))
+    warning = _record("still kept", **SAMPLED)
+    warning.levelno = logging.WARNING
+    assert drop_all.filter(warning)
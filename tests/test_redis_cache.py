@@ -0,0 +1,76 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from redis.exceptions import RedisError
+
+from app.caching import redis as redis_module
+from app.caching.redis import RedisCache, RedisUnavailable
+from app.config import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "REDIS_BREAKER_RESET_SECONDS", 1.0)
+    monkeypatch.setattr(settings, "REDIS_BREAKER_MAX_RESET_SECONDS", 3.0)
+    clock = Clock()
+    # Only the breaker's clock moves; the event loop keeps the real one
+    monkeypatch.setattr(redis_module, "time", SimpleNamespace(monotonic=clock.monotonic, perf_counter=time.perf_counter))
+    return RedisCache(), clock
+
+
+def test_breaker_opens_half_opens_and_closes(breaker):
+    cache, clock = breaker
+    calls = []
+
+    async def fail():
+        calls.append("fail")
+        raise RedisError("connection refused")
+
+    async def succeed():
+        calls.append("ok")
+        return "PONG"
+
+    async def scenario():
+        # Closed: failures below the threshold still reach Redis
+        with pytest.raises(RedisError):
+            await cache.guard(fail)
+        assert cache.available()
+        with pytest.raises(RedisError):
+            await cache.guard(fail)
+
+        # Open: calls fail fast without touching the network
+        assert not cache.available()
+        with pytest.raises(RedisUnavailable):
+            await cache.guard(succeed)
+        assert calls == ["fail", "fail"]
+        assert cache.stats["short_circuited"] == 1
+
+        # Half-open after the backoff: one failed trial reopens it with the backoff doubled
+        clock.now = cache.open_until
+        assert cache.available()
+        with pytest.raises(RedisError):
+            await cache.guard(fail)
+        assert not cache.available()
+        assert cache.open_until - clock.now >= 1.0
+        assert cache.backoff == 3.0  # doubled to 4s, capped at REDIS_BREAKER_MAX_RESET_SECONDS
+
+        # One successful trial closes it and resets the backoff
+        clock.now = cache.open_until
+        assert await cache.guard(succeed) == "PONG"
+        assert cache.available()
+        assert cache.failures == 0
+        assert cache.backoff == 1.0
+        assert cache.get_stats()["breaker_open"] is False
+
+    asyncio.run(scenario())
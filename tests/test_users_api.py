@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app.caching.analysis_cache import analysis_cache
+from app.config import settings
+from app.database.database import SessionLocal
+from app.database.models import User
+from app.main import app
+from app.service import analyze_sentiment, user_service
+from app.service.model_backends import FakeBackend
+from app.service.user_service import create_token, principal_cache
+
+PREFIX = "/intelligent_content_api/v1"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(analyze_sentiment, "model_backend", FakeBackend())
+    analysis_cache.clear()
+    principal_cache.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+def _login(client, email):
+    credentials = {"email": email, "password": "Abcd@1234"}
+    assert client.post(f"{PREFIX}/users/signup", json=credentials).status_code == 200
+    response = client.post(f"{PREFIX}/users/login", json=credentials)
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _count_loads(monkeypatch):
+    loads = []
+    load_principal = user_service._load_principal
+
+    def counting(user_id):
+        loads.append(user_id)
+        return load_principal(user_id)
+
+    monkeypatch.setattr(user_service, "_load_principal", counting)
+    return loads
+
+
+def test_principal_is_loaded_once_and_forgotten_when_the_user_is_deleted(client, monkeypatch):
+    headers = _login(client, "cached@example.com")
+    loads = _count_loads(monkeypatch)
+
+    for _ in range(3):
+        assert client.get(f"{PREFIX}/contents/", headers=headers).status_code == 200
+    assert len(loads) == 1
+
+    with SessionLocal() as db:
+        db.delete(db.query(User).filter(User.email == "cached@example.com").one())
+        db.commit()
+    response = client.get(f"{PREFIX}/contents/", headers=headers)
+    assert response.status_code == 404
+    assert len(loads) == 2
+
+
+def test_trusted_token_claims_skip_the_user_lookup(client, monkeypatch):
+    headers = _login(client, "trusted@example.com")
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    loads = _count_loads(monkeypatch)
+
+    assert client.get(f"{PREFIX}/contents/", headers=headers).status_code == 200
+    assert loads == []
+
+
+@pytest.mark.parametrize(
+    "token, detail",
+    [
+        ("not-a-jwt", "Invalid token"),
+        (jwt.encode({"id": 1, "email": "forged@example.com"}, "some-other-secret", algorithm="HS256"), "Invalid token"),
+        (
+            jwt.encode({"id": 1, "exp": datetime.utcnow() - timedelta(minutes=1)}, settings.JWT_SECRET, algorithm=settings.JWT_ALGO),
+            "Token has expired",
+        ),
+    ],
+)
+def test_bad_tokens_get_401(client, token, detail):
+    response = client.get(f"{PREFIX}/contents/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert detail in response.text
+
+
+def test_fresh_token_is_accepted(client):
+    _login(client, "fresh@example.com")
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == "fresh@example.com").one()
+        token = create_token({"id": user.id, "email": user.email})
+    assert client.get(f"{PREFIX}/contents/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+def test_signup_gets_503_when_the_hashing_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_LIMIT", 0)
+    rejected = user_service.hash_stats["rejected"]
+
+    response = client.post(f"{PREFIX}/users/signup", json={"email": "queued@example.com", "password": "Abcd@1234"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert user_service.hash_stats["rejected"] == rejected + 1
+
+
+def test_login_rehashes_deprecated_hashes(client, monkeypatch):
+    # Everything but the first scheme is deprecated, so a sha256_crypt hash is replaced at login
+    context = CryptContext(schemes=["bcrypt", "sha256_crypt"], deprecated="auto")
+    monkeypatch.setattr(user_service, "pwd_context", context)
+    with SessionLocal() as db:
+        db.add(User(email="legacy@example.com", password=context.handler("sha256_crypt").hash("Abcd@1234")))
+        db.commit()
+
+    credentials = {"email": "legacy@example.com", "password": "Abcd@1234"}
+    assert client.post(f"{PREFIX}/users/login", json=credentials).status_code == 200
+    with SessionLocal() as db:
+        stored = db.query(User.password).filter(User.email == "legacy@example.com").scalar()
+    assert context.identify(stored) == "bcrypt"
+    assert client.post(f"{PREFIX}/users/login", json=credentials).status_code == 200
+
+
+def test_failed_hashes_are_not_counted_as_completed():
+    before = dict(user_service.hash_stats)
+    with pytest.raises(ValueError):
+        asyncio.run(user_service.verify_and_update_password_async("Abcd@1234", "not-a-hash"))
+    assert user_service.hash_stats["failed"] == before["failed"] + 1
+    assert user_service.hash_stats["completed"] == before["completed"]